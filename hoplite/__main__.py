@@ -5,6 +5,8 @@ Hoplite game AI
 
 import os
 os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "hide"
+import sys
+import json
 import argparse
 import logging
 import hoplite
@@ -14,84 +16,119 @@ import hoplite.game.moves
 import hoplite.game.state
 import hoplite.vision.observer
 import hoplite.controller
-import hoplite.ppadb_runner
-import hoplite.actuator
+import hoplite.fleet
+import hoplite.sim
+import hoplite.bench
+import hoplite.check
+import hoplite.records
 import hoplite.brain
 
 
-def check(path):
-    """Check a game log for errors in predicted state.
+def check(paths, jobs, json_output):
+    """Check game logs for errors in predicted state.
     """
-    print("Checking %s\n" % os.path.realpath(path))
-    with open(path, "r") as file:
-        lines = file.readlines()
-    total, errors = 0, 0
-    for prev_line, next_line in zip(lines[:-1], lines[1:]):
-        if prev_line.split("\t")[1] != "move":
-            continue
-        if next_line.split("\t")[1] != "move":
-            continue
-        prev_state = hoplite.game.state.GameState.from_string(prev_line.split("\t")[2])
-        groundtruth = hoplite.game.state.GameState.from_string(next_line.split("\t")[2])
-        if prev_state.depth != groundtruth.depth:
-            continue
-        total += 1
-        move = hoplite.game.moves.PlayerMove.from_string(prev_line.split("\t")[3])
-        prediction = move.apply(prev_state)
-        prediction.status.cooldown = max(0, prediction.status.cooldown - 1)
-        prediction_errors = list()
-        if prediction.status != groundtruth.status:
-            prediction_errors.append(
-                ("Status", prediction.status, groundtruth.status))
-        if prediction.terrain.player != groundtruth.terrain.player:
-            prediction_errors.append(
-                ("Player position", prediction.terrain.player, groundtruth.terrain.player))
-        if len(prediction_errors) > 0:
-            print("-" * 120)
-            print("Found error(s) from turn %d to %d" %
-                  (int(prev_line.split("\t")[0]), int(next_line.split("\t")[0])))
-            print("State:", repr(prev_state))
-            print("Move:", move)
-            for error_name, predicted, expected in prediction_errors:
-                print("%s expected %s but got %s" % (
-                    error_name,
-                    repr(expected),
-                    repr(predicted)
-                ))
-            print("-" * 120 + "\n")
-            errors += 1
-    print("Check run found %d errors out of %d predictions." % (errors, total))
-
-
-def play(serial: str, prayers, record):
-    """Play with the monkey runner interface.
+    reports = hoplite.check.check_logs(hoplite.check.find_logs(paths), jobs)
+    summary = hoplite.check.summarize(reports)
+    if json_output:
+        print(json.dumps(summary, indent=4))
+        return
+    for report in reports:
+        print(report.format())
+    if len(reports) > 1:
+        print("\nCheck run found %d errors out of %d predictions in %d logs." % (
+            summary["errors"], summary["total"], summary["logs"]))
+
+
+def convert(paths, output):
+    """Convert text game logs to a binary file if the output has the binary
+    extension, or a binary file to text game logs in the output folder.
+    """
+    if output.endswith(hoplite.records.EXTENSION):
+        logs = hoplite.check.find_logs(paths)
+        if len(logs) == 0:
+            logging.error("No game log found in %s", ", ".join(paths))
+            sys.exit(1)
+        hoplite.records.pack(logs, output)
+        return
+    for path in paths:
+        hoplite.records.unpack(path, output)
+
+
+def session_settings(args):
+    """Build the session settings from the command line arguments.
     """
-    mr_if = hoplite.ppadb_runner.PurePythonAdbInterface(serial)
-    observer = hoplite.vision.observer.Observer(mr_if)
-    actuator = hoplite.actuator.Actuator(mr_if)
-    brain = hoplite.brain.Brain()
     starting_prayers = list()
-    for prayer in prayers.strip().split(","):
+    for prayer in args.prayers.strip().split(","):
         if prayer == "":
             continue
         starting_prayers.append(hoplite.game.status.Prayer(int(prayer)))
-    recorder = None
-    if record:
-        recorder = hoplite.controller.Recorder(observer)
-        recorder.start()
-    controller = hoplite.controller.Controller(observer, actuator, brain,
-                                               starting_prayers,
-                                               recorder=recorder)
-    mr_if.open()
+    return hoplite.fleet.SessionSettings(
+        starting_prayers,
+        args.record,
+        args.capture,
+        args.pipeline,
+        args.input == "shell",
+        args.record_pending,
+        args.record_policy
+    )
+
+
+def play(serial: str, settings):
+    """Play with the monkey runner interface.
+    """
     try:
-        controller.run()
+        hoplite.fleet.play_session(serial, settings)
     except KeyboardInterrupt:
         logging.warning("Interrupting with keyboard")
-    finally:
-        try:
-            mr_if.close()
-        except KeyboardInterrupt:
-            pass
+
+
+def fleet(serials, settings, sessions):
+    """Play on several devices at once, and print a summary of the sessions.
+    """
+    runner = hoplite.fleet.Fleet(serials, settings, sessions)
+    runner.run()
+    print(runner.summary())
+
+
+def simulate(games, seed, max_turns, prayers):
+    """Play simulated games without a device, and print a summary.
+    """
+    starting_prayers = list()
+    for prayer in prayers.strip().split(","):
+        if prayer != "":
+            starting_prayers.append(hoplite.game.status.Prayer(int(prayer)))
+    reports = hoplite.sim.simulate(
+        hoplite.brain.Brain,
+        range(seed, seed + games),
+        max_turns,
+        starting_prayers
+    )
+    print(hoplite.sim.summarize(reports))
+
+
+def bench(paths, output, baseline, threshold):
+    """Time the playing pipeline over recordings, and compare the results
+    with a previous run. Exits with an error if a regression is found.
+    """
+    benchmark = hoplite.bench.Benchmark()
+    recordings = hoplite.bench.find_recordings(paths)
+    if len(recordings) == 0:
+        logging.error("No recording found in %s", ", ".join(paths))
+        sys.exit(1)
+    for folder in recordings:
+        benchmark.run_recording(folder)
+    results = benchmark.results()
+    print(hoplite.bench.format_results(results))
+    if output is not None:
+        with open(output, "w") as file:
+            json.dump(results, file, indent=4)
+    if baseline is not None:
+        with open(baseline, "r") as file:
+            comparison = hoplite.bench.compare(results, json.load(file), threshold)
+        print()
+        print(hoplite.bench.format_comparison(comparison))
+        if any(regression for *_, regression in comparison):
+            sys.exit(1)
 
 
 def parse(args):
@@ -100,7 +137,7 @@ def parse(args):
     if os.path.isfile(args.input):
         parser = hoplite.vision.observer.ScreenParser(save_parts=args.save_parts)
         stream = parser.read_stream(args.input)
-        interface = hoplite.vision.classifiers.interface(stream)
+        interface = parser.observe_interface(stream)
         if interface == hoplite.game.state.Interface.ALTAR:
             altar = parser.observe_altar(stream)
             print("Found an altar with the following prayers:", altar)
@@ -129,7 +166,7 @@ def parse(args):
         game.terrain.render(show_ranges=args.show_ranges)
 
 
-def main():
+def main():  # pylint: disable=R0915
     """Argument parsing and action taking.
     """
     description = "\n".join((
@@ -153,23 +190,125 @@ def main():
         help="no logging output"
     )
     subparsers = parser.add_subparsers(dest="action", required=True)
-    play_parser = subparsers.add_parser("play")
-    parser.add_argument(
+    session_parser = argparse.ArgumentParser(add_help=False)
+    session_parser.add_argument(
+        "--prayers",
+        type=str,
+        help="comma separated prayer index",
+        default="",
+    )
+    session_parser.add_argument(
+        "-r", "--record",
+        action="store_true",
+        help="record the game"
+    )
+    session_parser.add_argument(
+        "--record-policy",
+        type=str,
+        choices=hoplite.controller.Recorder.POLICIES,
+        help="when the recorder falls behind: block waits for it, drop skips "
+             "screenshots but keeps the log lines",
+        default="block"
+    )
+    session_parser.add_argument(
+        "--record-pending",
+        type=int,
+        help="maximum number of screenshots waiting to be written",
+        default=8
+    )
+    session_parser.add_argument(
+        "-c", "--capture",
+        type=str,
+        choices=hoplite.vision.observer.Observer.CAPTURE_MODES,
+        help="screenshot format: raw skips PNG encoding and decoding",
+        default="png"
+    )
+    session_parser.add_argument(
+        "--pipeline",
+        type=str,
+        choices=sorted(hoplite.fleet.CONTROLLERS),
+        help="controller: async searches the next move speculatively while "
+             "waiting for the screen to settle",
+        default="sync"
+    )
+    session_parser.add_argument(
+        "--input",
+        type=str,
+        choices=["shell", "tap"],
+        help="touch injection: shell keeps one shell session open for all "
+             "touches, tap opens a new one for each touch",
+        default="shell"
+    )
+    play_parser = subparsers.add_parser("play", parents=[session_parser])
+    play_parser.add_argument(
         "serial",
         type=str,
+        nargs="?",
         help="adb serial of device",
         default=None
     )
-    play_parser.add_argument(
+    fleet_parser = subparsers.add_parser("fleet", parents=[session_parser])
+    fleet_parser.add_argument(
+        "serials",
+        type=str,
+        nargs="+",
+        help="adb serials of the devices"
+    )
+    fleet_parser.add_argument(
+        "-n", "--sessions",
+        type=int,
+        help="number of sessions to play on each device, unlimited by default",
+        default=None
+    )
+    simulate_parser = subparsers.add_parser("simulate")
+    simulate_parser.add_argument(
+        "-n", "--games",
+        type=int,
+        help="number of games to play",
+        default=10
+    )
+    simulate_parser.add_argument(
+        "--seed",
+        type=int,
+        help="seed of the first game, the next games using the next seeds",
+        default=0
+    )
+    simulate_parser.add_argument(
+        "--max-turns",
+        type=int,
+        help="number of turns after which a game is stopped",
+        default=1000
+    )
+    simulate_parser.add_argument(
         "--prayers",
         type=str,
         help="comma separated prayer index",
         default="",
     )
-    play_parser.add_argument(
-        "-r", "--record",
-        action="store_true",
-        help="record the game"
+    bench_parser = subparsers.add_parser("bench")
+    bench_parser.add_argument(
+        "paths",
+        type=str,
+        nargs="+",
+        help="recording folders, or folders containing recordings"
+    )
+    bench_parser.add_argument(
+        "-o", "--output",
+        type=str,
+        help="path to save the results to, as JSON",
+        default=None
+    )
+    bench_parser.add_argument(
+        "-b", "--baseline",
+        type=str,
+        help="path to the JSON results of a previous run to compare with",
+        default=None
+    )
+    bench_parser.add_argument(
+        "-t", "--threshold",
+        type=float,
+        help="relative slowdown above which a percentile is a regression",
+        default=hoplite.bench.DEFAULT_THRESHOLD
     )
     parse_parser = subparsers.add_parser("parse")
     parse_parser.add_argument(
@@ -222,7 +361,38 @@ def main():
         help="move target y"
     )
     check_parser = subparsers.add_parser("check")
-    check_parser.add_argument("-i", "--input", type=str, help="path to the log file to check")
+    check_parser.add_argument(
+        "-i", "--input",
+        type=str,
+        nargs="+",
+        help="log files, folders containing logs, or glob patterns of either",
+        default=[hoplite.controller.Recorder.DIRECTORY]
+    )
+    check_parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        help="number of worker processes, defaults to the number of processors",
+        default=None
+    )
+    check_parser.add_argument(
+        "--json",
+        action="store_true",
+        help="print the results as JSON"
+    )
+    convert_parser = subparsers.add_parser("convert")
+    convert_parser.add_argument(
+        "paths",
+        type=str,
+        nargs="+",
+        help="text game logs, folders or glob patterns to pack, or binary files to unpack"
+    )
+    convert_parser.add_argument(
+        "-o", "--output",
+        type=str,
+        required=True,
+        help="binary file to pack into, if it ends with %s, else folder to unpack into"
+             % hoplite.records.EXTENSION
+    )
     args = parser.parse_args()
     log_level = logging.INFO
     if args.verbose:
@@ -233,11 +403,20 @@ def main():
         log_level = logging.CRITICAL
     logging.basicConfig(level=log_level)
     if args.action == "play":
-        play(args.serial, args.prayers, args.record)
+        play(args.serial, session_settings(args))
+    elif args.action == "fleet":
+        fleet(args.serials, session_settings(args), args.sessions)
+    elif args.action == "simulate":
+        simulate(args.games, args.seed, args.max_turns, args.prayers)
+    elif args.action == "bench":
+        bench(args.paths, args.output, args.baseline, args.threshold)
     elif args.action == "parse":
         parse(args)
     elif args.action == "check":
-        check(args.input)
+        check(args.input, args.jobs, args.json)
+    elif args.action == "convert":
+        convert(args.paths, args.output)
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -92,8 +92,7 @@ class Actuator:
             Screen position of the button to touch.
 
         """
-        self.monkey.touch(*button)
-        self.monkey.touch(*hexagonal_to_pixels(target))
+        self.monkey.touch_sequence([button, hexagonal_to_pixels(target)])
 
     def leap(self, target):
         """Perform a leap move.
@@ -0,0 +1,247 @@
+"""Benchmark of the playing pipeline over recorded games, see
+`hoplite.controller.Recorder`. Each logged move replays the parsing of its
+screenshot, the enumeration and the application of the legal moves, and the
+decision of the brain. Results can be saved as JSON, and compared with a
+previous run to detect regressions.
+"""
+
+import os
+import time
+import logging
+import collections
+import numpy
+import hoplite
+import hoplite.brain
+import hoplite.controller
+import hoplite.game.state
+import hoplite.vision.observer
+
+
+LOGGER = logging.getLogger(__name__)
+
+METRICS = ("observe_game", "possible_moves", "apply", "pick_move")
+"""tuple[str]: Timed operations, in the order they are reported."""
+
+PERCENTILES = (50, 95, 99)
+
+DEFAULT_THRESHOLD = .1
+"""float: Relative slowdown of a percentile above which a metric is reported
+as a regression."""
+
+
+def find_recordings(paths):
+    """Find the recordings within some paths.
+
+    Parameters
+    ----------
+    paths : list[str]
+        Recording folders, or folders containing recordings at any depth.
+
+    Returns
+    -------
+    list[str]
+        Folders containing a game log, sorted by path.
+
+    """
+    folders = set()
+    for path in paths:
+        for root, _, files in os.walk(path):
+            if hoplite.controller.Recorder.FILENAME in files:
+                folders.add(root)
+    return sorted(folders)
+
+
+def read_moves(folder):
+    """Read the move records of a recording.
+
+    Parameters
+    ----------
+    folder : str
+        Path to the recording folder.
+
+    Returns
+    -------
+    list[tuple[str, str, str]]
+        Turn, game state and move strings of each move record, in order.
+
+    """
+    records = list()
+    with open(os.path.join(folder, hoplite.controller.Recorder.FILENAME), "r") as file:
+        for line in file:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) == 4 and fields[1] == "move":
+                records.append((fields[0], fields[2], fields[3]))
+    return records
+
+
+class Benchmark:
+    """Timer of the playing pipeline over recordings.
+
+    Attributes
+    ----------
+    timings : dict[str, list[float]]
+        Durations of each call, in seconds, for each metric of `METRICS`.
+    recordings : list[str]
+        Recordings benchmarked so far.
+
+    """
+
+    def __init__(self):
+        self.timings = collections.defaultdict(list)
+        self.recordings = list()
+
+    def run_recording(self, folder):
+        """Replay a recording. A new parser and a new brain are used, so that
+        their caches start cold, as at the beginning of a game.
+
+        Parameters
+        ----------
+        folder : str
+            Path to the recording folder.
+
+        """
+        LOGGER.info("Benchmarking %s", folder)
+        parser = hoplite.vision.observer.ScreenParser()
+        brain = hoplite.brain.Brain()
+        for turn, state_string, _ in read_moves(folder):
+            path = os.path.join(folder, turn + ".png")
+            if os.path.isfile(path):
+                array = parser.read_stream(path)
+                time_start = time.perf_counter()
+                parser.observe_game(array)
+                self.timings["observe_game"].append(time.perf_counter() - time_start)
+            state = hoplite.game.state.GameState.from_string(state_string)
+            time_start = time.perf_counter()
+            moves = list(state.possible_moves())
+            self.timings["possible_moves"].append(time.perf_counter() - time_start)
+            for move in moves:
+                time_start = time.perf_counter()
+                move.apply(state)
+                self.timings["apply"].append(time.perf_counter() - time_start)
+            if moves:
+                time_start = time.perf_counter()
+                brain.pick_move(state)
+                self.timings["pick_move"].append(time.perf_counter() - time_start)
+        self.recordings.append(folder)
+
+    def results(self):
+        """Aggregate the timings.
+
+        Returns
+        -------
+        dict
+            Results, with the version of the package, the benchmarked
+            recordings, and for each metric the number of calls, the total
+            duration in seconds, the percentiles of `PERCENTILES` in
+            milliseconds, and the throughput in calls per second.
+
+        """
+        metrics = dict()
+        for name in METRICS:
+            durations = self.timings.get(name)
+            if not durations:
+                continue
+            total = float(numpy.sum(durations))
+            metric = {"count": len(durations), "total": total}
+            for percentile, value in zip(
+                    PERCENTILES, numpy.percentile(durations, PERCENTILES)):
+                metric["p%d" % percentile] = 1000 * float(value)
+            metric["throughput"] = len(durations) / max(total, 1e-9)
+            metrics[name] = metric
+        return {
+            "version": hoplite.__version__,
+            "recordings": self.recordings,
+            "metrics": metrics,
+        }
+
+
+def format_results(results):
+    """Format benchmark results as a table.
+
+    Parameters
+    ----------
+    results : dict
+        Results returned by `Benchmark.results`.
+
+    Returns
+    -------
+    str
+        One line per metric.
+
+    """
+    lines = ["%-16s %8s %10s %10s %10s %12s" % (
+        "metric", "count", "p50 (ms)", "p95 (ms)", "p99 (ms)", "calls/s")]
+    for name, metric in results["metrics"].items():
+        lines.append("%-16s %8d %10.3f %10.3f %10.3f %12.1f" % (
+            name,
+            metric["count"],
+            metric["p50"],
+            metric["p95"],
+            metric["p99"],
+            metric["throughput"]
+        ))
+    return "\n".join(lines)
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compare benchmark results with a baseline.
+
+    Parameters
+    ----------
+    results : dict
+        Results returned by `Benchmark.results`.
+    baseline : dict
+        Results of a previous run, in the same format.
+    threshold : float
+        Relative slowdown of a percentile above which it is a regression.
+
+    Returns
+    -------
+    list[tuple[str, str, float, float, bool]]
+        Metric name, percentile name, baseline and current values (in
+        milliseconds), and whether it is a regression, for each percentile
+        of the metrics present in both results.
+
+    """
+    comparison = list()
+    for name, metric in results["metrics"].items():
+        reference = baseline["metrics"].get(name)
+        if reference is None:
+            continue
+        for percentile in PERCENTILES:
+            key = "p%d" % percentile
+            comparison.append((
+                name,
+                key,
+                reference[key],
+                metric[key],
+                metric[key] > reference[key] * (1 + threshold)
+            ))
+    return comparison
+
+
+def format_comparison(comparison):
+    """Format a comparison as a table.
+
+    Parameters
+    ----------
+    comparison : list[tuple[str, str, float, float, bool]]
+        Comparison returned by `compare`.
+
+    Returns
+    -------
+    str
+        One line per metric percentile.
+
+    """
+    lines = ["%-16s %4s %12s %12s %8s" % ("metric", "", "baseline", "current", "change")]
+    for name, key, reference, value, regression in comparison:
+        lines.append("%-16s %4s %12.3f %12.3f %+7.1f%%%s" % (
+            name,
+            key,
+            reference,
+            value,
+            100 * (value / max(reference, 1e-9) - 1),
+            " REGRESSION" if regression else ""
+        ))
+    return "\n".join(lines)
@@ -3,41 +3,264 @@
 
 import logging
 import numpy
+import hoplite.game.bitboard
 import hoplite.game.demons
+import hoplite.game.moves
 import hoplite.game.status
+import hoplite.game.terrain
 
 
 LOGGER = logging.getLogger(__name__)
 
 
-def extract_distance_feature(game_state, target):
-    """Wrapper for a distance to tile feature.
+DEMON_LAYERS = {
+    hoplite.game.demons.DemonSkill.FOOTMAN: (
+        hoplite.game.terrain.SurfaceElement.FOOTMAN,
+    ),
+    hoplite.game.demons.DemonSkill.ARCHER: (
+        hoplite.game.terrain.SurfaceElement.ARCHER,
+    ),
+    hoplite.game.demons.DemonSkill.DEMOLITIONIST: (
+        hoplite.game.terrain.SurfaceElement.DEMOLITIONIST_HOLDING_BOMB,
+        hoplite.game.terrain.SurfaceElement.DEMOLITIONIST_WITHOUT_BOMB,
+    ),
+    hoplite.game.demons.DemonSkill.WIZARD: (
+        hoplite.game.terrain.SurfaceElement.WIZARD_CHARGED,
+        hoplite.game.terrain.SurfaceElement.WIZARD_DISCHARGED,
+    ),
+}
+
+
+class DangerMap:
+    """Lower bound of the damage the player takes when ending a move on each
+    tile, computed once per turn from the threat map of the terrain, see
+    `hoplite.game.terrain.Terrain.threat_map`. It counts the bombs next to
+    the tile, and the footmen, archers and charged wizards that can hit it
+    and that no bomb blast can kill. Killing demons can only open more lines
+    of fire, so that the demons the move itself can not kill deal at least
+    the bound. The bound only depends on the tile and on the demons the move
+    may kill, so that moves sharing both always get the same bound: it only
+    prunes lethal moves, and never ranks moves against each other.
 
     Parameters
     ----------
     game_state : hoplite.game.state.GameState
-        State of the game to compute the path.
-    target : hoplite.utils.HexagonalCoordinates
-        Target tile for the player.
-
-    Returns
-    -------
-    int
-        Length of the sorthest path to the target. If the target is `None`,
-        the returned length is 0 (no target means no penalty). If the target
-        is unreachable (which can occur if the player is blocked for instance),
-        a default length of 20 is returned.
+        State the moves start from.
+
+    Attributes
+    ----------
+    attackers : list[int]
+        Mask of the demons that will attack the player on each tile unless
+        the move kills them, indexed by tile index.
+    bombs : int
+        Mask of the bombs.
+    game_state
 
     """
-    if target is None:
-        return 0
-    path = game_state.terrain.pathfind(game_state.terrain.player, target)
-    if path is None:
-        return 20
-    return len(path)
 
+    def __init__(self, game_state):
+        self.game_state = game_state
+        board = game_state.terrain.board
+        self.bombs = board.get(hoplite.game.terrain.SurfaceElement.BOMB)
+        blasted = 0
+        for index in hoplite.game.bitboard.iter_bits(self.bombs):
+            blasted |= hoplite.game.bitboard.NEIGHBOR_MASKS[index]
+        active = board.demons & ~blasted\
+            & ~board.get(hoplite.game.terrain.SurfaceElement.WIZARD_DISCHARGED)\
+            & ~board.get(hoplite.game.terrain.SurfaceElement.DEMOLITIONIST_HOLDING_BOMB)\
+            & ~board.get(hoplite.game.terrain.SurfaceElement.DEMOLITIONIST_WITHOUT_BOMB)
+        self.attackers = [
+            attackers & active
+            for attackers in game_state.terrain.threat_map().attackers
+        ]
+
+    def _reach(self, move):
+        """Tile the player ends the move on, and mask of the demons the move
+        may kill, `None` for moves that are not bounded.
+        """
+        terrain = self.game_state.terrain
+        origin = hoplite.game.bitboard.TILE_INDEX[terrain.player]
+        if isinstance(move, (hoplite.game.moves.WalkMove, hoplite.game.moves.LeapMove)):
+            target = hoplite.game.bitboard.TILE_INDEX[move.target]
+            killable = hoplite.game.bitboard.NEIGHBOR_MASKS[origin]\
+                & hoplite.game.bitboard.NEIGHBOR_MASKS[target]
+            direction = terrain.player.gradient(move.target)
+            lunged = move.target + direction
+            for pos in (lunged, lunged + direction):
+                if pos in hoplite.game.bitboard.TILE_INDEX:
+                    killable |= 1 << hoplite.game.bitboard.TILE_INDEX[pos]
+            return target, killable
+        if isinstance(move, hoplite.game.moves.ThrowMove):
+            return origin, 1 << hoplite.game.bitboard.TILE_INDEX[move.target]
+        if isinstance(move, (hoplite.game.moves.AltarMove, hoplite.game.moves.IdleMove)):
+            return origin, 0
+        return None, None
+
+    def minimum_damage(self, move):
+        """Compute a lower bound of the damage the player takes during a
+        move. Bashes push demons and bombs around, and are not bounded.
+
+        Parameters
+        ----------
+        move : hoplite.game.moves.PlayerMove
+            Legal move from `game_state`.
+
+        Returns
+        -------
+        int
+            Number of hearts the player loses at least.
+
+        """
+        target, killable = self._reach(move)
+        if target is None:
+            return 0
+        return hoplite.game.bitboard.popcount(self.attackers[target] & ~killable)\
+            + hoplite.game.bitboard.popcount(
+                hoplite.game.bitboard.NEIGHBOR_MASKS[target] & self.bombs)
+
+    def is_lethal(self, move):
+        """Check whether a move certainly kills the player.
+
+        Parameters
+        ----------
+        move : hoplite.game.moves.PlayerMove
+            Legal move from `game_state`.
+
+        Returns
+        -------
+        bool
+            Whether the damage bound is at least the player health. A kill
+            completing a spree with the regeneration prayer, which heals the
+            player after the damage, is never ruled out.
+
+        """
+        status = self.game_state.status
+        if hoplite.game.status.Prayer.REGENERATION in status.prayers\
+                and status.spree == 2:
+            return False
+        return self.minimum_damage(move) >= status.health
+
+
+class TranspositionEntry:  # pylint: disable=R0903
+    """Stored result of the evaluation of a position.
 
-class Brain:
+    Attributes
+    ----------
+    key : int
+        Zobrist key of the position, see `hoplite.game.state.GameState.key`.
+    evaluation : float
+        Evaluation of the position.
+    best_move : hoplite.game.moves.PlayerMove
+        Best move found from the position, `None` if it was not searched.
+    depth : int
+        Depth of the search the evaluation results from, 0 for a static
+        evaluation.
+
+    """
+
+    def __init__(self, key, evaluation, best_move, depth):
+        self.key = key
+        self.evaluation = evaluation
+        self.best_move = best_move
+        self.depth = depth
+
+
+class TranspositionTable:
+    """Fixed-size memory of position evaluations, indexed by Zobrist keys.
+
+    Each bucket holds two entries. The first one keeps the deepest
+    evaluation that was stored in the bucket, the second one the most recent
+    one, so that shallow evaluations neither evict deep searches nor get
+    lost immediately.
+
+    Parameters
+    ----------
+    size : int
+        Number of buckets, rounded down to a power of two.
+
+    Attributes
+    ----------
+    hits : int
+        Number of successful lookups.
+    misses : int
+        Number of failed lookups.
+
+    """
+
+    def __init__(self, size=1 << 16):
+        self.hits = 0
+        self.misses = 0
+        self._mask = (1 << (size.bit_length() - 1)) - 1
+        self._deep = [None] * (self._mask + 1)
+        self._recent = [None] * (self._mask + 1)
+
+    def __len__(self):
+        return sum(entry is not None for entry in self._deep)\
+            + sum(entry is not None for entry in self._recent)
+
+    def clear(self):
+        """Remove all entries and reset the counters.
+        """
+        self.hits = 0
+        self.misses = 0
+        self._deep = [None] * (self._mask + 1)
+        self._recent = [None] * (self._mask + 1)
+
+    def lookup(self, key, depth=0, exact=False):
+        """Find the entry of a position.
+
+        Parameters
+        ----------
+        key : int
+            Zobrist key of the position.
+        depth : int
+            Minimum search depth of the entry.
+        exact : bool
+            Whether the search depth of the entry must be exactly `depth`.
+
+        Returns
+        -------
+        TranspositionEntry
+            Stored entry, `None` if the position is not in the table or was
+            not searched at the required depth.
+
+        """
+        index = key & self._mask
+        for entry in (self._deep[index], self._recent[index]):
+            if entry is not None and entry.key == key\
+                    and (entry.depth == depth if exact else entry.depth >= depth):
+                self.hits += 1
+                return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, evaluation, best_move=None, depth=0):
+        """Store the evaluation of a position.
+
+        Parameters
+        ----------
+        key : int
+            Zobrist key of the position.
+        evaluation : float
+            Evaluation of the position.
+        best_move : hoplite.game.moves.PlayerMove
+            Best move found from the position, if any.
+        depth : int
+            Depth of the search the evaluation results from.
+
+        """
+        index = key & self._mask
+        entry = TranspositionEntry(key, evaluation, best_move, depth)
+        deep = self._deep[index]
+        if deep is None or depth >= deep.depth:
+            self._deep[index] = entry
+            if deep is not None and (deep.key, deep.depth) != (key, depth):
+                self._recent[index] = deep
+        else:
+            self._recent[index] = entry
+
+
+class Brain:  # pylint: disable=R0902
     """Brain central unit: makes decisions.
 
     Attributes
@@ -46,8 +269,18 @@ class Brain:
         Estimated dangerosity of demons.
     weights : numpy.ndarray
         Vector with the weights for the game state features.
-    loops : dict[hoplite.game.state.GameState, list[hoplite.game.moves.PlayerMove]]
-        Memory of already played moves, enabling loops avoidance.
+    loops : dict[hoplite.game.state.GameState, set[hoplite.game.moves.PlayerMove]]
+        Memory of already played moves, enabling loops avoidance, see
+        `remember_move`.
+    table : TranspositionTable
+        Memory of evaluated positions. It must be cleared whenever the
+        weights are modified.
+    considered : int
+        Number of legal moves considered by `pick_move` so far, after loop
+        avoidance.
+    pruned : int
+        Number of considered moves that were pruned as lethal without being
+        evaluated.
 
     """
 
@@ -90,6 +323,79 @@ class Brain:
             hoplite.game.status.Prayer.STAGGERING_LEAP: -1,
         }
         self.loops = dict()
+        self.table = TranspositionTable()
+        self.considered = 0
+        self.pruned = 0
+        self._no_target = numpy.full(hoplite.game.bitboard.TILE_COUNT, -1.)
+
+    def _gather(self, game_state):
+        """Raw values the features of a state are computed from, collected
+        while the state is at hand, see `_batch_features`.
+        """
+        terrain = game_state.terrain
+        status = game_state.status
+        layers = terrain.board.layers
+        return (
+            status.health,
+            status.energy,
+            status.cooldown,
+            hoplite.game.bitboard.TILE_INDEX[terrain.player],
+            layers[hoplite.game.terrain.SurfaceElement.GROUND.value],
+            (
+                terrain.stairs,
+                terrain.portal,
+                terrain.fleece,
+                terrain.altar if terrain.altar_prayable else None,
+                None if status.spear else terrain.spear,
+            ),
+            tuple(
+                sum(layers[element.value] for element in elements)
+                for elements in DEMON_LAYERS.values()
+            ),
+        )
+
+    def _distances(self, players, walkables, targets):
+        """Path lengths from the players to each of their targets, looked up
+        all at once in the distance fields of the batch: the number of steps
+        plus one, or 20 if the target can not be reached (if the player is
+        blocked for instance). Lengths are 0 without a target, as no target
+        means no penalty.
+        """
+        rows = dict()
+        indices = numpy.array([
+            rows.setdefault((walkable, target), len(rows))
+            for walkable, row in zip(walkables, targets) for target in row
+        ]).reshape(len(players), -1)
+        table = numpy.array([
+            hoplite.game.terrain.walking_distance_array(walkable, target)
+            if target in hoplite.game.bitboard.TILE_INDEX else self._no_target
+            for walkable, target in rows
+        ])
+        distances = table[indices, numpy.array(players)[:, numpy.newaxis]]
+        return numpy.where(numpy.isnan(distances), 20, distances + 1)
+
+    def _batch_features(self, raws):
+        """Compute the features of a batch of states from their raw values,
+        see `_gather`, with one vectorized operation per column.
+        """
+        features = numpy.zeros((len(raws), len(self.weights)))
+        if not raws:
+            return features
+        health, energy, cooldown, players, walkables, targets, masks = zip(*raws)
+        health = numpy.array(health, dtype=float)
+        features[:, 0] = health == 0  # from 0 to 1
+        features[:, 1] = .125 * health  # from 0 to 8
+        features[:, 2] = .01 * numpy.array(energy, dtype=float)  # usually around 100
+        features[:, 3] = .25 * numpy.array(cooldown, dtype=float)  # from 0 to 4
+        counts = hoplite.game.bitboard.popcounts(
+            mask for row in masks for mask in row).reshape(len(raws), -1)
+        danger = 0
+        for i, skill in enumerate(DEMON_LAYERS):
+            danger = danger + self.demon_weights[skill] * counts[:, i]
+        features[:, 4] = .04 * danger  # depth 1 starts with 4, depth 16 starts with 28
+        # if no obstacle, path at the beginning is 9 tiles long
+        features[:, 5:] = .11 * self._distances(players, walkables, targets)
+        return features
 
     def extract(self, game_state):
         """Extract features of a game state. Values are manually scaled to
@@ -106,28 +412,34 @@ class Brain:
             Vector with extracted features.
 
         """
-        features = [
-            int(game_state.status.health == 0),  # from 0 to 1
-            .125 * game_state.status.health,  # from 0 to 8
-            .01 * game_state.status.energy,  # usually around 100, but possibly above
-            .25 * game_state.status.cooldown,  # from 0 to 4
-            .04 * sum(map(  # depth 1 starts with 4, depth 16 starts with 28
-                lambda demon: self.demon_weights[demon.skill],
-                game_state.terrain.demons.values()
-            )),
-            # if no obstacle, path at the beginning is 9 tiles long
-            .11 * extract_distance_feature(game_state, game_state.terrain.stairs),
-            .11 * extract_distance_feature(game_state, game_state.terrain.portal),
-            .11 * extract_distance_feature(game_state, game_state.terrain.fleece),
-            .11 * extract_distance_feature(game_state, game_state.terrain.altar)
-            * int(game_state.terrain.altar_prayable),
-            .11 * extract_distance_feature(game_state, game_state.terrain.spear)
-            * (1 - int(game_state.status.spear)),
-        ]
-        return numpy.array(features)
+        return self._batch_features([self._gather(game_state)])[0]
+
+    def extract_batch(self, game_states):
+        """Extract the features of several game states at once.
+
+        Parameters
+        ----------
+        game_states : List[hoplite.game.state.GameState]
+            States to extract the features of.
+
+        Returns
+        -------
+        numpy.ndarray
+            Matrix of shape `(len(game_states), len(self.weights))`, with the
+            features of each state as a row.
+
+        """
+        return self._batch_features([self._gather(game_state) for game_state in game_states])
 
     def _evaluate(self, features):
-        return features.dot(self.weights)
+        # Weighted sum computed feature by feature over all the rows at once,
+        # instead of with numpy.dot, whose rounding depends on the number and
+        # position of the rows: equal states must get equal evaluations, for
+        # ties between moves to be broken in a stable manner.
+        evaluation = features[..., 0] * self.weights[0]
+        for i in range(1, len(self.weights)):
+            evaluation = evaluation + features[..., i] * self.weights[i]
+        return evaluation
 
     def evaluate(self, game_state):
         """Extract the features and evaluate a game state.
@@ -143,7 +455,89 @@ class Brain:
             Evaluation of the game state.
 
         """
-        return self._evaluate(self.extract(game_state))
+        key = game_state.key
+        entry = self.table.lookup(key, 0, exact=True)
+        if entry is not None:
+            return entry.evaluation
+        evaluation = self._evaluate(self.extract(game_state))
+        self.table.store(key, evaluation)
+        return evaluation
+
+    def evaluate_batch(self, game_states):
+        """Evaluate several game states at once.
+
+        Parameters
+        ----------
+        game_states : List[hoplite.game.state.GameState]
+            States to evaluate.
+
+        Returns
+        -------
+        numpy.ndarray
+            Evaluation of each game state.
+
+        """
+        keys, evaluations, rows = list(), list(), list()
+        for game_state in game_states:
+            self._lookup(game_state, keys, evaluations, rows)
+        return self._complete(keys, evaluations, rows)
+
+    def _lookup(self, game_state, keys, evaluations, rows):
+        """Look a state up in the transposition table, appending its key and
+        stored evaluation, or the raw values of its features if it is missing.
+        """
+        key = game_state.key
+        entry = self.table.lookup(key, 0, exact=True)
+        keys.append(key)
+        if entry is None:
+            evaluations.append(None)
+            rows.append(self._gather(game_state))
+        else:
+            evaluations.append(entry.evaluation)
+
+    def _complete(self, keys, evaluations, rows):
+        """Evaluate all the missing states of a batch with a single
+        vectorized operation, and store them in the transposition table.
+        """
+        scores = iter(self._evaluate(self._batch_features(rows)))
+        for i, key in enumerate(keys):
+            if evaluations[i] is None:
+                evaluations[i] = next(scores)
+                self.table.store(key, evaluations[i])
+        return numpy.array(evaluations, dtype=float)
+
+    def _candidates(self, game_state):
+        """Legal moves worth evaluating: moves already played from the same
+        state are skipped to avoid loops, and moves certainly killing the
+        player are pruned, see `DangerMap`. If no move is left, the moves
+        are kept anyway.
+        """
+        moves = list(game_state.possible_moves())
+        played = self.loops.get(game_state, set())
+        candidates = [move for move in moves if move not in played]
+        if len(candidates) < len(moves):
+            LOGGER.debug("Ignoring %d moves to avoid loops", len(moves) - len(candidates))
+        if not candidates:
+            LOGGER.debug("Every move was played already, allowing loops")
+            candidates = moves
+        self.considered += len(candidates)
+        board = game_state.terrain.board
+        if hoplite.game.bitboard.popcount(board.demons)\
+                + hoplite.game.bitboard.popcount(
+                    board.get(hoplite.game.terrain.SurfaceElement.BOMB))\
+                < game_state.status.health:
+            # Not enough demons and bombs to kill the player this turn
+            return candidates
+        danger = DangerMap(game_state)
+        safe = [move for move in candidates if not danger.is_lethal(move)]
+        if not safe:
+            LOGGER.debug("Every move is lethal, evaluating them all")
+            return candidates
+        self.pruned += len(candidates) - len(safe)
+        if len(safe) < len(candidates):
+            LOGGER.info("Pruned %d lethal moves out of %d", len(candidates) - len(safe),
+                        len(candidates))
+        return safe
 
     def pick_move(self, game_state):
         """Pick the best move for the player to perform.
@@ -159,22 +553,37 @@ class Brain:
             Best legal move to perform according the the model.
 
         """
-        outcomes = dict()
-        for move in game_state.possible_moves():
+        keys, evaluations, rows = list(), list(), list()
+        moves = self._candidates(game_state)
+        for move in moves:
             LOGGER.debug("Checking move: %s", move)
-            if move in self.loops.get(game_state, []):
-                LOGGER.debug("Ignoring move %s to avoid loops", move)
-                continue
-            next_state = move.apply(game_state)
-            evaluation = self.evaluate(next_state)
+            record = move.make(game_state)
+            self._lookup(game_state, keys, evaluations, rows)
+            move.unmake(game_state, record)
+        outcomes = dict()
+        for move, evaluation in zip(moves, self._complete(keys, evaluations, rows)):
             outcomes[move] = evaluation
             LOGGER.debug("Evaluation of %s: %f", move, evaluation)
         best_move = max(outcomes.items(), key=lambda x: x[1])[0]
-        self.loops.setdefault(game_state, set())
-        self.loops[game_state].add(best_move)
         LOGGER.info("Best move found: %s", best_move)
         return best_move
 
+    def remember_move(self, game_state, move):
+        """Remember that a move was played from a state, so that `pick_move`
+        avoids playing it again from the same state. Picking a move does not
+        remember it, so that moves can be picked for states that may never
+        be reached.
+
+        Parameters
+        ----------
+        game_state : hoplite.game.state.GameState
+            State the move was played from. A copy is kept.
+        move : hoplite.game.moves.PlayerMove
+            Move that was played.
+
+        """
+        self.loops.setdefault(game_state.copy(), set()).add(move)
+
     def pick_prayer(self, altar_state):
         """Pick the best prayer to select from an altar.
 
@@ -0,0 +1,256 @@
+"""Check of the move model against recorded games: the state predicted by
+applying each logged move is compared to the next logged state. Logs are
+streamed record by record, and spread over worker processes when there are
+several of them.
+"""
+
+import os
+import glob
+import logging
+import concurrent.futures
+import hoplite.controller
+import hoplite.game.moves
+import hoplite.game.state
+import hoplite.records
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def find_logs(paths):
+    """Find the game logs designated by some paths.
+
+    Parameters
+    ----------
+    paths : list[str]
+        Log files, folders containing logs at any depth, or glob patterns of
+        either. Binary logs are found by their `hoplite.records.EXTENSION`.
+
+    Returns
+    -------
+    list[str]
+        Paths of the log files, sorted, without duplicates.
+
+    """
+    logs = set()
+    for pattern in paths:
+        for path in glob.glob(pattern, recursive=True) or [pattern]:
+            if os.path.isdir(path):
+                for root, _, files in os.walk(path):
+                    logs.update(
+                        os.path.join(root, filename)
+                        for filename in files
+                        if filename == hoplite.controller.Recorder.FILENAME
+                        or filename.endswith(hoplite.records.EXTENSION)
+                    )
+            elif os.path.isfile(path):
+                logs.add(path)
+            else:
+                LOGGER.warning("No game log found at %s", path)
+    return sorted(logs)
+
+
+def iter_moves(path):
+    """Read the move records of a game log lazily. Logs may be text or
+    binary, see `hoplite.records`.
+
+    Parameters
+    ----------
+    path : str
+        Path to the game log.
+
+    Returns
+    -------
+    Iterator[tuple[int, hoplite.game.state.GameState, hoplite.game.moves.PlayerMove]]
+        Turn, game state and move of the move records. Any other record, and
+        the start of each game of a binary file, yields `None`, as it breaks
+        the sequence of moves.
+
+    """
+    if hoplite.records.is_record_file(path):
+        with hoplite.records.RecordFile(path) as records:
+            for i in range(len(records)):
+                yield None
+                for record in records.game(i):
+                    if record["kind"] != 0:
+                        yield None
+                        continue
+                    yield (
+                        int(record["turn"]),
+                        hoplite.records.decode_state(record),
+                        hoplite.records.decode_move(record)
+                    )
+        return
+    with open(path, "r") as file:
+        for line in file:
+            fields = line.rstrip("\n").split("\t", 3)
+            if len(fields) == 4 and fields[1] == "move":
+                yield (
+                    int(fields[0]),
+                    hoplite.game.state.GameState.from_string(fields[2]),
+                    hoplite.game.moves.PlayerMove.from_string(fields[3])
+                )
+            else:
+                yield None
+
+
+class LogReport:  # pylint: disable=R0903
+    """Results of the check of a game log.
+
+    Parameters
+    ----------
+    path : str
+        Path to the game log.
+
+    Attributes
+    ----------
+    total : int
+        Number of predictions checked.
+    errors : list[dict]
+        Wrong predictions, with the turns they go from and to, the state,
+        the move, and for each wrong part its name, expected and predicted
+        values, as strings.
+    path
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.total = 0
+        self.errors = list()
+
+    def to_dict(self):
+        """Convert the report to built-in types, for a JSON output.
+
+        Returns
+        -------
+        dict
+            Path, number of predictions and errors of the report.
+
+        """
+        return {"path": self.path, "total": self.total, "errors": self.errors}
+
+    def format(self):
+        """Describe the errors in a readable manner.
+
+        Returns
+        -------
+        str
+            Description of each error, then the count of errors.
+
+        """
+        lines = ["Checking %s\n" % os.path.realpath(self.path)]
+        for error in self.errors:
+            lines.append("-" * 120)
+            lines.append("Found error(s) from turn %d to %d" % (error["from"], error["to"]))
+            lines.append("State: %s" % error["state"])
+            lines.append("Move: %s" % error["move"])
+            for part in error["parts"]:
+                lines.append("%s expected %s but got %s" % (
+                    part["name"], part["expected"], part["predicted"]))
+            lines.append("-" * 120 + "\n")
+        lines.append("Check run found %d errors out of %d predictions." % (
+            len(self.errors), self.total))
+        return "\n".join(lines)
+
+
+def _check_move(report, previous, turn, state):
+    """Compare the prediction of the previous move with the current state.
+    """
+    prev_turn, prev_state, move = previous
+    if prev_state.depth != state.depth:
+        return
+    report.total += 1
+    prediction = move.apply(prev_state)
+    prediction.status.cooldown = max(0, prediction.status.cooldown - 1)
+    parts = list()
+    if prediction.status != state.status:
+        parts.append(("Status", state.status, prediction.status))
+    if prediction.terrain.player != state.terrain.player:
+        parts.append(("Player position", state.terrain.player, prediction.terrain.player))
+    if parts:
+        report.errors.append({
+            "from": prev_turn,
+            "to": turn,
+            "state": repr(prev_state),
+            "move": str(move),
+            "parts": [
+                {"name": name, "expected": repr(expected), "predicted": repr(predicted)}
+                for name, expected, predicted in parts
+            ]
+        })
+
+
+def check_log(path):
+    """Check the predictions of the move model along a game log. Each logged
+    state is read once, serving as the ground truth of the previous move and
+    as the starting point of the next one.
+
+    Parameters
+    ----------
+    path : str
+        Path to the game log.
+
+    Returns
+    -------
+    LogReport
+        Number of predictions and wrong predictions.
+
+    """
+    report = LogReport(path)
+    previous = None
+    for record in iter_moves(path):
+        if record is not None and previous is not None:
+            _check_move(report, previous, *record[:2])
+        previous = record
+    return report
+
+
+def check_logs(paths, workers=None):
+    """Check several game logs, spread over a pool of processes.
+
+    Parameters
+    ----------
+    paths : list[str]
+        Paths to the game logs.
+    workers : int
+        Number of worker processes, defaults to the number of processors.
+        With a single log or a single worker, logs are checked in the current
+        process.
+
+    Returns
+    -------
+    list[LogReport]
+        Reports of the logs, in the order of `paths`.
+
+    """
+    if len(paths) <= 1 or workers == 1:
+        return [check_log(path) for path in paths]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(check_log, paths))
+
+
+def summarize(reports):
+    """Merge the reports of several logs.
+
+    Parameters
+    ----------
+    reports : list[LogReport]
+        Reports to merge.
+
+    Returns
+    -------
+    dict
+        Number of logs, predictions and errors, with the error rate, and the
+        reports of each log.
+
+    """
+    total = sum(report.total for report in reports)
+    errors = sum(len(report.errors) for report in reports)
+    return {
+        "logs": len(reports),
+        "total": total,
+        "errors": errors,
+        "error_rate": errors / total if total else 0.,
+        "reports": [report.to_dict() for report in reports],
+    }
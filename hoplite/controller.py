@@ -4,7 +4,13 @@ the `hoplite.brain.Brain` the `hoplite.actuator.Actuator`. Plays the game.
 
 import os
 import time
+import asyncio
+import queue
 import logging
+import functools
+import threading
+import collections
+import concurrent.futures
 import hoplite
 import hoplite.game.state
 
@@ -12,59 +18,169 @@ import hoplite.game.state
 LOGGER = logging.getLogger(__name__)
 
 
-class Recorder:
+class Recorder:  # pylint: disable=R0902
     """Game recorder. Records states and screenshots encountered while playing
-    the game.
+    the game. Records are queued for a writer thread, so that the PNG encoding
+    of the screenshots and the writing of the log do not delay the controller.
+    Queued screenshot arrays must not be modified afterwards.
 
     Parameters
     ----------
     observer : hoplite.vision.observer.Observer
         Reference to an observer to save the screenshots from.
+    directory : str
+        Path to the folder containing all recordings, defaults to `DIRECTORY`.
+    max_pending : int
+        Maximum number of screenshots waiting to be written.
+    policy : str
+        What to do with a new screenshot while `max_pending` are waiting:
+        `"block"` waits for the writer to catch up, `"drop"` skips the
+        screenshot but still records the log line.
 
     Attributes
     ----------
     folder : str
         Path to the folder containing all the data about the current recording.
+    dropped : int
+        Number of screenshots dropped during the current recording.
+    failures : int
+        Number of records that could not be written, completely or partly,
+        during the current recording.
     DIRECTORY : str
-        Path to the folder containing all recordings.
+        Default path to the folder containing all recordings.
     FILENAME : str
         Basename of the file containing the state logs.
+    POLICIES : tuple[str]
+        Accepted values for `policy`.
     observer
+    directory
+    max_pending
+    policy
 
     """
 
     DIRECTORY = "recordings"
     FILENAME = "game.log"
+    POLICIES = ("block", "drop")
 
-    def __init__(self, observer):
+    def __init__(self, observer, directory=None, max_pending=8, policy="block"):
+        if policy not in Recorder.POLICIES:
+            raise ValueError("Unknown recording policy '%s'" % policy)
         self.observer = observer
-        if not os.path.isdir(Recorder.DIRECTORY):
+        self.directory = Recorder.DIRECTORY if directory is None else directory
+        if not os.path.isdir(self.directory):
             LOGGER.info(
                 "Creating recordings directory at '%s'",
-                os.path.realpath(Recorder.DIRECTORY)
+                os.path.realpath(self.directory)
             )
-            os.mkdir(Recorder.DIRECTORY)
+            os.makedirs(self.directory)
+        self.max_pending = max_pending
+        self.policy = policy
         self.folder = None
+        self.dropped = 0
+        self.failures = 0
+        self._records = None
+        self._slots = None
+        self._writer = None
 
     def start(self):
-        """Create the folder structure for the recording.
+        """Create the folder structure for the recording, and start the
+        writer thread. A recording in progress is stopped first.
         """
-        index = len(next(os.walk(Recorder.DIRECTORY))[1]) + 1
+        self.stop()
+        index = len(next(os.walk(self.directory))[1]) + 1
         self.folder = str(index).rjust(3, "0")
-        os.mkdir(os.path.join(Recorder.DIRECTORY, self.folder))
-        LOGGER.info("Initializing recording at %s", os.path.realpath(self.folder))
-        open(os.path.join(Recorder.DIRECTORY, self.folder, Recorder.FILENAME), "w").close()
-
-    def _record(self, turn, line):
-        self.observer.save_screenshot(os.path.join(
-            Recorder.DIRECTORY,
-            self.folder,
-            str(turn).rjust(3, "0") + ".png"
-        ))
-        with open(os.path.join(Recorder.DIRECTORY, self.folder, Recorder.FILENAME), "a") as file:
-            file.write("%s\t%s\n" % (str(turn).rjust(3, "0"), line))
-
-    def record_move(self, turn, game_state, move):
+        os.mkdir(os.path.join(self.directory, self.folder))
+        LOGGER.info(
+            "Initializing recording at %s",
+            os.path.realpath(os.path.join(self.directory, self.folder))
+        )
+        self.dropped = 0
+        self.failures = 0
+        self._records = queue.Queue()
+        self._slots = threading.Semaphore(self.max_pending)
+        self._writer = threading.Thread(
+            target=self._write,
+            args=(os.path.join(self.directory, self.folder), self._records, self._slots),
+            name="recorder",
+            daemon=True
+        )
+        self._writer.start()
+
+    def _write(self, folder, records, slots):
+        """Writer thread loop, until a `None` record is received. The log is
+        flushed after each record, so that it stays complete if the process
+        is killed. Failures are logged and counted in `failures`, and the
+        queue keeps being consumed, so that waiting for it never hangs.
+        """
+        try:
+            file = open(os.path.join(folder, Recorder.FILENAME), "w")
+        except OSError:
+            LOGGER.exception("Could not create the game log in %s", folder)
+            file = None
+        while True:
+            record = records.get()
+            try:
+                if record is None:
+                    break
+                self._write_record(file, folder, *record)
+            except Exception:  # pylint: disable=W0703
+                if self.failures == 0:
+                    LOGGER.exception("Could not write record %s", record[0])
+                self.failures += 1
+            finally:
+                if record is not None and record[2] is not None:
+                    slots.release()
+                records.task_done()
+        if file is not None:
+            file.close()
+
+    def _write_record(self, file, folder, prefix, line, screenshot):
+        if screenshot is not None:
+            try:
+                self.observer.save_screenshot(os.path.join(folder, prefix + ".png"), screenshot)
+            except Exception:  # pylint: disable=W0703
+                LOGGER.exception("Could not save screenshot %s", prefix)
+                self.failures += 1
+        if file is None:
+            raise OSError("No game log to write to")
+        file.write("%s\t%s\n" % (prefix, line))
+        file.flush()
+
+    def flush(self):
+        """Wait for every queued record to be written.
+        """
+        if self._writer is not None:
+            self._records.join()
+
+    def stop(self):
+        """Write the queued records and stop the writer thread.
+        """
+        if self._writer is None:
+            return
+        self._records.put(None)
+        self._writer.join()
+        self._writer = None
+        if self.dropped > 0:
+            LOGGER.warning("Dropped %d screenshots while recording", self.dropped)
+        if self.failures > 0:
+            LOGGER.error("Failed to write %d records", self.failures)
+
+    def _record(self, turn, line, screenshot):
+        if self._writer is None:
+            raise RuntimeError("Recording is not started")
+        if screenshot is None:
+            screenshot = self.observer.screenshot
+        if screenshot is None:
+            pass
+        elif self.policy == "block":
+            self._slots.acquire()
+        elif not self._slots.acquire(blocking=False):
+            self.dropped += 1
+            screenshot = None
+        self._records.put((str(turn).rjust(3, "0"), line, screenshot))
+
+    def record_move(self, turn, game_state, move, screenshot=None):
         """Append a move record.
 
         Parameters
@@ -75,11 +191,13 @@ class Recorder:
             Current state of the game to the controller's knowledge.
         move : hoplite.game.moves.PlayerMove
             Move that the controller picked to perform in this state.
+        screenshot : numpy.ndarray
+            Screenshot to save, defaults to the last one of the observer.
 
         """
-        self._record(turn, "\t".join(["move", repr(game_state), repr(move)]))
+        self._record(turn, "\t".join(["move", repr(game_state), repr(move)]), screenshot)
 
-    def record_altar(self, turn, altar_state, prayer):
+    def record_altar(self, turn, altar_state, prayer, screenshot=None):
         """Append an altar prayer selection record.
 
         Parameters
@@ -90,9 +208,56 @@ class Recorder:
             State of the altar as to the controller's knowledge.
         prayer : hoplite.game.status.Prayer
             Prayer the controller picked for selection.
+        screenshot : numpy.ndarray
+            Screenshot to save, defaults to the last one of the observer.
 
         """
-        self._record(turn, "\t".join(["altar", repr(altar_state), str(prayer.value)]))
+        self._record(
+            turn,
+            "\t".join(["altar", repr(altar_state), str(prayer.value)]),
+            screenshot
+        )
+
+
+class WaitSettings:  # pylint: disable=R0903
+    """Settings of the wait for the screen to settle after a controller step,
+    see `hoplite.vision.observer.Observer.wait_stable`.
+
+    Parameters
+    ----------
+    delay : float
+        Time to wait before polling the screen, in seconds, for the game to
+        start reacting to the action.
+    interval : float
+        Time to wait between two screenshots, in seconds.
+    samples : int
+        Number of consecutive identical screenshots for the screen to be
+        considered stable.
+    timeout : float
+        Maximum duration of the wait, in seconds.
+
+    """
+
+    def __init__(self, delay, interval, samples, timeout):
+        self.delay = delay
+        self.interval = interval
+        self.samples = samples
+        self.timeout = timeout
+
+    def __repr__(self):
+        return str(self.__dict__)
+
+
+DEFAULT_WAIT_SETTINGS = {
+    hoplite.game.state.Interface.PLAYING: WaitSettings(.2, .1, 2, 3.),
+    hoplite.game.state.Interface.EMBARK: WaitSettings(.3, .1, 3, 3.),
+    hoplite.game.state.Interface.ALTAR: WaitSettings(.5, .1, 3, 3.),
+    hoplite.game.state.Interface.FLEECE: WaitSettings(.3, .1, 3, 3.),
+    hoplite.game.state.Interface.BLACK: WaitSettings(.2, .2, 2, 5.),
+}
+"""dict[hoplite.game.state.Interface, WaitSettings]: Wait settings after a step
+depending on the interface it handled. Other interfaces wait one second, as
+they do not expect any more steps."""
 
 
 class Controller:  # pylint: disable=R0902
@@ -110,6 +275,8 @@ class Controller:  # pylint: disable=R0902
         Prayers to artificially add to the first encountered game status.
     recorder : Recorder
         Game recorder.
+    wait_settings : dict[hoplite.game.state.Interface, WaitSettings]
+        Wait settings overriding `DEFAULT_WAIT_SETTINGS`.
 
     Attributes
     ----------
@@ -120,6 +287,15 @@ class Controller:  # pylint: disable=R0902
     turn : int
         Current controller turn; may differ from internal game's turn count,
         as interface here count as full turns.
+    wait_times : dict[hoplite.game.state.Interface, list[float]]
+        Durations of the waits for the screen to settle, in seconds, depending
+        on the interface handled by the step.
+    step_times : list[float]
+        Durations of the steps, from the screenshot to the last action and
+        excluding the wait, in seconds.
+    outcome : hoplite.game.state.Interface
+        Interface that stopped the controller, `None` while it runs or if it
+        was interrupted.
     observer
     actuator
     brain
@@ -127,45 +303,70 @@ class Controller:  # pylint: disable=R0902
 
     """
 
-    def __init__(self, observer, actuator, brain, starting_prayers=None, recorder=None):  # pylint: disable=R0913
+    def __init__(self, observer, actuator, brain, starting_prayers=None,  # pylint: disable=R0913
+                 recorder=None, wait_settings=None):
         self.observer = observer
         self.actuator = actuator
         self.brain = brain
         self.starting_prayers = starting_prayers
         self.recorder = recorder
+        self.wait_settings = dict(DEFAULT_WAIT_SETTINGS)
+        if wait_settings is not None:
+            self.wait_settings.update(wait_settings)
         self.stop = False
         self.memory = None
         self.turn = 1
+        self.wait_times = collections.defaultdict(list)
+        self.step_times = list()
+        self.outcome = None
 
-    def step(self):  # pylint: disable=R0912
-        """One step of the game: recognition, decision and action.
+    def _wait(self, interface):
+        """Wait for the screen to settle after handling an interface.
         """
-        interface = self.observer.fetch_screenshot()
-        LOGGER.debug("Interface: %s", interface)
-        if interface == hoplite.game.state.Interface.PLAYING:
-            game = self.observer.parse_game()
-            if self.memory is None:
-                self.memory = game
-                if self.starting_prayers:
-                    for prayer in self.starting_prayers:
-                        self.memory.status.add_prayer(prayer, False)
-            else:
-                self.memory.update(game)
-            LOGGER.info("Current evaluation: %.2f", self.brain.evaluate(self.memory))
-            move = self.brain.pick_move(self.memory)
-            self.actuator.make_move(
-                move,
-                spinning=hoplite.game.status.Prayer.SPINNING_BASH in self.memory.status.prayers
-            )
-            if self.recorder is not None:
-                self.recorder.record_move(self.turn, self.memory, move)
-        elif interface == hoplite.game.state.Interface.EMBARK:
+        settings = self.wait_settings.get(interface)
+        if settings is None:
+            time.sleep(1)
+            return
+        duration = self.observer.wait_stable(
+            settings.delay,
+            settings.interval,
+            settings.samples,
+            settings.timeout
+        )
+        self.wait_times[interface].append(duration)
+        LOGGER.debug("Waited %.2f seconds for the screen to settle", duration)
+
+    def _remember(self, game):
+        """Merge a newly parsed game state into the memory.
+        """
+        if self.memory is None:
+            self.memory = game
+            if self.starting_prayers:
+                for prayer in self.starting_prayers:
+                    self.memory.status.add_prayer(prayer, False)
+        else:
+            self.memory.update(game)
+
+    def _record_move(self, move):
+        if self.recorder is not None:
+            self.recorder.record_move(self.turn, self.memory, move)
+
+    def _record_altar(self, altar, prayer):
+        if self.recorder is not None:
+            self.recorder.record_altar(self.turn, altar, prayer)
+
+    def _handle(self, interface):
+        """Handle any interface but `hoplite.game.state.Interface.PLAYING`.
+        """
+        if interface == hoplite.game.state.Interface.EMBARK:
             self.actuator.close_interface(interface)
         elif interface == hoplite.game.state.Interface.DEATH:
             self.stop = True
+            self.outcome = interface
             LOGGER.info("The player is dead.")
         elif interface == hoplite.game.state.Interface.VICTORY:
             self.stop = True
+            self.outcome = interface
             LOGGER.info("The player has won!")
         elif interface == hoplite.game.state.Interface.ALTAR:
             altar = self.observer.parse_altar()
@@ -174,18 +375,55 @@ class Controller:  # pylint: disable=R0902
             self.memory.status.add_prayer(prayer)
             LOGGER.info("Picked prayer %s", prayer)
             self.actuator.choose_prayer(altar, prayer)
-            if self.recorder is not None:
-                self.recorder.record_altar(self.turn, altar, prayer)
+            self._record_altar(altar, prayer)
         elif interface == hoplite.game.state.Interface.FLEECE:
             self.actuator.close_interface(interface)
         elif interface == hoplite.game.state.Interface.STAIRS:
             self.stop = True
+            self.outcome = interface
             LOGGER.info("Reached the stairs!")
+
+    def step(self):
+        """One step of the game: recognition, decision and action.
+        """
+        time_start = time.time()
+        interface = self.observer.fetch_screenshot()
+        LOGGER.debug("Interface: %s", interface)
+        if interface == hoplite.game.state.Interface.PLAYING:
+            self._remember(self.observer.parse_game())
+            LOGGER.info("Current evaluation: %.2f", self.brain.evaluate(self.memory))
+            move = self.brain.pick_move(self.memory)
+            self.actuator.make_move(
+                move,
+                spinning=hoplite.game.status.Prayer.SPINNING_BASH in self.memory.status.prayers
+            )
+            self.brain.remember_move(self.memory, move)
+            self._record_move(move)
+        else:
+            self._handle(interface)
+        self.step_times.append(time.time() - time_start)
         self.turn += 1
-        time.sleep(1)
+        if not self.stop:
+            self._wait(interface)
+
+    def _log_waits(self):
+        for interface, durations in self.wait_times.items():
+            LOGGER.info(
+                "Waited %.2f seconds on average (max. %.2f) after %d %s steps",
+                sum(durations) / len(durations),
+                max(durations),
+                len(durations),
+                interface.name
+            )
+
+    def _flush_records(self):
+        if self.recorder is not None:
+            LOGGER.debug("Writing pending records")
+            self.recorder.flush()
 
     def run(self):
-        """Main loop. Stops when the `stop` attribute is `False`.
+        """Main loop. Stops when the `stop` attribute is `False`. Pending
+        records are written before returning.
         """
         while not self.stop:
             try:
@@ -193,3 +431,149 @@ class Controller:  # pylint: disable=R0902
             except KeyboardInterrupt:
                 LOGGER.warning("Interrupting the controller.")
                 self.stop = True
+        self._flush_records()
+        self._log_waits()
+
+
+class AsyncController(Controller):
+    """Game controller running its steps as an asyncio pipeline. Calls to the
+    observer, the actuator and the brain are blocking, so they run in
+    executor threads. Once a move is made, the controller predicts the next
+    state with `hoplite.game.moves.PlayerMove.apply` and picks the move for
+    it while waiting for the screen to settle. The speculative move is
+    played if the next parsed state is the predicted one, and discarded
+    otherwise. Records are written by a dedicated thread while the next
+    steps go on, in the order of the steps.
+
+    Parameters
+    ----------
+    observer : hoplite.vision.observer.Observer
+        Eyes of the controller.
+    actuator : hoplite.actuator.Actuator
+        Fingers of the controller.
+    brain : hoplite.brain.Brain
+        Mind of the controller.
+    starting_prayers : list[hoplite.game.status.Prayer]
+        Prayers to artificially add to the first encountered game status.
+    recorder : Recorder
+        Game recorder.
+    wait_settings : dict[hoplite.game.state.Interface, WaitSettings]
+        Wait settings overriding `DEFAULT_WAIT_SETTINGS`.
+
+    Attributes
+    ----------
+    speculations : collections.Counter
+        Number of speculative moves that were `"played"` or `"discarded"`.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        Controller.__init__(self, *args, **kwargs)
+        self.speculations = collections.Counter()
+        self._executor = None
+        self._speculation = None
+
+    async def _run_stage(self, function, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            functools.partial(function, *args, **kwargs)
+        )
+
+    def _speculate(self, move):
+        """Start picking the move for the state a move should lead to.
+        """
+        predicted = move.apply(self.memory)
+        self._speculation = predicted, asyncio.ensure_future(
+            self._run_stage(self.brain.pick_move, predicted))
+
+    async def _end_speculation(self):
+        """Wait for the pending speculative search, since the brain must not
+        run two searches at once.
+
+        Returns
+        -------
+        hoplite.game.moves.PlayerMove
+            Speculative move, `None` if there is none or if it was not picked
+            for the current state, in which case it is discarded.
+
+        """
+        if self._speculation is None:
+            return None
+        predicted, future = self._speculation
+        self._speculation = None
+        try:
+            move = await future
+        except Exception:  # pylint: disable=W0703
+            # The predicted state may have no legal move, if the player dies
+            LOGGER.debug("Speculative search failed", exc_info=True)
+            move = None
+        if move is not None and predicted == self.memory:
+            self.speculations["played"] += 1
+            return move
+        self.speculations["discarded"] += 1
+        LOGGER.debug("Discarding the speculative move %s", move)
+        return None
+
+    async def step_async(self):
+        """One step of the game: recognition, decision and action.
+        """
+        time_start = time.time()
+        interface = await self._run_stage(self.observer.fetch_screenshot)
+        LOGGER.debug("Interface: %s", interface)
+        if interface == hoplite.game.state.Interface.PLAYING:
+            self._remember(await self._run_stage(self.observer.parse_game))
+            move = await self._end_speculation()
+            if move is None:
+                move = await self._run_stage(self.brain.pick_move, self.memory)
+            else:
+                LOGGER.info("Speculative move played: %s", move)
+            evaluation = asyncio.ensure_future(
+                self._run_stage(self.brain.evaluate, self.memory))
+            await self._run_stage(
+                self.actuator.make_move,
+                move,
+                spinning=hoplite.game.status.Prayer.SPINNING_BASH in self.memory.status.prayers
+            )
+            LOGGER.info("Current evaluation: %.2f", await evaluation)
+            self.brain.remember_move(self.memory, move)
+            self._record_move(move)
+            self._speculate(move)
+        else:
+            await self._end_speculation()
+            await self._run_stage(self._handle, interface)
+        self.step_times.append(time.time() - time_start)
+        self.turn += 1
+        if not self.stop:
+            await self._run_stage(self._wait, interface)
+
+    async def run_async(self):
+        """Main loop. Stops when the `stop` attribute is `False`.
+        """
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="stage")
+        try:
+            while not self.stop:
+                await self.step_async()
+        except asyncio.CancelledError:
+            LOGGER.warning("Interrupting the controller.")
+            self.stop = True
+            raise
+        finally:
+            self._speculation = None
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def run(self):
+        """Run the main loop in a new event loop. Pending records are written
+        before returning, even when interrupted.
+        """
+        try:
+            asyncio.run(self.run_async())
+        except KeyboardInterrupt:
+            pass
+        self._flush_records()
+        self._log_waits()
+        LOGGER.info(
+            "Played %d speculative moves, discarded %d",
+            self.speculations["played"],
+            self.speculations["discarded"]
+        )
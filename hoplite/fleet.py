@@ -0,0 +1,330 @@
+"""Play on several devices at once. Each device is driven by a controller in
+its own worker process, so that the parsing and the decisions of the
+controllers run on several cores instead of contending for a single
+interpreter lock.
+"""
+
+import os
+import time
+import logging
+import collections
+import multiprocessing
+import concurrent.futures
+import numpy
+import hoplite.actuator
+import hoplite.brain
+import hoplite.controller
+import hoplite.ppadb_runner
+import hoplite.vision.observer
+
+
+LOGGER = logging.getLogger(__name__)
+
+CONTROLLERS = {
+    "sync": hoplite.controller.Controller,
+    "async": hoplite.controller.AsyncController,
+}
+"""dict[str, type]: Controller classes by pipeline name."""
+
+
+class SessionSettings:  # pylint: disable=R0903
+    """Settings of a playing session.
+
+    Parameters
+    ----------
+    prayers : list[hoplite.game.status.Prayer]
+        Prayers to artificially add to the first encountered game status.
+    record : bool
+        Whether to record the session.
+    capture : str
+        Screenshot format, see `hoplite.vision.observer.Observer`.
+    pipeline : str
+        Key of the controller class in `CONTROLLERS`.
+    persistent_shell : bool
+        Whether to send the touches through a persistent shell session, see
+        `hoplite.ppadb_runner.PurePythonAdbInterface`.
+    record_pending : int
+        Maximum number of screenshots waiting to be written by the recorder.
+    record_policy : str
+        Policy of the recorder when too many screenshots are waiting, see
+        `hoplite.controller.Recorder`.
+
+    """
+
+    def __init__(self, prayers=None, record=False, capture="png",  # pylint: disable=R0913
+                 pipeline="sync", persistent_shell=True, record_pending=8,
+                 record_policy="block"):
+        self.prayers = list() if prayers is None else prayers
+        self.record = record
+        self.capture = capture
+        self.pipeline = pipeline
+        self.persistent_shell = persistent_shell
+        self.record_pending = record_pending
+        self.record_policy = record_policy
+
+    def __repr__(self):
+        return str(self.__dict__)
+
+
+class SessionReport:  # pylint: disable=R0903
+    """Results of a playing session.
+
+    Parameters
+    ----------
+    serial : str
+        adb serial of the device the session was played on.
+
+    Attributes
+    ----------
+    outcome : str
+        Name of the `hoplite.game.state.Interface` that ended the session,
+        `"INTERRUPTED"` if it was interrupted, or `"ERROR"` if it failed.
+    depth : int
+        Last observed depth, 0 if no game was observed.
+    turns : int
+        Number of controller turns.
+    step_times : list[float]
+        Durations of the controller steps, in seconds.
+    duration : float
+        Duration of the session, in seconds.
+    error : str
+        Description of the failure of the session, if any.
+    serial
+
+    """
+
+    def __init__(self, serial):
+        self.serial = serial
+        self.outcome = "INTERRUPTED"
+        self.depth = 0
+        self.turns = 0
+        self.step_times = list()
+        self.duration = 0.
+        self.error = None
+
+    def __repr__(self):
+        return "%s: %s at depth %d after %d turns (%.1f seconds)" % (
+            self.serial, self.outcome, self.depth, self.turns, self.duration)
+
+
+def play_session(serial, settings, directory=None):
+    """Play on a device until the controller stops, i.e. on death, victory,
+    stairs or keyboard interruption.
+
+    Parameters
+    ----------
+    serial : str
+        adb serial of the device, `None` for the default one.
+    settings : SessionSettings
+        Settings of the session.
+    directory : str
+        Folder to store the recordings in, see `hoplite.controller.Recorder`.
+
+    Returns
+    -------
+    SessionReport
+        Results of the session.
+
+    """
+    time_start = time.time()
+    report = SessionReport(serial)
+    mr_if = hoplite.ppadb_runner.PurePythonAdbInterface(serial, settings.persistent_shell)
+    observer = hoplite.vision.observer.Observer(mr_if, settings.capture)
+    actuator = hoplite.actuator.Actuator(mr_if)
+    brain = hoplite.brain.Brain()
+    recorder = None
+    if settings.record:
+        recorder = hoplite.controller.Recorder(
+            observer, directory, settings.record_pending, settings.record_policy)
+        recorder.start()
+    controller = CONTROLLERS[settings.pipeline](
+        observer, actuator, brain, list(settings.prayers), recorder=recorder)
+    mr_if.open()
+    try:
+        controller.run()
+    finally:
+        try:
+            mr_if.close()
+        except KeyboardInterrupt:
+            pass
+        if recorder is not None:
+            recorder.stop()
+        if controller.outcome is not None:
+            report.outcome = controller.outcome.name
+        if controller.memory is not None:
+            report.depth = controller.memory.depth
+        report.turns = controller.turn - 1
+        report.step_times = controller.step_times
+        report.duration = time.time() - time_start
+    return report
+
+
+def _initialize_worker(level):
+    logging.basicConfig(
+        level=level,
+        format="%(processName)s:%(levelname)s:%(name)s:%(message)s"
+    )
+
+
+def _fleet_session(serial, settings, directory):
+    """Worker entry point: play a session, and report failures instead of
+    raising them.
+    """
+    multiprocessing.current_process().name = serial
+    time_start = time.time()
+    try:
+        return play_session(serial, settings, directory)
+    except KeyboardInterrupt:
+        report = SessionReport(serial)
+    except Exception as error:  # pylint: disable=W0703
+        LOGGER.exception("Session failed")
+        report = SessionReport(serial)
+        report.outcome = "ERROR"
+        report.error = repr(error)
+    report.duration = time.time() - time_start
+    return report
+
+
+class Fleet:
+    """Runner of playing sessions on several devices at once, with one
+    worker process per device. When a session ends on death, victory or
+    stairs, a new one is started on the same device.
+
+    Parameters
+    ----------
+    serials : list[str]
+        adb serials of the devices.
+    settings : SessionSettings
+        Settings of the sessions.
+    sessions : int
+        Number of sessions to play on each device, `None` for no limit.
+    directory : str
+        Folder to store the recordings in, with one subfolder per device.
+
+    Attributes
+    ----------
+    reports : list[SessionReport]
+        Reports of the sessions played so far, in order of completion.
+    duration : float
+        Duration of the run, in seconds.
+    RESTART_OUTCOMES : tuple[str]
+        Outcomes after which a new session is started.
+    MAX_FAILURES : int
+        Number of consecutive failures after which a device is given up.
+    serials
+    settings
+    sessions
+    directory
+
+    """
+
+    RESTART_OUTCOMES = ("DEATH", "VICTORY", "STAIRS")
+    MAX_FAILURES = 3
+
+    def __init__(self, serials, settings, sessions=None,  # pylint: disable=R0913
+                 directory=hoplite.controller.Recorder.DIRECTORY):
+        self.serials = serials
+        self.settings = settings
+        self.sessions = sessions
+        self.directory = directory
+        self.reports = list()
+        self.duration = 0.
+
+    def _should_restart(self, serial, failures):
+        reports = [report for report in self.reports if report.serial == serial]
+        if self.sessions is not None and len(reports) >= self.sessions:
+            return False
+        if reports[-1].outcome == "ERROR":
+            return failures[serial] < Fleet.MAX_FAILURES
+        return reports[-1].outcome in Fleet.RESTART_OUTCOMES
+
+    def run(self):
+        """Play sessions on all the devices until every device is done, or
+        until a keyboard interruption, which lets running sessions end.
+        """
+        time_start = time.time()
+        failures = collections.Counter()
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=len(self.serials),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_initialize_worker,
+            initargs=(logging.getLogger().getEffectiveLevel(),)
+        )
+        pending = dict()
+
+        def submit(serial):
+            future = executor.submit(
+                _fleet_session,
+                serial,
+                self.settings,
+                os.path.join(self.directory, serial.replace(":", "_"))
+            )
+            pending[future] = serial
+
+        with executor:
+            for serial in self.serials:
+                submit(serial)
+            stopping = False
+            while pending:
+                try:
+                    done, _ = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                except KeyboardInterrupt:
+                    LOGGER.warning("Interrupting the fleet, waiting for running sessions")
+                    stopping = True
+                    continue
+                for future in done:
+                    serial = pending.pop(future)
+                    try:
+                        report = future.result()
+                    except Exception as error:  # pylint: disable=W0703
+                        report = SessionReport(serial)
+                        report.outcome = "ERROR"
+                        report.error = repr(error)
+                    LOGGER.info("Session ended: %s", report)
+                    self.reports.append(report)
+                    if report.outcome == "ERROR":
+                        failures[serial] += 1
+                    else:
+                        failures[serial] = 0
+                    if not stopping and self._should_restart(serial, failures):
+                        submit(serial)
+        self.duration = time.time() - time_start
+
+    def _summarize(self, name, reports):
+        if len(reports) == 0:
+            return "%s: no session" % name
+        outcomes = collections.Counter(report.outcome for report in reports)
+        depths = [report.depth for report in reports]
+        step_times = [t for report in reports for t in report.step_times]
+        text = "%s: %d sessions (%s), depth %.1f avg. / %d max., %d turns, %.1f sessions/hour" % (
+            name,
+            len(reports),
+            ", ".join("%s %d" % item for item in sorted(outcomes.items())),
+            numpy.mean(depths),
+            max(depths),
+            sum(report.turns for report in reports),
+            3600 * len(reports) / max(self.duration, 1e-9)
+        )
+        if len(step_times) > 0:
+            text += ", step latency %.0f/%.0f/%.0f ms (p50/p90/p99)" % tuple(
+                1000 * numpy.percentile(step_times, [50, 90, 99]))
+        return text
+
+    def summary(self):
+        """Aggregate the session reports, for each device and overall.
+
+        Returns
+        -------
+        str
+            One line per device, then one line for the whole fleet.
+
+        """
+        lines = list()
+        for serial in self.serials:
+            lines.append(self._summarize(
+                serial,
+                [report for report in self.reports if report.serial == serial]
+            ))
+        lines.append(self._summarize("fleet", self.reports))
+        return "\n".join(lines)
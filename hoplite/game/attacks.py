@@ -3,6 +3,7 @@
 
 import logging
 import hoplite.utils
+import hoplite.game.bitboard
 
 
 LOGGER = logging.getLogger(__name__)
@@ -25,29 +26,30 @@ class PlayerAttack:
     def __repr__(self):
         return self.__class__.__name__
 
-    def _kill(self, next_state, target):
+    def _kill(self, state, target):
         self._killed += 1
         LOGGER.debug(
             "Killing %s at %s using %s",
-            next_state.terrain.demons[target].skill.name,
+            state.terrain.demons[target].skill.name,
             target,
             self.__class__.__name__
         )
-        del next_state.terrain.demons[target]
+        state.terrain.remove_demon(target)
 
-    def _apply(self, prev_state, next_state):
+    def _apply(self, state, origin):
         raise NotImplementedError
 
-    def apply(self, prev_state, next_state):
+    def apply(self, state, origin):
         """Resolve the attack.
 
         Parameters
         ----------
-        prev_state : hoplite.game.state.GameState
-            State before the last player move.
-        next_state : hoplite.game.state.GameState
-            State after the last player move, in which the attacks should be
-            performed.
+        state : hoplite.game.state.GameState
+            State of the game right after the player moved, in which the
+            attacks should be performed. The player status (such as whether
+            it holds its spear) should not reflect the effects of the move yet.
+        origin : hoplite.utils.HexagonalCoordinates
+            Position of the player before the move.
 
         Returns
         -------
@@ -55,20 +57,23 @@ class PlayerAttack:
             Number of demons killed during the attack.
 
         """
-        self._apply(prev_state, next_state)
+        self._apply(state, origin)
         return self._killed
 
 
 class Stab(PlayerAttack):  # pylint: disable=R0903
-    """Stab attack.
+    """Stab attack. It should be resolved before any other attack, so that
+    demons alive before the move are considered.
     """
 
-    def _apply(self, prev_state, next_state):
-        stabbed = set(hoplite.utils.hexagonal_neighbors(prev_state.terrain.player))\
-            .intersection(hoplite.utils.hexagonal_neighbors(next_state.terrain.player))\
-            .intersection(prev_state.terrain.demons)
-        for target in stabbed:
-            self._kill(next_state, target)
+    def _apply(self, state, origin):
+        stabbed = hoplite.game.bitboard.NEIGHBOR_MASKS[
+            hoplite.game.bitboard.TILE_INDEX[origin]]\
+            & hoplite.game.bitboard.NEIGHBOR_MASKS[
+                hoplite.game.bitboard.TILE_INDEX[state.terrain.player]]\
+            & state.terrain.board.demons
+        for target in hoplite.game.bitboard.iter_positions(stabbed):
+            self._kill(state, target)
         return self._killed
 
 
@@ -76,15 +81,15 @@ class Lunge(PlayerAttack):  # pylint: disable=R0903
     """Lunge attack.
     """
 
-    def _apply(self, prev_state, next_state):
-        if not prev_state.status.spear:
+    def _apply(self, state, origin):
+        if not state.status.spear:
             LOGGER.debug("Lunge impossible because of missing spear")
             return
-        direction = prev_state.terrain.player.gradient(next_state.terrain.player)
-        target = next_state.terrain.player + direction
-        if target in next_state.terrain.demons:
-            self._kill(next_state, target)
-            if hoplite.game.status.Prayer.DEEP_LUNGE in next_state.status.prayers:
+        direction = origin.gradient(state.terrain.player)
+        target = state.terrain.player + direction
+        if target in state.terrain.demons:
+            self._kill(state, target)
+            if hoplite.game.status.Prayer.DEEP_LUNGE in state.status.prayers:
                 target = target + direction
-                if target in next_state.terrain.demons:
-                    self._kill(next_state, target)
+                if target in state.terrain.demons:
+                    self._kill(state, target)
@@ -0,0 +1,393 @@
+"""Bitboard representation of the terrain.
+
+Each of the 79 tiles of the map is mapped to one bit, following the order of
+`hoplite.utils.SURFACE_COORDINATES`. A set of tiles is then a single integer,
+and set operations over tiles (neighborhoods, occupancy, blasts) become
+bitwise operations.
+"""
+
+import numpy
+import hoplite.utils
+import hoplite.geometry
+import hoplite.game.zobrist
+
+
+TILE_COUNT = hoplite.geometry.TILE_COUNT
+FULL_MASK = (1 << TILE_COUNT) - 1
+MASK_BYTES = (TILE_COUNT + 7) // 8
+TILE_INDEX = hoplite.utils.SURFACE_INDEX
+
+
+def mask_of(positions):
+    """Build the mask of a collection of positions. Positions outside of the
+    map are ignored.
+
+    Parameters
+    ----------
+    positions : Iterable[hoplite.utils.HexagonalCoordinates]
+        Positions to set in the mask.
+
+    Returns
+    -------
+    int
+        Mask with the bits of the positions set.
+
+    """
+    mask = 0
+    for pos in positions:
+        index = TILE_INDEX.get(pos)
+        if index is not None:
+            mask |= 1 << index
+    return mask
+
+
+def iter_bits(mask):
+    """Iterate over the set bits of a mask, in increasing order.
+
+    Parameters
+    ----------
+    mask : int
+        Mask to iterate over.
+
+    Returns
+    -------
+    Iterator[int]
+        Indices of the set bits.
+
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def iter_positions(mask):
+    """Iterate over the positions of a mask, in increasing order.
+
+    Parameters
+    ----------
+    mask : int
+        Mask to iterate over.
+
+    Returns
+    -------
+    Iterator[hoplite.utils.HexagonalCoordinates]
+        Positions of the set bits.
+
+    """
+    for index in iter_bits(mask):
+        yield hoplite.utils.SURFACE_COORDINATES[index]
+
+
+def popcount(mask):
+    """Count the set bits of a mask.
+
+    Parameters
+    ----------
+    mask : int
+        Mask to count the bits of.
+
+    Returns
+    -------
+    int
+        Number of set bits.
+
+    """
+    return bin(mask).count("1")
+
+
+def popcounts(masks):
+    """Count the set bits of several masks at once. Masks do not fit in
+    64-bit integers, so that their bits are counted byte-wise.
+
+    Parameters
+    ----------
+    masks : Iterable[int]
+        Masks to count the bits of.
+
+    Returns
+    -------
+    numpy.ndarray
+        Number of set bits of each mask.
+
+    """
+    data = b"".join(mask.to_bytes(MASK_BYTES, "little") for mask in masks)
+    bits = numpy.unpackbits(numpy.frombuffer(data, dtype=numpy.uint8))
+    return bits.reshape(-1, 8 * MASK_BYTES).sum(axis=1)
+
+
+def _indices_mask(indices):
+    mask = 0
+    for index in indices:
+        mask |= 1 << index
+    return mask
+
+
+NEIGHBOR_MASKS = [
+    _indices_mask(neighbors)
+    for neighbors in hoplite.geometry.NEIGHBORS
+]
+
+DISK_MASKS = [
+    [_indices_mask(disk) for disk in disks]
+    for disks in hoplite.geometry.DISKS
+]
+
+
+def disk_mask(index, radius):
+    """Mask of the tiles within a given distance of a tile.
+
+    Parameters
+    ----------
+    index : int
+        Index of the center tile.
+    radius : int
+        Radius of the hexagonal circle.
+
+    Returns
+    -------
+    int
+        Mask of the hexagonal circle, center included.
+
+    """
+    if radius < 0:
+        return 0
+    return DISK_MASKS[min(radius, hoplite.geometry.MAX_DISTANCE)][index]
+
+
+def distance_field(walkable, target):
+    """Compute the walking distance from every tile to a target tile, with a
+    breadth-first search starting from the target. Every tile of a path must
+    be walkable, except the starting one.
+
+    Parameters
+    ----------
+    walkable : int
+        Mask of the walkable tiles.
+    target : int
+        Index of the target tile.
+
+    Returns
+    -------
+    list[int]
+        Distances indexed by tile index, `None` for tiles the target can not
+        be reached from.
+
+    """
+    return mask_distance_field(walkable, 1 << target)
+
+
+def mask_distance_field(walkable, targets):
+    """Compute the walking distance from every tile to the nearest of several
+    target tiles, as `distance_field` does for a single one.
+
+    Parameters
+    ----------
+    walkable : int
+        Mask of the walkable tiles.
+    targets : int
+        Mask of the target tiles.
+
+    Returns
+    -------
+    list[int]
+        Distances indexed by tile index, `None` for tiles no target can be
+        reached from.
+
+    """
+    field = [None] * TILE_COUNT
+    for index in iter_bits(targets):
+        field[index] = 0
+    visited = targets
+    frontier = visited & walkable
+    distance = 0
+    while frontier:
+        reached = 0
+        for index in iter_bits(frontier):
+            reached |= NEIGHBOR_MASKS[index]
+        reached &= ~visited
+        distance += 1
+        for index in iter_bits(reached):
+            field[index] = distance
+        visited |= reached
+        frontier = reached & walkable
+    return field
+
+
+class Bitboard:
+    """Terrain content stored as integer masks, one for each
+    `hoplite.game.terrain.SurfaceElement`. Layers are not exclusive: a bomb
+    and a demon may for instance share a tile.
+
+    Attributes
+    ----------
+    layers : list[int]
+        Masks indexed by `hoplite.game.terrain.SurfaceElement.value`.
+    demons : int
+        Union of the demon layers, maintained by `set_demon` and
+        `clear_demon`.
+    key : int
+        Zobrist key of the layers, see `hoplite.game.zobrist`, maintained by
+        the methods modifying the layers. Layers must therefore not be
+        assigned directly, but through `assign`.
+
+    """
+
+    LAYER_COUNT = 16
+
+    def __init__(self):
+        self.layers = [0] * Bitboard.LAYER_COUNT
+        self.demons = 0
+        self.key = 0
+
+    def __eq__(self, other):
+        return self.key == other.key and self.layers == other.layers
+
+    def __hash__(self):
+        return self.key
+
+    def __repr__(self):
+        return "Bitboard%s" % self.layers
+
+    def copy(self):
+        """Copy the bitboard.
+
+        Returns
+        -------
+        Bitboard
+            Same masks with a different address.
+
+        """
+        board = Bitboard.__new__(Bitboard)
+        board.layers = self.layers[:]
+        board.demons = self.demons
+        board.key = self.key
+        return board
+
+    def get(self, element):
+        """Get the mask of a layer.
+
+        Parameters
+        ----------
+        element : hoplite.game.terrain.SurfaceElement
+            Layer to get.
+
+        Returns
+        -------
+        int
+            Mask of the tiles containing the element.
+
+        """
+        return self.layers[element.value]
+
+    def set(self, element, index):
+        """Add a tile to a layer.
+
+        Parameters
+        ----------
+        element : hoplite.game.terrain.SurfaceElement
+            Layer to modify.
+        index : int
+            Tile index.
+
+        """
+        bit = 1 << index
+        if not self.layers[element.value] & bit:
+            self.layers[element.value] |= bit
+            self.key ^= hoplite.game.zobrist.TILE_KEYS[element.value][index]
+
+    def clear(self, element, index):
+        """Remove a tile from a layer.
+
+        Parameters
+        ----------
+        element : hoplite.game.terrain.SurfaceElement
+            Layer to modify.
+        index : int
+            Tile index.
+
+        """
+        bit = 1 << index
+        if self.layers[element.value] & bit:
+            self.layers[element.value] ^= bit
+            self.key ^= hoplite.game.zobrist.TILE_KEYS[element.value][index]
+
+    def set_demon(self, element, index):
+        """Add a demon to a layer, also updating the `demons` union.
+
+        Parameters
+        ----------
+        element : hoplite.game.terrain.SurfaceElement
+            Demon layer to modify.
+        index : int
+            Tile index.
+
+        """
+        self.set(element, index)
+        self.demons |= 1 << index
+
+    def clear_demon(self, element, index):
+        """Remove a demon from a layer, also updating the `demons` union.
+
+        Parameters
+        ----------
+        element : hoplite.game.terrain.SurfaceElement
+            Demon layer to modify.
+        index : int
+            Tile index.
+
+        """
+        self.clear(element, index)
+        self.demons &= ~(1 << index)
+
+    def locate(self, element):
+        """Find the tile of a single-tile layer, such as the player or the
+        stairs.
+
+        Parameters
+        ----------
+        element : hoplite.game.terrain.SurfaceElement
+            Layer to look at.
+
+        Returns
+        -------
+        int
+            Index of the lowest tile of the layer, `None` if the layer is empty.
+
+        """
+        mask = self.layers[element.value]
+        if mask == 0:
+            return None
+        return (mask & -mask).bit_length() - 1
+
+    def place(self, element, index):
+        """Make a single-tile layer only contain one tile.
+
+        Parameters
+        ----------
+        element : hoplite.game.terrain.SurfaceElement
+            Layer to modify.
+        index : int
+            Tile index, `None` to empty the layer.
+
+        """
+        if index is None:
+            self.assign(element, 0)
+        else:
+            self.assign(element, 1 << index)
+
+    def assign(self, element, mask):
+        """Replace the content of a layer.
+
+        Parameters
+        ----------
+        element : hoplite.game.terrain.SurfaceElement
+            Layer to modify.
+        mask : int
+            New mask of the layer.
+
+        """
+        changed = self.layers[element.value] ^ mask
+        if changed:
+            self.layers[element.value] = mask
+            self.key ^= hoplite.game.zobrist.mask_key(element.value, changed)
@@ -1,8 +1,71 @@
 """Representation of the demons, the enemies of the game.
 """
 
+import copy
 import enum
 import hoplite.utils
+import hoplite.geometry
+import hoplite.game.bitboard
+
+
+PREFERRED_DISTANCE = 3
+"""int: Distance to the player ranged demons try to stand at."""
+
+
+def _choose(candidates, rng):
+    """Pick one of several equally good choices, the first one without a
+    random generator.
+    """
+    if rng is None:
+        return candidates[0]
+    return rng.choice(candidates)
+
+
+def _approach(demon_pos, distance, rng, turn):
+    """Walk to reduce the gap between the walking distance to the player
+    and a preferred distance, or randomly walk without changing it.
+    Stairs and spear are avoided.
+    """
+    field = turn.player_field
+    index = hoplite.game.bitboard.TILE_INDEX[demon_pos]
+    if field[index] is None:
+        return demon_pos
+    gap = abs(field[index] - distance)
+    closer, level = list(), list()
+    for neighbor in turn.free_neighbors(index):
+        if field[neighbor] is None or turn.avoided >> neighbor & 1:
+            continue
+        if abs(field[neighbor] - distance) < gap:
+            closer.append(neighbor)
+        elif abs(field[neighbor] - distance) == gap:
+            level.append(neighbor)
+    if closer:
+        return turn.walk(demon_pos, _choose(closer, rng))
+    if level and rng is not None:
+        return turn.walk(demon_pos, rng.choice(level))
+    return demon_pos
+
+
+def _walk_to(demon_pos, goals, rng, turn):
+    """Walk towards the nearest goal tile, then wait on it. If no goal can
+    be reached, approach `PREFERRED_DISTANCE` from the player.
+    """
+    index = hoplite.game.bitboard.TILE_INDEX[demon_pos]
+    for mask in (goals & ~turn.avoided, goals):
+        if mask == 0:
+            continue
+        field = turn.goal_field(mask)
+        if field[index] is None:
+            continue
+        if field[index] == 0:
+            return demon_pos
+        closer = [
+            neighbor for neighbor in turn.free_neighbors(index)
+            if field[neighbor] is not None and field[neighbor] < field[index]
+        ]
+        if closer:
+            return turn.walk(demon_pos, _choose(closer, rng))
+    return _approach(demon_pos, PREFERRED_DISTANCE, rng, turn)
 
 
 @enum.unique
@@ -39,10 +102,56 @@ class Demon:  # pylint: disable=R0903
         self.max_range = max_range
         self.careful = careful
 
+    def copy(self):
+        """Copy the demon.
+
+        Returns
+        -------
+        Demon
+            Same demon with different address.
+
+        """
+        return copy.copy(self)
+
+    def reach(self, index, obstacles, demons):
+        """Compute the tiles a ranged demon can hit with an attack, along the
+        6 hexagonal directions, within its minimum and maximum range. A ray
+        stops at the first obstacle, which can still be hit. Careful demons
+        ignore the directions where another demon could be hit.
+
+        Parameters
+        ----------
+        index : int
+            Tile index of the demon.
+        obstacles : int
+            Mask of the tiles stopping the attacks: altar and demons.
+        demons : int
+            Mask of the tiles occupied by demons.
+
+        Returns
+        -------
+        int
+            Mask of the tiles the demon can hit.
+
+        """
+        mask = 0
+        for rays in hoplite.geometry.RAYS:
+            line = 0
+            for distance, target in enumerate(rays[index], 1):
+                if distance > self.max_range:
+                    break
+                if distance > self.min_range:
+                    line |= 1 << target
+                if obstacles >> target & 1:
+                    break
+            if not self.careful or line & demons == 0:
+                mask |= line
+        return mask
+
     def range(self, terrain, demon_pos):
-        """Compute the set of positions a range demon can reach with an attack,
-        in all 6 hexagonal directions, taking into account obstruction from
-        altars and other demons, as well as minimum and maximum range.
+        """Compute the set of positions the demon can reach with an attack,
+        as stored in the threat map of the terrain, see
+        `hoplite.game.terrain.Terrain.threat_map`.
 
         Parameters
         ----------
@@ -57,24 +166,13 @@ class Demon:  # pylint: disable=R0903
             Positions that can be attacked by the demon in the current state.
 
         """
-        targets = set()
-        for direction in hoplite.utils.HEXAGONAL_DIRECTIONS:
-            line_targets = set()
-            line = hoplite.utils.hexagonal_line(demon_pos, direction)[1:]
-            for dist, pos in enumerate(line):
-                if self.min_range <= dist < self.max_range:
-                    line_targets.add(pos)
-                if dist == self.max_range - 1\
-                    or pos == terrain.altar\
-                    or pos in terrain.demons:
-                    break
-            if not self.careful\
-                or len(line_targets.intersection(terrain.demons)) == 0:
-                targets = targets.union(line_targets)
-        return targets.intersection(hoplite.utils.SURFACE_COORDINATES)
+        return set(hoplite.game.bitboard.iter_positions(
+            terrain.threat_map().reaches[hoplite.game.bitboard.TILE_INDEX[demon_pos]]))
 
     def attack(self, game_state, demon_pos):
-        """Resolve the attack of the demon.
+        """Resolve the attack of the demon. Changes to the demon state are
+        applied through `hoplite.game.terrain.Terrain.update_demon`, the demon
+        itself is not modified.
 
         Parameters
         ----------
@@ -91,6 +189,44 @@ class Demon:  # pylint: disable=R0903
         """
         raise NotImplementedError
 
+    def move(self, terrain, demon_pos, rng=None, turn=None):
+        """Resolve the action of the demon when it did not attack the player:
+        it walks one tile, or waits, following the priorities described in
+        `RULES.md`. Changes are applied through the terrain, as for `attack`.
+
+        Parameters
+        ----------
+        terrain : hoplite.game.terrain.Terrain
+            Terrain of the current position.
+        demon_pos : hoplite.utils.HexagonalCoordinates
+            Location of the demon.
+        rng : random.Random
+            Source of randomness, to pick among equally good tiles. Without
+            it, ties are broken by tile order and the random walks the game
+            sometimes makes are replaced by waiting.
+        turn : hoplite.game.terrain.DemonTurn
+            Data shared by the moves of the demons during the turn, see
+            `hoplite.game.terrain.Terrain.advance_demons`. It is built from the
+            terrain if not given.
+
+        Returns
+        -------
+        hoplite.utils.HexagonalCoordinates
+            Location of the demon after its move.
+
+        """
+        if turn is None:
+            turn = terrain.demon_turn()
+        return self._move(demon_pos, rng, turn)
+
+    def _move(self, demon_pos, rng, turn):
+        """Move of the ranged demons: stand where the player can be shot at,
+        close to it, preferably not on the stairs nor on the spear.
+        """
+        goals = turn.line_of_sight(self.min_range, self.max_range)\
+            & turn.player_disk(PREFERRED_DISTANCE)
+        return _walk_to(demon_pos, goals, rng, turn)
+
 
 class Footman(Demon):  # pylint: disable=R0903
     """
@@ -100,11 +236,36 @@ class Footman(Demon):  # pylint: disable=R0903
     def __init__(self):
         Demon.__init__(self, DemonSkill.FOOTMAN)
 
+    def reach(self, index, obstacles, demons):
+        return hoplite.game.bitboard.NEIGHBOR_MASKS[index]
+
     def attack(self, game_state, demon_pos):
-        if demon_pos in hoplite.utils.hexagonal_neighbors(game_state.terrain.player):
+        if game_state.terrain.threatens(demon_pos, game_state.terrain.player):
             return 1
         return 0
 
+    def _move(self, demon_pos, rng, turn):
+        field = turn.player_field
+        index = hoplite.game.bitboard.TILE_INDEX[demon_pos]
+        if field[index] is None:
+            return demon_pos
+        closer, level = list(), list()
+        for neighbor in turn.free_neighbors(index):
+            if field[neighbor] is None:
+                continue
+            if field[neighbor] < field[index]:
+                closer.append(neighbor)
+            elif field[neighbor] == field[index]:
+                level.append(neighbor)
+        if closer:
+            return turn.walk(demon_pos, _choose(closer, rng))
+        if level and rng is not None:
+            # Waiting is as likely as walking to any of the level tiles
+            choice = rng.randrange(len(level) + 1)
+            if choice < len(level):
+                return turn.walk(demon_pos, level[choice])
+        return demon_pos
+
 
 class Archer(Demon):  # pylint: disable=R0903
     """
@@ -115,7 +276,7 @@ class Archer(Demon):  # pylint: disable=R0903
         Demon.__init__(self, DemonSkill.ARCHER, 1, 5, False)
 
     def attack(self, game_state, demon_pos):
-        if game_state.terrain.player in self.range(game_state.terrain, demon_pos):
+        if game_state.terrain.threatens(demon_pos, game_state.terrain.player):
             return 1
         return 0
 
@@ -125,15 +286,40 @@ class Demolitionist(Demon):  # pylint: disable=R0903
     Demolitionist demon. Throws bombs.
     """
 
+    THROW_RANGE = 3
+    THROW_COOLDOWN = 2
+
     def __init__(self, holds_bomb=False):
         Demon.__init__(self, DemonSkill.DEMOLITIONIST)
         self.holds_bomb = holds_bomb
         self.cooldown = 0
 
     def attack(self, game_state, demon_pos):
-        self.cooldown = max(0, self.cooldown - 1)
+        if self.cooldown > 0:
+            game_state.terrain.update_demon(demon_pos, cooldown=self.cooldown - 1)
         return 0
 
+    def _move(self, demon_pos, rng, turn):
+        """Throw a bomb next to the player if possible, otherwise walk within
+        throwing range. A new bomb is held once the cooldown is over, which
+        makes the demolitionist throw at most every three turns.
+        """
+        if self.holds_bomb:
+            targets = turn.bomb_targets(demon_pos, Demolitionist.THROW_RANGE)
+            if targets:
+                target = _choose(list(hoplite.game.bitboard.iter_positions(targets)), rng)
+                turn.terrain.add_bomb(target)
+                turn.terrain.update_demon(
+                    demon_pos,
+                    holds_bomb=False,
+                    cooldown=Demolitionist.THROW_COOLDOWN
+                )
+                return demon_pos
+        elif self.cooldown == 0:
+            turn.terrain.update_demon(demon_pos, holds_bomb=True)
+        goals = turn.player_disk(PREFERRED_DISTANCE) & ~turn.player_disk(1)
+        return _walk_to(demon_pos, goals, rng, turn)
+
 
 class Wizard(Demon):  # pylint: disable=R0903
     """
@@ -145,8 +331,11 @@ class Wizard(Demon):  # pylint: disable=R0903
         self.charged_wand = charged_wand
 
     def attack(self, game_state, demon_pos):
-        if game_state.terrain.player in self.range(game_state.terrain, demon_pos):
-            self.charged_wand = False
+        if not self.charged_wand:
+            # A discharged wand is recharged instead of firing
+            game_state.terrain.update_demon(demon_pos, charged_wand=True)
+            return 0
+        if game_state.terrain.threatens(demon_pos, game_state.terrain.player):
+            game_state.terrain.update_demon(demon_pos, charged_wand=False)
             return 1
-        self.charged_wand = True
         return 0
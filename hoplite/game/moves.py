@@ -3,6 +3,7 @@
 
 import logging
 import hoplite.game.attacks
+import hoplite.game.bitboard
 import hoplite.game.terrain
 
 
@@ -26,6 +27,10 @@ class PlayerMove:
         Pushed to positions of bombs that have been knocked by a player Bash.
         When they explode, only knocked bombs will count as player kills, which
         impacts Bloodlust, Surge and Regeneration prayers.
+    attackers : int
+        Mask of the tiles of the demons that attacked the player during the
+        last move resolution. They do not move during the demon turn, see
+        `hoplite.game.terrain.Terrain.advance_demons`.
 
     """
 
@@ -33,6 +38,7 @@ class PlayerMove:
         self.target = target
         self._killed = 0
         self._pushed_bombs = set()
+        self.attackers = 0
 
     def __eq__(self, other):
         return self.__class__ == other.__class__ and self.target == other.target
@@ -90,44 +96,49 @@ class PlayerMove:
             *tuple(map(int, string.split("/")[1].split(","))))
         return cls(target)
 
-    def _apply_damages(self, next_state):
+    def _apply_damages(self, state):
         """Resolve the damage step within the current state.
         """
         damages = 0
-        for bomb_pos in list(next_state.terrain.bombs):
-            for neighbor in hoplite.utils.hexagonal_neighbors(bomb_pos):
-                if neighbor == next_state.terrain.player:
-                    LOGGER.debug(
-                        "Taking a damage because of BOMB at %s",
-                        bomb_pos
-                    )
-                    damages += 1
-                elif neighbor in next_state.terrain.demons:
-                    LOGGER.debug(
-                        "Killing with BOMB at %s: %s at %s",
-                        bomb_pos,
-                        next_state.terrain.demons[neighbor].skill.name,
-                        neighbor
-                    )
-                    if bomb_pos in self._pushed_bombs:
-                        # Only kills by knocked bombs count as player kills,
-                        # that can be used for the Bloodlust, Surge or
-                        # Regeneration prayers.
-                        LOGGER.debug("Bomb kills counts as a player kill")
-                        self._killed += 1
-                    del next_state.terrain.demons[neighbor]
-            next_state.terrain.bombs.remove(bomb_pos)
-        for demon_pos, demon in next_state.terrain.demons.items():
-            demon_damage = demon.attack(next_state, demon_pos)
+        terrain = state.terrain
+        player = terrain.board.get(hoplite.game.terrain.SurfaceElement.PLAYER)
+        for bomb_index in hoplite.game.bitboard.iter_bits(
+                terrain.board.get(hoplite.game.terrain.SurfaceElement.BOMB)):
+            bomb_pos = hoplite.utils.SURFACE_COORDINATES[bomb_index]
+            blast = hoplite.game.bitboard.NEIGHBOR_MASKS[bomb_index]
+            if blast & player:
+                LOGGER.debug(
+                    "Taking a damage because of BOMB at %s",
+                    bomb_pos
+                )
+                damages += 1
+            for neighbor in hoplite.game.bitboard.iter_positions(blast & terrain.board.demons):
+                LOGGER.debug(
+                    "Killing with BOMB at %s: %s at %s",
+                    bomb_pos,
+                    terrain.demons[neighbor].skill.name,
+                    neighbor
+                )
+                if bomb_pos in self._pushed_bombs:
+                    # Only kills by knocked bombs count as player kills,
+                    # that can be used for the Bloodlust, Surge or
+                    # Regeneration prayers.
+                    LOGGER.debug("Bomb kills counts as a player kill")
+                    self._killed += 1
+                terrain.remove_demon(neighbor)
+            terrain.remove_bomb(bomb_pos)
+        for demon_pos, demon in terrain.demons.items():
+            demon_damage = demon.attack(state, demon_pos)
             if demon_damage > 0:
                 LOGGER.debug(
                     "Taking a damage because of %s at %s",
                     demon.skill.name,
                     demon_pos
                 )
+                self.attackers |= 1 << hoplite.game.bitboard.TILE_INDEX[demon_pos]
             damages += demon_damage
         LOGGER.debug("Total damages received: %d", damages)
-        next_state.status.deal_damage(damages)
+        state.status.deal_damage(damages)
 
     def apply(self, prev_state):
         """Perform the move: move entities, check for enemies killed or knocked
@@ -145,89 +156,159 @@ class PlayerMove:
 
         """
         next_state = prev_state.copy()
-        self._apply(prev_state, next_state)
-        self._apply_damages(next_state)
-        if hoplite.game.status.Prayer.BLOODLUST in next_state.status.prayers:
-            next_state.status.restore_energy(self._killed * 6)
+        self.make(next_state)
+        return next_state
+
+    def make(self, state):
+        """Perform the move in place, as `apply` does. The move can then be
+        reverted with `unmake`.
+
+        Parameters
+        ----------
+        state : hoplite.game.state.GameState
+            The state of the game before performing the move, which will be
+            modified into the state after performing the move.
+
+        Returns
+        -------
+        UndoRecord
+            Record of what the move changed, to give to `unmake`.
+
+        """
+        record = UndoRecord(state.status.backup())
+        state.terrain.open_journal()
+        try:
+            self._resolve(state)
+        finally:
+            record.journal = state.terrain.close_journal()
+        return record
+
+    def unmake(self, state, record):
+        """Revert a move performed with `make`.
+
+        Parameters
+        ----------
+        state : hoplite.game.state.GameState
+            The state of the game right after the move.
+        record : UndoRecord
+            Record returned by `make` for this move.
+
+        """
+        state.terrain.revert(record.journal)
+        state.status.restore(record.status)
+
+    def _resolve(self, state):
+        self._killed = 0
+        self._pushed_bombs = set()
+        self.attackers = 0
+        self._make(state)
+        self._apply_damages(state)
+        if hoplite.game.status.Prayer.BLOODLUST in state.status.prayers:
+            state.status.restore_energy(self._killed * 6)
         if self._killed > 0 and\
-            (hoplite.game.status.Prayer.SURGE in next_state.status.prayers\
-            or hoplite.game.status.Prayer.REGENERATION in next_state.status.prayers):
-            next_state.status.spree += 1
-            LOGGER.debug("Increasing killing spree, current state: %d", next_state.status.spree)
+            (hoplite.game.status.Prayer.SURGE in state.status.prayers\
+            or hoplite.game.status.Prayer.REGENERATION in state.status.prayers):
+            state.status.spree += 1
+            LOGGER.debug("Increasing killing spree, current state: %d", state.status.spree)
         else:
-            next_state.status.spree = 0
+            state.status.spree = 0
             LOGGER.debug("Resetting killing spree")
-        if next_state.status.spree == 3:
-            if hoplite.game.status.Prayer.SURGE in next_state.status.prayers:
+        if state.status.spree == 3:
+            if hoplite.game.status.Prayer.SURGE in state.status.prayers:
                 LOGGER.debug("Using SURGE")
-                next_state.status.restore_energy(100)
-                next_state.status.cooldown = 0
-                next_state.status.spear = True
-                next_state.terrain.spear = None
-            elif hoplite.game.status.Prayer.REGENERATION in next_state.status.prayers:
+                state.status.restore_energy(100)
+                state.status.cooldown = 0
+                state.status.spear = True
+                state.terrain.spear = None
+            elif hoplite.game.status.Prayer.REGENERATION in state.status.prayers:
                 LOGGER.debug("Using REGENERATION")
-                next_state.status.restore_health(1)
+                state.status.restore_health(1)
             else:
                 LOGGER.debug("No prayer to spend killing spree on")
-            next_state.status.spree = 0
-        return next_state
+            state.status.spree = 0
 
-    def _apply(self, prev_state, next_state):
+    def _make(self, state):
         raise NotImplementedError
 
 
+class UndoRecord:  # pylint: disable=R0903
+    """Changes made by a `PlayerMove.make`, used by `PlayerMove.unmake` to
+    restore the previous state.
+
+    Parameters
+    ----------
+    status : tuple
+        Status values before the move, see `hoplite.game.status.Status.backup`.
+
+    Attributes
+    ----------
+    journal : dict[str, tuple]
+        Terrain parts modified by the move, with their previous values, see
+        `hoplite.game.terrain.Terrain.open_journal`.
+    status
+
+    """
+
+    def __init__(self, status):
+        self.status = status
+        self.journal = None
+
+
 class WalkMove(PlayerMove):  # pylint: disable=R0903
     """Player walks to an adjacent tile.
     """
 
-    def _apply(self, prev_state, next_state):
-        next_state.terrain.player = self.target
-        if self.target == next_state.terrain.spear:
-            next_state.status.spear = True
-            next_state.terrain.spear = None
-        if not hoplite.utils.hexagonal_neighbors(next_state.terrain.player)\
-            .isdisjoint(prev_state.terrain.demons):
-            next_state.status.restore_energy(10)
-        self._killed += next_state.apply_attacks(prev_state, [
+    def _make(self, state):
+        origin = state.terrain.player
+        state.terrain.player = self.target
+        if hoplite.game.bitboard.NEIGHBOR_MASKS[
+                hoplite.game.bitboard.TILE_INDEX[self.target]]\
+                & state.terrain.board.demons:
+            state.status.restore_energy(10)
+        self._killed += state.apply_attacks(origin, [
             hoplite.game.attacks.Stab(),
             hoplite.game.attacks.Lunge()
         ])
+        if self.target == state.terrain.spear:
+            state.status.spear = True
+            state.terrain.spear = None
 
 
 class LeapMove(PlayerMove):  # pylint: disable=R0903
     """Player jumps to a separated tile.
     """
 
-    def _apply(self, prev_state, next_state):
-        next_state.terrain.player = self.target
-        if self.target == next_state.terrain.spear:
-            next_state.status.spear = True
-            next_state.terrain.spear = None
-        next_state.status.use_energy(50)
-        if not hoplite.utils.hexagonal_neighbors(next_state.terrain.player)\
-            .isdisjoint(prev_state.terrain.demons):
-            next_state.status.restore_energy(10)
-        self._killed += next_state.apply_attacks(prev_state, [
+    def _make(self, state):
+        origin = state.terrain.player
+        state.terrain.player = self.target
+        state.status.use_energy(50)
+        if hoplite.game.bitboard.NEIGHBOR_MASKS[
+                hoplite.game.bitboard.TILE_INDEX[self.target]]\
+                & state.terrain.board.demons:
+            state.status.restore_energy(10)
+        self._killed += state.apply_attacks(origin, [
             hoplite.game.attacks.Stab(),
             hoplite.game.attacks.Lunge()
         ])
+        if self.target == state.terrain.spear:
+            state.status.spear = True
+            state.terrain.spear = None
 
 
 class ThrowMove(PlayerMove):  # pylint: disable=R0903
     """Player throws spear.
     """
 
-    def _apply(self, prev_state, next_state):
-        next_state.status.spear = False
-        if self.target in next_state.terrain.demons:
+    def _make(self, state):
+        state.status.spear = False
+        if self.target in state.terrain.demons:
             LOGGER.debug(
                 "Killing %s with spear",
-                next_state.terrain.demons[self.target].skill.name
+                state.terrain.demons[self.target].skill.name
             )
             self._killed += 1
-            del next_state.terrain.demons[self.target]
-        next_state.status.spear = False
-        next_state.terrain.spear = self.target
+            state.terrain.remove_demon(self.target)
+        state.terrain.spear = self.target
 
 
 class BashMove(PlayerMove):  # pylint: disable=R0903
@@ -263,32 +344,34 @@ class BashMove(PlayerMove):  # pylint: disable=R0903
             origin + direction.rotate(1)
         ]
         LOGGER.debug("Empty tiles candidates: %s", candidates)
+        occupied = terrain.board.demons\
+            | terrain.board.get(hoplite.game.terrain.SurfaceElement.ALTAR_ON)\
+            | terrain.board.get(hoplite.game.terrain.SurfaceElement.ALTAR_OFF)
         selected = None
         for candidate in candidates:
-            if candidate in set(hoplite.utils.SURFACE_COORDINATES)\
-                .difference(terrain.demons)\
-                .difference([terrain.altar]):
+            index = hoplite.game.bitboard.TILE_INDEX.get(candidate)
+            if index is not None and not occupied >> index & 1:
                 LOGGER.debug("Found an empty tile at %s", candidate)
                 selected = candidate
                 break
         if selected is None:
             LOGGER.debug("No empty tile found.")
-            if candidates[0] not in hoplite.utils.SURFACE_COORDINATES:
-                LOGGER.debug("Forcing escape by crushing the demon out of bound.")
+            if candidates[0] not in terrain.demons:
+                # Out of bound or altar: there is no demon to push away
+                LOGGER.debug("Forcing escape by crushing the demon.")
                 self._killed += 1
-                del terrain.demons[origin]
+                terrain.remove_demon(origin)
             else:
                 LOGGER.debug("Propagating escape from %s", candidates[0])
                 self._push_demon(terrain, candidates[0], direction)
-                terrain.demons[candidates[0]] = terrain.demons[origin]
-                del terrain.demons[origin]
+                terrain.move_demon(origin, candidates[0])
         else:
             if terrain.surface.get(selected) == hoplite.game.terrain.Tile.MAGMA:
                 LOGGER.debug("Escaping into lava, killing.")
                 self._killed += 1
+                terrain.remove_demon(origin)
             else:
-                terrain.demons[selected] = terrain.demons[origin]
-            del terrain.demons[origin]
+                terrain.move_demon(origin, selected)
 
     def _bash_step(self, state, entity, origin, direction):
         target = origin + direction
@@ -296,58 +379,57 @@ class BashMove(PlayerMove):  # pylint: disable=R0903
         if target == state.terrain.altar:
             LOGGER.debug("Blocked by altar, ending knockback")
             return None
-        if target not in hoplite.utils.SURFACE_COORDINATES:
+        if target not in hoplite.game.bitboard.TILE_INDEX:
             if entity == BashMove.ENTITY_DEMON:
                 LOGGER.debug("Pushing demon out of bound, counts as a kill")
-                del state.terrain.demons[origin]
+                state.terrain.remove_demon(origin)
                 self._killed += 1
             LOGGER.debug("Knocked out of bound, ending knockback")
             return None
         if entity == BashMove.ENTITY_DEMON\
             and state.terrain.surface.get(target) == hoplite.game.terrain.Tile.MAGMA:
             LOGGER.debug("Pushed demon onto magma kill, ending knockback")
-            del state.terrain.demons[origin]
+            state.terrain.remove_demon(origin)
             self._killed += 1
             return None
         if target in state.terrain.demons:
             LOGGER.debug("Bash target is occupied by a demon")
             self._push_demon(state.terrain, target, direction)
         if entity == BashMove.ENTITY_BOMB:
-            state.terrain.bombs.remove(origin)
-            state.terrain.bombs.add(target)
+            state.terrain.remove_bomb(origin)
+            state.terrain.add_bomb(target)
             self._pushed_bombs.add(target)
         elif entity == BashMove.ENTITY_DEMON:
-            state.terrain.demons[target] = state.terrain.demons[origin]
-            del state.terrain.demons[origin]
+            state.terrain.move_demon(origin, target)
         return target
 
-    def _apply(self, prev_state, next_state):
-        for origin in self._get_bashed_area(prev_state):
-            if origin in next_state.terrain.bombs:
+    def _make(self, state):
+        for origin in self._get_bashed_area(state):
+            if origin in state.terrain.bombs:
                 entity = BashMove.ENTITY_BOMB
-            elif origin in next_state.terrain.demons:
+            elif origin in state.terrain.demons:
                 entity = BashMove.ENTITY_DEMON
             else:
                 LOGGER.debug("Nothing to bash at %s", origin)
                 continue
-            direction = next_state.terrain.player.gradient(origin)
+            direction = state.terrain.player.gradient(origin)
             LOGGER.debug("Bashing %s from %s into %s",
                          ["bomb", "demon"][entity], origin, direction)
-            for step in range(next_state.status.attributes.knockback_distance):
+            for step in range(state.status.attributes.knockback_distance):
                 LOGGER.debug("Bashing step %d/%d", step + 1,
-                             next_state.status.attributes.knockback_distance)
-                target = self._bash_step(next_state, entity, origin, direction)
+                             state.status.attributes.knockback_distance)
+                target = self._bash_step(state, entity, origin, direction)
                 if target is None:
                     break
                 origin = target
-        next_state.status.cooldown = next_state.status.attributes.cooldown
+        state.status.cooldown = state.status.attributes.cooldown
 
 
 class IdleMove(PlayerMove):  # pylint: disable=R0903
     """Player uses the `hoplite.game.status.Prayer.PATIENCE` prayer.
     """
 
-    def _apply(self, prev_state, next_state):
+    def _make(self, state):
         pass
 
 
@@ -355,5 +437,5 @@ class AltarMove(PlayerMove):  # pylint: disable=R0903
     """Player prays at the altar.
     """
 
-    def _apply(self, prev_state, next_state):
-        next_state.terrain.altar_prayable = False
+    def _make(self, state):
+        state.terrain.altar_prayable = False
@@ -2,12 +2,13 @@
 """
 
 import enum
-import copy
 import logging
 import hoplite.utils
+import hoplite.game.bitboard
 import hoplite.game.terrain
 import hoplite.game.status
 import hoplite.game.moves
+import hoplite.game.zobrist
 
 
 LOGGER = logging.getLogger(__name__)
@@ -59,7 +60,14 @@ class GameState:
                 and self.status == other.status)
 
     def __hash__(self):
-        return hash(self.depth + hash(self.terrain) + hash(self.status))
+        return self.key
+
+    @property
+    def key(self):
+        """Zobrist key of the game state, see `hoplite.game.zobrist`."""
+        return hoplite.game.zobrist.component_key("depth", self.depth)\
+            ^ self.terrain.key\
+            ^ self.status.key
 
     @classmethod
     def from_string(cls, string):
@@ -88,7 +96,9 @@ class GameState:
         return state
 
     def copy(self):
-        """Copy the current state.
+        """Copy the current state. This is a structural copy, much cheaper
+        than a `copy.deepcopy`: demons, which are never modified in place,
+        are shared with the copy.
 
         Returns
         -------
@@ -96,7 +106,11 @@ class GameState:
             Same state with different address.
 
         """
-        return copy.deepcopy(self)
+        state = GameState.__new__(GameState)
+        state.depth = self.depth
+        state.terrain = self.terrain.copy()
+        state.status = self.status.copy()
+        return state
 
     def update(self, new_state):
         """Update the current state with a newly parsed one.
@@ -111,15 +125,15 @@ class GameState:
         self.terrain = new_state.terrain
         self.status.update(new_state.status)
 
-    def apply_attacks(self, prev_state, attacks):
+    def apply_attacks(self, origin, attacks):
         """Resolve player attacks.
 
         Parameters
         ----------
-        prev_state : GameState
-            State of the game before the last move.
+        origin : hoplite.utils.HexagonalCoordinates
+            Position of the player before the last move.
         attacks : list[hoplite.game.attacks.PlayerAttack]
-            Player attacks to consider.
+            Player attacks to consider, in order.
 
         Rerturns
         --------
@@ -129,7 +143,7 @@ class GameState:
         """
         killed = 0
         for atck in attacks:
-            killed += atck.apply(prev_state, self)
+            killed += atck.apply(self, origin)
         return killed
 
     def possible_moves(self):
@@ -141,38 +155,32 @@ class GameState:
             Legal moves for the player in the current game state.
 
         """
-        def cannot_land_on(pos):
-            return (self.terrain.surface.get(pos) == hoplite.game.terrain.Tile.MAGMA)\
-                or (pos == self.terrain.altar)\
-                or (pos in self.terrain.bombs)\
-                or (pos in self.terrain.demons)
-        for pos in hoplite.utils.hexagonal_neighbors(self.terrain.player):
-            if cannot_land_on(pos):
-                continue
+        board = self.terrain.board
+        player = hoplite.game.bitboard.TILE_INDEX[self.terrain.player]
+        neighbors = hoplite.game.bitboard.NEIGHBOR_MASKS[player]
+        altar = board.get(hoplite.game.terrain.SurfaceElement.ALTAR_ON)\
+            | board.get(hoplite.game.terrain.SurfaceElement.ALTAR_OFF)
+        cannot_throw_on = board.get(hoplite.game.terrain.SurfaceElement.MAGMA)\
+            | altar\
+            | board.get(hoplite.game.terrain.SurfaceElement.BOMB)
+        cannot_land_on = cannot_throw_on | board.demons
+        for pos in hoplite.game.bitboard.iter_positions(neighbors & ~cannot_land_on):
             yield hoplite.game.moves.WalkMove(pos)
         if self.status.can_leap():
-            for pos in hoplite.utils\
-                    .hexagonal_circle(
-                            self.terrain.player,
-                            self.status.attributes.leap_distance)\
-                    .difference(hoplite.utils.hexagonal_circle(self.terrain.player, 1)):
-                if cannot_land_on(pos):
-                    continue
+            leap_area = hoplite.game.bitboard.disk_mask(
+                player, self.status.attributes.leap_distance)\
+                & ~hoplite.game.bitboard.disk_mask(player, 1)
+            for pos in hoplite.game.bitboard.iter_positions(leap_area & ~cannot_land_on):
                 yield hoplite.game.moves.LeapMove(pos)
         if self.status.can_bash():
-            for pos in hoplite.utils.hexagonal_neighbors(self.terrain.player):
+            for pos in hoplite.game.bitboard.iter_positions(neighbors):
                 yield hoplite.game.moves.BashMove(pos)
         if self.status.can_throw():
-            for pos in hoplite.utils.hexagonal_circle(
-                    self.terrain.player,
-                    self.status.attributes.throw_distance):
-                if (self.terrain.surface.get(pos) == hoplite.game.terrain.Tile.MAGMA)\
-                        or (pos == self.terrain.altar)\
-                        or (pos in self.terrain.bombs):
-                    continue
+            throw_area = hoplite.game.bitboard.disk_mask(
+                player, self.status.attributes.throw_distance)
+            for pos in hoplite.game.bitboard.iter_positions(throw_area & ~cannot_throw_on):
                 yield hoplite.game.moves.ThrowMove(pos)
-        if self.terrain.altar_prayable\
-                and self.terrain.altar in hoplite.utils.hexagonal_neighbors(self.terrain.player):
+        if self.terrain.altar_prayable and neighbors & altar:
             yield hoplite.game.moves.AltarMove(self.terrain.altar)
         if hoplite.game.status.Prayer.PATIENCE in self.status.prayers:
             yield hoplite.game.moves.IdleMove(self.terrain.player)
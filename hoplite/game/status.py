@@ -2,6 +2,7 @@
 """
 
 import enum
+import hoplite.game.zobrist
 
 
 @enum.unique
@@ -61,6 +62,19 @@ class PlayerAttributes:  # pylint: disable=R0903
     def __repr__(self):
         return str(self.__dict__)
 
+    def copy(self):
+        """Copy the attributes.
+
+        Returns
+        -------
+        PlayerAttributes
+            Same attributes with different address.
+
+        """
+        attributes = PlayerAttributes.__new__(PlayerAttributes)
+        attributes.__dict__.update(self.__dict__)
+        return attributes
+
 
 class Status:
     """Logical representation of the player status.
@@ -94,10 +108,12 @@ class Status:
         self.attributes = PlayerAttributes()
 
     def __hash__(self):
-        return hash(repr(self))
+        return self.key
 
     def __eq__(self, other):
-        return repr(self) == repr(other)
+        return self.key == other.key\
+            and self.backup() == other.backup()\
+            and self.prayers == other.prayers
 
     def __repr__(self):
         text = "/".join([
@@ -115,6 +131,58 @@ class Status:
     def __str__(self):
         return "Status%s" % self.__dict__
 
+    @property
+    def key(self):
+        """Zobrist key of the status, see `hoplite.game.zobrist`. Unlike the
+        terrain key, it is computed from scratch, as it only has a handful of
+        components.
+        """
+        key = hoplite.game.zobrist.component_key("cooldown", self.cooldown)\
+            ^ hoplite.game.zobrist.component_key("energy", self.energy)\
+            ^ hoplite.game.zobrist.component_key("spear", int(self.spear))\
+            ^ hoplite.game.zobrist.component_key("health", self.health)\
+            ^ hoplite.game.zobrist.component_key("spree", self.spree)
+        for i, prayer in enumerate(self.prayers):
+            key ^= hoplite.game.zobrist.component_key("prayer%d" % i, prayer.value)
+        return key
+
+    def copy(self):
+        """Copy the status.
+
+        Returns
+        -------
+        Status
+            Same status with different address.
+
+        """
+        status = Status.__new__(Status)
+        status.__dict__.update(self.__dict__)
+        status.prayers = list(self.prayers)
+        status.attributes = self.attributes.copy()
+        return status
+
+    def backup(self):
+        """Save the values that player moves may modify.
+
+        Returns
+        -------
+        tuple
+            Values to give to `restore`.
+
+        """
+        return (self.cooldown, self.energy, self.spear, self.health, self.spree)
+
+    def restore(self, backup):
+        """Restore values saved with `backup`.
+
+        Parameters
+        ----------
+        backup : tuple
+            Values returned by `backup`.
+
+        """
+        self.cooldown, self.energy, self.spear, self.health, self.spree = backup
+
     @classmethod
     def from_string(cls, string):
         """Create and return a `Status` object from its string representation.
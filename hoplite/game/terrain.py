@@ -1,11 +1,14 @@
+# pylint: disable=C0302
 """Representation of the terrain of the game.
 """
 
 import math
 import enum
-import heapq
+import numpy
 import pygame
 import hoplite.utils
+import hoplite.geometry
+import hoplite.game.bitboard
 import hoplite.game.demons
 
 
@@ -80,11 +83,166 @@ SURFACE_ELEMENT_DECODER = {
 }
 
 
-class Terrain:  # pylint: disable=R0902
+DEMON_ELEMENTS = (
+    SurfaceElement.FOOTMAN,
+    SurfaceElement.ARCHER,
+    SurfaceElement.DEMOLITIONIST_HOLDING_BOMB,
+    SurfaceElement.DEMOLITIONIST_WITHOUT_BOMB,
+    SurfaceElement.WIZARD_CHARGED,
+    SurfaceElement.WIZARD_DISCHARGED,
+)
+
+# Elements shown on a tile, from the most to the least visible, when several
+# layers of the `hoplite.game.bitboard.Bitboard` share that tile.
+ELEMENT_PRECEDENCE = (
+    SurfaceElement.PLAYER,
+    SurfaceElement.SPEAR,
+    SurfaceElement.ALTAR_ON,
+    SurfaceElement.ALTAR_OFF,
+    SurfaceElement.FLEECE,
+    SurfaceElement.PORTAL,
+    SurfaceElement.BOMB,
+    SurfaceElement.STAIRS,
+) + DEMON_ELEMENTS + (
+    SurfaceElement.GROUND,
+    SurfaceElement.MAGMA,
+)
+
+
+DISTANCE_FIELD_CACHE_SIZE = 16
+
+_DISTANCE_FIELDS = dict()
+
+
+def _distance_fields(walkable):
+    """Cached distance fields over a set of walkable tiles, as lists and as
+    arrays, both indexed by target tile index.
+    """
+    cached = _DISTANCE_FIELDS.get(walkable)
+    if cached is None:
+        if len(_DISTANCE_FIELDS) >= DISTANCE_FIELD_CACHE_SIZE:
+            del _DISTANCE_FIELDS[next(iter(_DISTANCE_FIELDS))]
+        cached = _DISTANCE_FIELDS[walkable] = dict(), dict()
+    return cached
+
+
+def walking_distance_field(walkable, target):
+    """Get the walking distances from every tile to a target tile, over a
+    set of walkable tiles. Fields are cached for the last
+    `DISTANCE_FIELD_CACHE_SIZE` sets of walkable tiles.
+
+    Parameters
+    ----------
+    walkable : int
+        Mask of the walkable tiles.
+    target : hoplite.utils.HexagonalCoordinates
+        Target tile.
+
+    Returns
+    -------
+    list[int]
+        Number of steps to reach the target, indexed by tile index (see
+        `hoplite.game.bitboard`). `None` for tiles the target can not be
+        reached from.
+
+    """
+    fields, _ = _distance_fields(walkable)
+    index = hoplite.game.bitboard.TILE_INDEX[target]
+    field = fields.get(index)
+    if field is None:
+        field = fields[index] = hoplite.game.bitboard.distance_field(walkable, index)
+    return field
+
+
+def walking_distance_array(walkable, target):
+    """Get the walking distances from every tile to a target tile as an
+    array, from the same cache as `walking_distance_field`.
+
+    Parameters
+    ----------
+    walkable : int
+        Mask of the walkable tiles.
+    target : hoplite.utils.HexagonalCoordinates
+        Target tile.
+
+    Returns
+    -------
+    numpy.ndarray
+        Number of steps to reach the target, indexed by tile index, `nan`
+        for tiles the target can not be reached from. It must not be
+        modified.
+
+    """
+    _, arrays = _distance_fields(walkable)
+    index = hoplite.game.bitboard.TILE_INDEX[target]
+    array = arrays.get(index)
+    if array is None:
+        array = arrays[index] = numpy.array([
+            numpy.nan if distance is None else distance
+            for distance in walking_distance_field(walkable, target)
+        ], dtype=float)
+    return array
+
+
+def demon_element(demon):
+    """Get the `SurfaceElement` representing a demon.
+
+    Parameters
+    ----------
+    demon : hoplite.game.demons.Demon
+        Demon to represent.
+
+    Returns
+    -------
+    SurfaceElement
+        Element corresponding to the demon skill and state.
+
+    """
+    if demon.skill == hoplite.game.demons.DemonSkill.FOOTMAN:
+        return SurfaceElement.FOOTMAN
+    if demon.skill == hoplite.game.demons.DemonSkill.ARCHER:
+        return SurfaceElement.ARCHER
+    if demon.skill == hoplite.game.demons.DemonSkill.DEMOLITIONIST:
+        if demon.holds_bomb:
+            return SurfaceElement.DEMOLITIONIST_HOLDING_BOMB
+        return SurfaceElement.DEMOLITIONIST_WITHOUT_BOMB
+    if demon.charged_wand:
+        return SurfaceElement.WIZARD_CHARGED
+    return SurfaceElement.WIZARD_DISCHARGED
+
+
+def _located(attribute, element):
+    """Property for a single-tile entity, kept in sync with its layer of the
+    terrain bitboard.
+    """
+    def getter(self):
+        return getattr(self, attribute)
+
+    def setter(self, pos):
+        self.save(attribute)
+        setattr(self, attribute, pos)
+        self.board.place(
+            element,
+            None if pos is None else hoplite.game.bitboard.TILE_INDEX[pos]
+        )
+
+    return property(getter, setter)
+
+
+class Terrain:  # pylint: disable=R0902, R0904
     """Logical representation of the game terrain.
 
+    The content of the terrain is stored in a `hoplite.game.bitboard.Bitboard`,
+    the attributes below being a view over it. `surface`, `demons` and `bombs`
+    must therefore only be modified through `set_tile`, `add_demon`,
+    `remove_demon`, `move_demon`, `update_demon`, `add_bomb` and
+    `remove_bomb`. Demons are shared between copies of a terrain, and are
+    never modified in place: `update_demon` replaces them by a modified copy.
+
     Attributes
     ----------
+    board : hoplite.game.bitboard.Bitboard
+        Masks of the tiles occupied by each `SurfaceElement`.
     player : hoplite.utils.HexagonalCoordinates
         Player location.
     surface : dict[hoplite.utils.HexagonalCoordinates, Tile]
@@ -105,28 +263,305 @@ class Terrain:  # pylint: disable=R0902
         Location of the portal, `None` if not present.
     stairs : hoplite.utils.HexagonalCoordinates
         Location of the stairs.
+    journal : dict[str, tuple]
+        When not `None`, values of the parts of the terrain modified since
+        the journal was opened, see `open_journal`.
 
     """
 
+    player = _located("_player", SurfaceElement.PLAYER)
+    spear = _located("_spear", SurfaceElement.SPEAR)
+    fleece = _located("_fleece", SurfaceElement.FLEECE)
+    portal = _located("_portal", SurfaceElement.PORTAL)
+    stairs = _located("_stairs", SurfaceElement.STAIRS)
+
     def __init__(self):
-        self.player = hoplite.utils.HexagonalCoordinates(0, -4)
+        self.board = hoplite.game.bitboard.Bitboard()
         self.surface = dict()
         self.demons = dict()
         self.bombs = set()
-        self.spear = None
-        self.altar = None
-        self.altar_prayable = False
-        self.fleece = None
-        self.portal = None
+        self.journal = None
+        self._player = None
+        self._spear = None
+        self._altar = None
+        self._altar_prayable = False
+        self._fleece = None
+        self._portal = None
+        self._stairs = None
+        self._threats = None
+        self.player = hoplite.utils.HexagonalCoordinates(0, -4)
         self.stairs = hoplite.utils.HexagonalCoordinates(0, 4)
 
     def __hash__(self):
-        return hash(repr(self))
+        return self.board.key
 
     def __eq__(self, other):
-        return repr(self) == repr(other)
+        return self.board == other.board
+
+    @property
+    def key(self):
+        """Zobrist key of the terrain content, see `hoplite.game.zobrist`."""
+        return self.board.key
+
+    def copy(self):
+        """Copy the terrain. Containers are copied, but not the demons they
+        contain, as demons are never modified in place.
+
+        Returns
+        -------
+        Terrain
+            Same terrain with different address.
+
+        """
+        terrain = Terrain.__new__(Terrain)
+        terrain.__dict__.update(self.__dict__)
+        terrain.board = self.board.copy()
+        terrain.surface = dict(self.surface)
+        terrain.demons = dict(self.demons)
+        terrain.bombs = set(self.bombs)
+        terrain.journal = None
+        return terrain
+
+    def open_journal(self):
+        """Start recording the modifications of the terrain, so that they can
+        be reverted with `close_journal`. Each modified part of the terrain
+        (an attribute, the demons or the bombs) is saved once, the first time
+        it is modified.
+        """
+        self.journal = dict()
+
+    def close_journal(self, revert=False):
+        """Stop recording the modifications of the terrain.
+
+        Parameters
+        ----------
+        revert : bool
+            Whether to restore the terrain as it was when the journal was
+            opened.
+
+        Returns
+        -------
+        dict[str, tuple]
+            The closed journal.
+
+        """
+        journal, self.journal = self.journal, None
+        if revert:
+            self.revert(journal)
+        return journal
+
+    def revert(self, journal):
+        """Restore the parts of the terrain saved in a journal.
+
+        Parameters
+        ----------
+        journal : dict[str, tuple]
+            Journal returned by `close_journal`.
+
+        """
+        for key, saved in journal.items():
+            if key == "demons":
+                self.demons, layers, self.board.demons = saved
+                for element, mask in zip(DEMON_ELEMENTS, layers):
+                    self.board.assign(element, mask)
+            elif key == "bombs":
+                self.bombs, bombs = saved
+                self.board.assign(SurfaceElement.BOMB, bombs)
+            elif key == "surface":
+                self.surface, ground, magma = saved
+                self.board.assign(SurfaceElement.GROUND, ground)
+                self.board.assign(SurfaceElement.MAGMA, magma)
+            else:
+                setattr(self, key[1:], saved)
 
-    def to_list(self):  # pylint: disable=R0912
+    def save(self, key):
+        """Save a part of the terrain in the journal, if it is open and if
+        that part has not been saved already.
+
+        Parameters
+        ----------
+        key : str
+            Either `"demons"`, `"bombs"`, `"surface"` or the name of the
+            private attribute backing a property (such as `"_player"`).
+
+        """
+        if self.journal is None or key in self.journal:
+            return
+        if key == "demons":
+            self.journal[key] = (
+                dict(self.demons),
+                [self.board.layers[element.value] for element in DEMON_ELEMENTS],
+                self.board.demons
+            )
+        elif key == "bombs":
+            self.journal[key] = (set(self.bombs), self.board.get(SurfaceElement.BOMB))
+        elif key == "surface":
+            self.journal[key] = (
+                dict(self.surface),
+                self.board.get(SurfaceElement.GROUND),
+                self.board.get(SurfaceElement.MAGMA)
+            )
+        else:
+            self.journal[key] = getattr(self, key)
+
+    @property
+    def altar(self):
+        """Location of the altar, `None` if not present."""
+        return self._altar
+
+    @altar.setter
+    def altar(self, pos):
+        self.save("_altar")
+        self._altar = pos
+        self._place_altar()
+
+    @property
+    def altar_prayable(self):
+        """Whether a prayer can be made at the altar."""
+        return self._altar_prayable
+
+    @altar_prayable.setter
+    def altar_prayable(self, value):
+        self.save("_altar_prayable")
+        self._altar_prayable = value
+        self._place_altar()
+
+    def _place_altar(self):
+        index = None
+        if self._altar is not None:
+            index = hoplite.game.bitboard.TILE_INDEX[self._altar]
+        if self._altar_prayable:
+            self.board.place(SurfaceElement.ALTAR_ON, index)
+            self.board.place(SurfaceElement.ALTAR_OFF, None)
+        else:
+            self.board.place(SurfaceElement.ALTAR_ON, None)
+            self.board.place(SurfaceElement.ALTAR_OFF, index)
+
+    def set_tile(self, pos, tile):
+        """Set the composition of a tile of the surface.
+
+        Parameters
+        ----------
+        pos : hoplite.utils.HexagonalCoordinates
+            Tile to set.
+        tile : Tile
+            New composition of the tile.
+
+        """
+        self.save("surface")
+        index = hoplite.game.bitboard.TILE_INDEX[pos]
+        self.surface[pos] = tile
+        if tile == Tile.MAGMA:
+            self.board.clear(SurfaceElement.GROUND, index)
+            self.board.set(SurfaceElement.MAGMA, index)
+        else:
+            self.board.clear(SurfaceElement.MAGMA, index)
+            self.board.set(SurfaceElement.GROUND, index)
+
+    def add_demon(self, pos, demon):
+        """Place a demon on a tile.
+
+        Parameters
+        ----------
+        pos : hoplite.utils.HexagonalCoordinates
+            Tile to place the demon on. It should not be occupied by another
+            demon.
+        demon : hoplite.game.demons.Demon
+            Demon to place.
+
+        """
+        self.save("demons")
+        self.demons[pos] = demon
+        self.board.set_demon(
+            demon_element(demon),
+            hoplite.game.bitboard.TILE_INDEX[pos]
+        )
+
+    def remove_demon(self, pos):
+        """Remove the demon standing on a tile.
+
+        Parameters
+        ----------
+        pos : hoplite.utils.HexagonalCoordinates
+            Tile of the demon.
+
+        Returns
+        -------
+        hoplite.game.demons.Demon
+            Removed demon.
+
+        """
+        self.save("demons")
+        demon = self.demons.pop(pos)
+        self.board.clear_demon(
+            demon_element(demon),
+            hoplite.game.bitboard.TILE_INDEX[pos]
+        )
+        return demon
+
+    def move_demon(self, origin, target):
+        """Move a demon from one tile to another.
+
+        Parameters
+        ----------
+        origin : hoplite.utils.HexagonalCoordinates
+            Current tile of the demon.
+        target : hoplite.utils.HexagonalCoordinates
+            Destination tile. It should not be occupied by another demon.
+
+        """
+        self.add_demon(target, self.remove_demon(origin))
+
+    def update_demon(self, pos, **changes):
+        """Change the state of a demon, for instance a wizard discharging its
+        wand. The demon is replaced by a modified copy, keeping its place
+        in the `demons` order.
+
+        Parameters
+        ----------
+        pos : hoplite.utils.HexagonalCoordinates
+            Tile of the demon.
+        **changes
+            New values of the demon attributes.
+
+        """
+        self.save("demons")
+        index = hoplite.game.bitboard.TILE_INDEX[pos]
+        demon = self.demons[pos]
+        self.board.clear_demon(demon_element(demon), index)
+        demon = demon.copy()
+        for attribute, value in changes.items():
+            setattr(demon, attribute, value)
+        self.demons[pos] = demon
+        self.board.set_demon(demon_element(demon), index)
+
+    def add_bomb(self, pos):
+        """Place a bomb on a tile.
+
+        Parameters
+        ----------
+        pos : hoplite.utils.HexagonalCoordinates
+            Tile to place the bomb on.
+
+        """
+        self.save("bombs")
+        self.bombs.add(pos)
+        self.board.set(SurfaceElement.BOMB, hoplite.game.bitboard.TILE_INDEX[pos])
+
+    def remove_bomb(self, pos):
+        """Remove the bomb lying on a tile.
+
+        Parameters
+        ----------
+        pos : hoplite.utils.HexagonalCoordinates
+            Tile of the bomb.
+
+        """
+        self.save("bombs")
+        self.bombs.remove(pos)
+        self.board.clear(SurfaceElement.BOMB, hoplite.game.bitboard.TILE_INDEX[pos])
+
+    def to_list(self):
         """Represent the terrain as a list of `SurfaceElement`.
 
         Returns
@@ -136,50 +571,15 @@ class Terrain:  # pylint: disable=R0902
             `SURFACE_COORDINATES`.
 
         """
-        result = list()
-        for pos in hoplite.utils.SURFACE_COORDINATES:
-            if pos == self.player:
-                result.append(SurfaceElement.PLAYER)
-            elif pos == self.spear:
-                result.append(SurfaceElement.SPEAR)
-            elif pos == self.altar:
-                if self.altar_prayable:
-                    result.append(SurfaceElement.ALTAR_ON)
-                else:
-                    result.append(SurfaceElement.ALTAR_OFF)
-            elif pos == self.fleece:
-                result.append(SurfaceElement.FLEECE)
-            elif pos == self.portal:
-                result.append(SurfaceElement.PORTAL)
-            elif pos in self.bombs:
-                result.append(SurfaceElement.BOMB)
-            elif pos == self.stairs:
-                result.append(SurfaceElement.STAIRS)
-            elif pos in self.demons:
-                demon = self.demons[pos]
-                if demon.skill == hoplite.game.demons.DemonSkill.FOOTMAN:
-                    result.append(SurfaceElement.FOOTMAN)
-                elif demon.skill == hoplite.game.demons.DemonSkill.ARCHER:
-                    result.append(SurfaceElement.ARCHER)
-                elif demon.skill == hoplite.game.demons.DemonSkill.DEMOLITIONIST:
-                    if demon.holds_bomb:
-                        result.append(
-                            SurfaceElement.DEMOLITIONIST_HOLDING_BOMB)
-                    else:
-                        result.append(
-                            SurfaceElement.DEMOLITIONIST_WITHOUT_BOMB)
-                elif demon.skill == hoplite.game.demons.DemonSkill.WIZARD:
-                    if demon.charged_wand:
-                        result.append(SurfaceElement.WIZARD_CHARGED)
-                    else:
-                        result.append(SurfaceElement.WIZARD_DISCHARGED)
-            elif pos in self.surface:
-                if self.surface[pos] == Tile.GROUND:
-                    result.append(SurfaceElement.GROUND)
-                elif self.surface[pos] == Tile.MAGMA:
-                    result.append(SurfaceElement.MAGMA)
-            else:
-                raise ValueError("Wrong position: %s" % pos)
+        known = self.board.get(SurfaceElement.GROUND) | self.board.get(SurfaceElement.MAGMA)
+        if known != hoplite.game.bitboard.FULL_MASK:
+            missing = hoplite.game.bitboard.FULL_MASK & ~known
+            index = (missing & -missing).bit_length() - 1
+            raise ValueError("Wrong position: %s" % hoplite.utils.SURFACE_COORDINATES[index])
+        result = [None] * hoplite.game.bitboard.TILE_COUNT
+        for element in reversed(ELEMENT_PRECEDENCE):
+            for index in hoplite.game.bitboard.iter_bits(self.board.get(element)):
+                result[index] = element
         return result
 
     @classmethod
@@ -216,26 +616,37 @@ class Terrain:  # pylint: disable=R0902
 
         """
         terrain = cls()
+        source = list(source)
+        ground = magma = 0
         for pos, elt in zip(hoplite.utils.SURFACE_COORDINATES, source):
-            terrain.surface[pos] = Tile.GROUND
+            bit = 1 << hoplite.game.bitboard.TILE_INDEX[pos]
             if elt == SurfaceElement.MAGMA:
                 terrain.surface[pos] = Tile.MAGMA
+                magma |= bit
+            else:
+                terrain.surface[pos] = Tile.GROUND
+                ground |= bit
+        terrain.board.assign(SurfaceElement.GROUND, ground)
+        terrain.board.assign(SurfaceElement.MAGMA, magma)
+        for pos, elt in zip(hoplite.utils.SURFACE_COORDINATES, source):
+            if elt in (SurfaceElement.GROUND, SurfaceElement.MAGMA):
+                continue
             if elt == SurfaceElement.FOOTMAN:
-                terrain.demons[pos] = hoplite.game.demons.Footman()
+                terrain.add_demon(pos, hoplite.game.demons.Footman())
             elif elt == SurfaceElement.ARCHER:
-                terrain.demons[pos] = hoplite.game.demons.Archer()
+                terrain.add_demon(pos, hoplite.game.demons.Archer())
             elif elt == SurfaceElement.DEMOLITIONIST_HOLDING_BOMB:
-                terrain.demons[pos] = hoplite.game.demons.Demolitionist(True)
+                terrain.add_demon(pos, hoplite.game.demons.Demolitionist(True))
             elif elt == SurfaceElement.DEMOLITIONIST_WITHOUT_BOMB:
-                terrain.demons[pos] = hoplite.game.demons.Demolitionist(False)
+                terrain.add_demon(pos, hoplite.game.demons.Demolitionist(False))
             elif elt == SurfaceElement.WIZARD_CHARGED:
-                terrain.demons[pos] = hoplite.game.demons.Wizard(True)
+                terrain.add_demon(pos, hoplite.game.demons.Wizard(True))
             elif elt == SurfaceElement.WIZARD_DISCHARGED:
-                terrain.demons[pos] = hoplite.game.demons.Wizard(False)
+                terrain.add_demon(pos, hoplite.game.demons.Wizard(False))
             elif elt == SurfaceElement.SPEAR:
                 terrain.spear = pos
             elif elt == SurfaceElement.BOMB:
-                terrain.bombs.add(pos)
+                terrain.add_bomb(pos)
             elif elt == SurfaceElement.PLAYER:
                 terrain.player = pos
             elif elt == SurfaceElement.STAIRS:
@@ -287,18 +698,60 @@ class Terrain:  # pylint: disable=R0902
             walk on (ie. not over magma or an altar).
 
         """
+        ground = self.board.get(SurfaceElement.GROUND)
         result = list()
         for pos in positions:
-            if self.surface.get(pos) != Tile.GROUND:
+            index = hoplite.game.bitboard.TILE_INDEX.get(pos)
+            if index is None or not ground >> index & 1:
                 continue
             # if pos == self.altar:
             #     continue
             result.append(pos)
         return result
 
+    def distance_field(self, target):
+        """Get the walking distances from every tile to a target tile.
+        Fields only depend on the walkable tiles, which do not change within a
+        level, and are therefore cached, see `walking_distance_field`.
+
+        Parameters
+        ----------
+        target : hoplite.utils.HexagonalCoordinates
+            Target tile.
+
+        Returns
+        -------
+        list[int]
+            Number of steps to reach the target, indexed by tile index (see
+            `hoplite.game.bitboard`). `None` for tiles the target can not be
+            reached from.
+
+        """
+        return walking_distance_field(self.board.get(SurfaceElement.GROUND), target)
+
+    def distance(self, start, goal):
+        """Number of steps of the shortest path between two tiles.
+
+        Parameters
+        ----------
+        start : hoplite.utils.HexagonalCoordinates
+            Starting position.
+        goal : hoplite.utils.HexagonalCoordinates
+            Target position.
+
+        Returns
+        -------
+        int
+            Number of steps, `None` if the goal can not be reached.
+
+        """
+        if goal not in hoplite.game.bitboard.TILE_INDEX:
+            return None
+        return self.distance_field(goal)[hoplite.game.bitboard.TILE_INDEX[start]]
+
     def pathfind(self, start, goal):
-        """Pathfinding between two tiles using the A* algorithm with norm-inf
-        distance as heuristic.
+        """Find a shortest path between two tiles, by descending the distance
+        field of the goal.
 
         Parameters
         ----------
@@ -310,66 +763,332 @@ class Terrain:  # pylint: disable=R0902
         Returns
         -------
         List[hoplite.utils.HexagonalCoordinates]
-            Path from `start` to `goal`, both included.
+            Path from `start` to `goal`, both included, `None` if the goal
+            can not be reached.
 
         """
+        if goal not in hoplite.game.bitboard.TILE_INDEX:
+            return None
+        field = self.distance_field(goal)
+        index = hoplite.game.bitboard.TILE_INDEX[start]
+        if field[index] is None:
+            return None
+        walkable = self.board.get(SurfaceElement.GROUND)
+        path = [start]
+        while field[index] > 0:
+            for neighbor in hoplite.geometry.NEIGHBORS[index]:
+                if walkable >> neighbor & 1 and field[neighbor] == field[index] - 1:
+                    index = neighbor
+                    break
+            path.append(hoplite.utils.SURFACE_COORDINATES[index])
+        return path
+
+    def _threat_key(self):
+        layers = self.board.layers
+        return (
+            layers[SurfaceElement.ALTAR_ON.value] | layers[SurfaceElement.ALTAR_OFF.value],
+            layers[SurfaceElement.FOOTMAN.value],
+            layers[SurfaceElement.ARCHER.value],
+            layers[SurfaceElement.DEMOLITIONIST_HOLDING_BOMB.value]
+            | layers[SurfaceElement.DEMOLITIONIST_WITHOUT_BOMB.value],
+            layers[SurfaceElement.WIZARD_CHARGED.value]
+            | layers[SurfaceElement.WIZARD_DISCHARGED.value],
+        )
 
-        heuristic = dict()
-        came_from = dict()
-        cost = dict()
-        open_set = [HeapQNode(start, heuristic)]
-        heapq.heapify(open_set)
-        for pos in hoplite.utils.SURFACE_COORDINATES:
-            cost[HeapQNode(pos, heuristic)] = float("inf")
-            heuristic[HeapQNode(pos, heuristic)] = float("inf")
-        cost[HeapQNode(start, heuristic)] = 0.
-        heuristic[HeapQNode(start, heuristic)] = (goal - start).norm()
-        while len(open_set) > 0:
-            current = heapq.heappop(open_set)
-            if current.position == goal:
-                path = [current.position]
-                while current in came_from:
-                    current = came_from[current]
-                    path.insert(0, current.position)
-                return path
-            for neighbor_position in self.walkable(
-                    *hoplite.utils.hexagonal_neighbors(current.position)):
-                neighbor = HeapQNode(neighbor_position, heuristic)
-                tentative_cost = cost[current] + 1
-                if tentative_cost < cost[neighbor]:
-                    came_from[neighbor] = current
-                    cost[neighbor] = tentative_cost
-                    heuristic[neighbor] = tentative_cost + \
-                        (goal - neighbor_position).norm()
-                    heapq.heappush(open_set, neighbor)
-        return None
-
-
-class HeapQNode:
-    """Wrapper for HexagonalCoordinates with order defined by an
-    heuristic dictionnary, meant to be used by the `heapq` module.
+    def threat_map(self):
+        """Get the tiles each demon can hit with an attack, see `ThreatMap`.
+        The map is cached until the demons or the altar are modified; copies
+        of the terrain share it.
+
+        Returns
+        -------
+        ThreatMap
+            Threat map of the current terrain.
+
+        """
+        key = self._threat_key()
+        if self._threats is None or self._threats.key != key:
+            self._threats = ThreatMap(self, key)
+        return self._threats
+
+    def threatens(self, demon_pos, pos):
+        """Check whether a demon can hit a tile with an attack.
+
+        Parameters
+        ----------
+        demon_pos : hoplite.utils.HexagonalCoordinates
+            Location of the demon.
+        pos : hoplite.utils.HexagonalCoordinates
+            Tile to check.
+
+        Returns
+        -------
+        bool
+            Whether the tile is within the reach of the demon.
+
+        """
+        index = hoplite.game.bitboard.TILE_INDEX.get(pos)
+        if index is None:
+            return False
+        return bool(self.threat_map().attackers[index]
+                    >> hoplite.game.bitboard.TILE_INDEX[demon_pos] & 1)
+
+    def demon_turn(self):
+        """Gather the data the demons need to move, see `DemonTurn`.
+
+        Returns
+        -------
+        DemonTurn
+            Data for moving the demons of the current terrain.
+
+        """
+        return DemonTurn(self)
+
+    def advance_demons(self, rng=None, attackers=0):
+        """Resolve the moves of all the demons that did not attack, in the
+        order of `demons`, see `hoplite.game.demons.Demon.move`. The distance
+        fields they follow are computed once for the whole pass. As other
+        modifications, the moves are recorded in the journal if it is open.
+
+        Parameters
+        ----------
+        rng : random.Random
+            Source of randomness for the demon choices, `None` for
+            deterministic moves.
+        attackers : int
+            Mask of the tiles of the demons that attacked the player during
+            this turn, and therefore do not move, see
+            `hoplite.game.moves.PlayerMove.attackers`.
+
+        """
+        turn = DemonTurn(self)
+        for demon_pos, demon in list(self.demons.items()):
+            if attackers >> hoplite.game.bitboard.TILE_INDEX[demon_pos] & 1:
+                continue
+            demon.move(self, demon_pos, rng, turn)
+
+
+class ThreatMap:  # pylint: disable=R0903
+    """Tiles the demons of a terrain can hit with an attack, respecting the
+    ranges of the demons, obstruction by the altar and other demons, and
+    careful demons. Whether an attack actually happens also depends on the
+    state of the demon, such as the charge of a wizard wand.
 
     Parameters
     ----------
-    position : hoplite.utils.HexagonalCoordinates
-        Node position.
-    weights : dict[HeapQNode, int]
-        Reference to the heuristic dictionnary.
+    terrain : Terrain
+        Terrain to compute the threats of.
+    key : tuple[int]
+        Masks of the altar and of each kind of demons the map is computed
+        from, to detect when it is outdated.
+
+    Attributes
+    ----------
+    reaches : dict[int, int]
+        Mask of the tiles each demon can hit, by tile index of the demon.
+    attackers : list[int]
+        Mask of the demons that can hit each tile, indexed by tile index.
+    mask : int
+        Mask of the tiles at least one demon can hit.
+    key
 
     """
 
-    def __init__(self, position, weights):
-        self.position = position
-        self.weights = weights
+    def __init__(self, terrain, key):
+        self.key = key
+        demons = terrain.board.demons
+        obstacles = demons | key[0]
+        self.reaches = dict()
+        self.attackers = [0] * hoplite.game.bitboard.TILE_COUNT
+        self.mask = 0
+        for demon_pos, demon in terrain.demons.items():
+            index = hoplite.game.bitboard.TILE_INDEX[demon_pos]
+            reach = demon.reach(index, obstacles, demons)
+            self.reaches[index] = reach
+            self.mask |= reach
+            for target in hoplite.game.bitboard.iter_bits(reach):
+                self.attackers[target] |= 1 << index
+
+
+class DemonTurn:
+    """Data shared by the moves of the demons during a turn. Goal fields are
+    computed with the demons on their initial tiles, and cached for the whole
+    turn; the occupied tiles are updated as the demons walk, through `walk`.
 
-    def __hash__(self):
-        return hash(self.position)
+    Parameters
+    ----------
+    terrain : Terrain
+        Terrain the demons move on.
 
-    def __eq__(self, other):
-        return self.position == other.position
+    Attributes
+    ----------
+    player_field : list[int]
+        Walking distances to the player, see `Terrain.distance_field`.
+    blocked : int
+        Mask of the tiles demons can not walk to: magma, altar, and tiles
+        occupied by the player, a demon or a bomb.
+    avoided : int
+        Mask of the tiles ranged demons avoid to stand on: stairs and spear.
+    terrain
+
+    """
+
+    def __init__(self, terrain):
+        board = terrain.board
+        self.terrain = terrain
+        self.player_field = terrain.distance_field(terrain.player)
+        self.blocked = board.demons\
+            | board.get(SurfaceElement.PLAYER)\
+            | board.get(SurfaceElement.BOMB)\
+            | board.get(SurfaceElement.ALTAR_ON)\
+            | board.get(SurfaceElement.ALTAR_OFF)\
+            | hoplite.game.bitboard.FULL_MASK & ~board.get(SurfaceElement.GROUND)
+        self.avoided = board.get(SurfaceElement.STAIRS) | board.get(SurfaceElement.SPEAR)
+        self._player = hoplite.game.bitboard.TILE_INDEX[terrain.player]
+        self._fields = dict()
+        self._sights = dict()
+
+    def player_disk(self, radius):
+        """Mask of the tiles within a given distance of the player.
+
+        Parameters
+        ----------
+        radius : int
+            Radius of the disk.
+
+        Returns
+        -------
+        int
+            Mask of the disk, player tile included.
+
+        """
+        return hoplite.game.bitboard.disk_mask(self._player, radius)
+
+    def line_of_sight(self, min_range, max_range):
+        """Mask of the tiles a ranged demon could hit the player from, along
+        one of the six directions, with a clear view: no altar nor other
+        demon in between. Demon carefulness is not taken into account.
+
+        Parameters
+        ----------
+        min_range : int
+            Minimum attack range, see `hoplite.game.demons.Demon`.
+        max_range : int
+            Maximum attack range, see `hoplite.game.demons.Demon`.
+
+        Returns
+        -------
+        int
+            Mask of the shooting tiles.
+
+        """
+        key = (min_range, max_range)
+        mask = self._sights.get(key)
+        if mask is None:
+            board = self.terrain.board
+            obstacles = board.demons\
+                | board.get(SurfaceElement.ALTAR_ON)\
+                | board.get(SurfaceElement.ALTAR_OFF)
+            mask = 0
+            for rays in hoplite.geometry.RAYS:
+                for distance, index in enumerate(rays[self._player], 1):
+                    if distance > max_range:
+                        break
+                    if distance > min_range:
+                        mask |= 1 << index
+                    if obstacles >> index & 1:
+                        break
+            self._sights[key] = mask
+        return mask
+
+    def goal_field(self, goals):
+        """Walking distances to the nearest of some goal tiles, over the
+        ground and ignoring the demons, as for `Terrain.distance_field`.
+
+        Parameters
+        ----------
+        goals : int
+            Mask of the goal tiles.
+
+        Returns
+        -------
+        list[int]
+            Distances indexed by tile index, `None` for tiles no goal can be
+            reached from.
+
+        """
+        field = self._fields.get(goals)
+        if field is None:
+            field = self._fields[goals] = hoplite.game.bitboard.mask_distance_field(
+                self.terrain.board.get(SurfaceElement.GROUND), goals)
+        return field
+
+    def free_neighbors(self, index):
+        """Tiles around a tile a demon can walk to.
+
+        Parameters
+        ----------
+        index : int
+            Index of the tile.
 
-    def __lt__(self, other):
-        return self.weights[self] < other.weights[other]
+        Returns
+        -------
+        list[int]
+            Indices of the neighbor tiles that are not blocked.
+
+        """
+        return list(hoplite.game.bitboard.iter_bits(
+            hoplite.game.bitboard.NEIGHBOR_MASKS[index] & ~self.blocked))
+
+    def bomb_targets(self, demon_pos, throw_range):
+        """Tiles a demolitionist may throw a bomb to: next to the player,
+        within throwing range, free, and not next to another demon.
+
+        Parameters
+        ----------
+        demon_pos : hoplite.utils.HexagonalCoordinates
+            Location of the demolitionist.
+        throw_range : int
+            Maximum throwing distance.
+
+        Returns
+        -------
+        int
+            Mask of the possible targets.
+
+        """
+        index = hoplite.game.bitboard.TILE_INDEX[demon_pos]
+        crowded = 0
+        for other in hoplite.game.bitboard.iter_bits(
+                self.terrain.board.demons & ~(1 << index)):
+            crowded |= hoplite.game.bitboard.NEIGHBOR_MASKS[other]
+        return hoplite.game.bitboard.NEIGHBOR_MASKS[self._player]\
+            & hoplite.game.bitboard.disk_mask(index, throw_range)\
+            & ~self.blocked\
+            & ~crowded
+
+    def walk(self, origin, target):
+        """Move a demon to a neighbor tile.
+
+        Parameters
+        ----------
+        origin : hoplite.utils.HexagonalCoordinates
+            Location of the demon.
+        target : int
+            Index of the destination tile, which should not be blocked.
+
+        Returns
+        -------
+        hoplite.utils.HexagonalCoordinates
+            Destination tile.
+
+        """
+        destination = hoplite.utils.SURFACE_COORDINATES[target]
+        self.terrain.move_demon(origin, destination)
+        self.blocked = self.blocked\
+            & ~(1 << hoplite.game.bitboard.TILE_INDEX[origin])\
+            | 1 << target
+        return destination
 
 
 class Sprite(pygame.Surface):  # pylint: disable=E0239, R0903
@@ -503,6 +1222,7 @@ class TerrainRenderer:  # pylint: disable=R0903
         ))
 
     def _render_ranges(self, screen):
+        threats = self.terrain.threat_map()
         for demon_pos, demon in self.terrain.demons.items():
             range_surface = pygame.Surface(  # pylint: disable=E1121
                 (screen.get_width(), screen.get_height()),
@@ -515,7 +1235,8 @@ class TerrainRenderer:  # pylint: disable=R0903
                 hoplite.game.demons.DemonSkill.DEMOLITIONIST: (255, 0, 0, 70),
                 hoplite.game.demons.DemonSkill.WIZARD: (0, 0, 255, 70)
             }[demon.skill]
-            for pos in demon.range(self.terrain, demon_pos):
+            for pos in hoplite.game.bitboard.iter_positions(
+                    threats.reaches[hoplite.game.bitboard.TILE_INDEX[demon_pos]]):
                 column, row = pos.doubled()
                 position = (
                     int(self.tile_width * column) + self.screen_width // 2,
@@ -0,0 +1,80 @@
+"""Zobrist keys of the game components.
+
+A game state is hashed as the exclusive or of random 64-bit keys, one for
+each of its components: one per tile and `hoplite.game.terrain.SurfaceElement`
+for the terrain, one per value of each field for the status. Changing a
+component then only requires to xor its old and new keys. Keys are derived
+from fixed seeds, so they are the same across processes.
+"""
+
+import random
+import hoplite.geometry
+
+
+KEY_BITS = 64
+
+LAYER_COUNT = 16
+
+
+def _generate_tile_keys():
+    rng = random.Random("hoplite.game.zobrist")
+    return [
+        [rng.getrandbits(KEY_BITS) for _ in range(hoplite.geometry.TILE_COUNT)]
+        for _ in range(LAYER_COUNT)
+    ]
+
+
+TILE_KEYS = _generate_tile_keys()
+"""list[list[int]]: `TILE_KEYS[e][i]` is the key of the element of value `e`
+standing on the tile of index `i`."""
+
+_COMPONENT_KEYS = dict()
+
+
+def component_key(component, value):
+    """Get the key of a value taken by a component of the state, such as
+    the energy of the player.
+
+    Parameters
+    ----------
+    component : str
+        Name of the component.
+    value : int
+        Value of the component.
+
+    Returns
+    -------
+    int
+        64-bit key of the value.
+
+    """
+    key = _COMPONENT_KEYS.get((component, value))
+    if key is None:
+        key = random.Random("%s/%d" % (component, value)).getrandbits(KEY_BITS)
+        _COMPONENT_KEYS[(component, value)] = key
+    return key
+
+
+def mask_key(layer, mask):
+    """Compute the key of the tiles of a mask within a layer.
+
+    Parameters
+    ----------
+    layer : int
+        Value of the `hoplite.game.terrain.SurfaceElement` of the layer.
+    mask : int
+        Mask of the tiles.
+
+    Returns
+    -------
+    int
+        Exclusive or of the keys of the tiles.
+
+    """
+    keys = TILE_KEYS[layer]
+    key = 0
+    while mask:
+        low = mask & -mask
+        key ^= keys[low.bit_length() - 1]
+        mask ^= low
+    return key
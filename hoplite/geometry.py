@@ -0,0 +1,93 @@
+"""Precomputed geometry of the hexagonal map, built once at import.
+
+Tiles are referred to by their index from 0 to 78, following the order of
+`hoplite.utils.SURFACE_COORDINATES`. Directions are referred to by their index
+in `DIRECTIONS`, which follows the order of
+`hoplite.utils.HEXAGONAL_DIRECTIONS`.
+"""
+
+
+def _iter_tiles():
+    # pylint: disable=C0103
+    for x, height in zip(range(-4, 5), [7, 8, 9, 10, 11, 10, 9, 8, 7]):
+        if x >= 0:
+            start = -5
+        else:
+            start = - 5 - x
+        for y in range(start, start + height):
+            yield x, y
+
+
+def _norm(x, y):
+    # pylint: disable=C0103
+    return max(abs(x), abs(y), abs(x + y))
+
+
+TILES = tuple(_iter_tiles())
+"""tuple[tuple[int, int]]: `(x, y)` coordinates of the tiles."""
+
+TILE_COUNT = len(TILES)
+
+INDEX = {tile: index for index, tile in enumerate(TILES)}
+"""dict[tuple[int, int], int]: Index of a tile from its coordinates."""
+
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1), (-1, 1), (1, -1))
+"""tuple[tuple[int, int]]: `(x, y)` coordinates of the six unit vectors."""
+
+DIRECTION_INDEX = {direction: index for index, direction in enumerate(DIRECTIONS)}
+"""dict[tuple[int, int], int]: Index of a direction from its coordinates."""
+
+MAX_DISTANCE = max(
+    _norm(x1 - x2, y1 - y2)
+    for x1, y1 in TILES
+    for x2, y2 in TILES
+)
+"""int: Largest distance between two tiles."""
+
+STEPS = tuple(
+    tuple(INDEX.get((x + dx, y + dy)) for dx, dy in DIRECTIONS)
+    for x, y in TILES
+)
+"""tuple[tuple[int]]: `STEPS[i][d]` is the index of the tile next to tile `i`
+in direction `d`, `None` if it is outside of the map."""
+
+NEIGHBORS = tuple(
+    tuple(index for index in steps if index is not None)
+    for steps in STEPS
+)
+"""tuple[tuple[int]]: Indices of the tiles surrounding each tile."""
+
+DISTANCES = tuple(
+    tuple(_norm(x1 - x2, y1 - y2) for x2, y2 in TILES)
+    for x1, y1 in TILES
+)
+"""tuple[tuple[int]]: `DISTANCES[i][j]` is the hexagonal distance between the
+tiles `i` and `j`."""
+
+DISKS = tuple(
+    tuple(
+        tuple(j for j in range(TILE_COUNT) if DISTANCES[i][j] <= radius)
+        for i in range(TILE_COUNT)
+    )
+    for radius in range(MAX_DISTANCE + 1)
+)
+"""tuple[tuple[tuple[int]]]: `DISKS[r][i]` are the indices of the tiles at
+distance at most `r` from tile `i`, tile `i` included."""
+
+
+def _ray(index, direction):
+    result = list()
+    while True:
+        index = STEPS[index][direction]
+        if index is None:
+            return tuple(result)
+        result.append(index)
+
+
+RAYS = tuple(
+    tuple(_ray(index, direction) for index in range(TILE_COUNT))
+    for direction in range(len(DIRECTIONS))
+)
+"""tuple[tuple[tuple[int]]]: `RAYS[d][i]` are the indices of the tiles met
+when going from tile `i` in direction `d`, until the edge of the map. Tile `i`
+itself is excluded."""
@@ -9,6 +9,85 @@ from ppadb.device import Device
 LOGGER = logging.getLogger(__name__)
 
 
+class ShellInput:
+    """Input backend keeping a single shell session open on the device, and
+    writing `input tap` commands to it. This spares the opening of a new
+    shell service for every touch, and lets several touches be sent with a
+    single write.
+
+    Parameters
+    ----------
+    device : ppadb.device.Device
+        Device to send the touches to.
+
+    Attributes
+    ----------
+    connection : ppadb.connection.Connection
+        Stream to the standard input and output of the shell, `None` until
+        `open` is called.
+    device
+
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self.connection = None
+        self._commands = 0
+
+    def open(self):
+        """Start the shell session. `exec:` does not allocate a terminal, so
+        the shell neither echoes the commands nor prints a prompt; its error
+        output is discarded, as nothing reads it.
+        """
+        self.connection = self.device.create_connection()
+        self.connection.send("exec:sh")
+        self.connection.write(b"exec 2>/dev/null\n")
+
+    def close(self):
+        """End the shell session.
+        """
+        if self.connection is not None:
+            try:
+                self.connection.write(b"exit\n")
+            except OSError:
+                pass
+            self.connection.close()
+            self.connection = None
+
+    def _run(self, command):
+        """Run a command in the shell, and wait for it to complete. The
+        command is followed by an `echo` of a marker, which the shell only
+        prints once the command is over.
+        """
+        if self.connection is None:
+            self.open()
+        self._commands += 1
+        marker = b"hoplite-%d\n" % self._commands
+        try:
+            self.connection.write(command.encode("ascii") + b"; echo " + marker)
+            output = b""
+            while not output.endswith(marker):
+                data = self.connection.read(4096)
+                if not data:
+                    raise ConnectionError("Shell session closed by the device")
+                output += data
+        except OSError:
+            LOGGER.warning("Lost the shell session, it will be reopened on the next touch")
+            self.close()
+            raise
+
+    def tap(self, points):
+        """Touch the screen at a sequence of points, in order.
+
+        Parameters
+        ----------
+        points : list[tuple[int, int]]
+            Screen coordinates of the points to touch.
+
+        """
+        self._run("; ".join("input tap %d %d" % point for point in points))
+
+
 class PurePythonAdbInterface:
     """Implementation for abstract communication with devices
 
@@ -27,13 +106,16 @@ class PurePythonAdbInterface:
         AVD default device serial name for adb
     device: ppadb.device.Device
         Device interface for touch and snapshot
+    shell_input : ShellInput
+        Persistent shell session used for touches, `None` if each touch
+        opens its own shell service.
     """
 
     HOST = "localhost"
     PORT = 5037
     DEFAULT_DEVICE_SERIAL = "emulator-5554"
 
-    def __init__(self, device_serial: Optional[str]):
+    def __init__(self, device_serial: Optional[str], persistent_shell: bool = True):
         serial = device_serial or self.DEFAULT_DEVICE_SERIAL
         device = AdbClient(host=self.HOST, port=self.PORT).device(serial)
         if not device:
@@ -42,25 +124,39 @@ class PurePythonAdbInterface:
         if not isinstance(device, Device):  # Should never occur
             raise ConnectionRefusedError()
         self.device = device
+        self.shell_input = ShellInput(device) if persistent_shell else None
 
     def open(self):
-        """For compatibility"""
+        """Open the persistent shell session, if any."""
+        if self.shell_input is not None:
+            self.shell_input.open()
 
-    def snapshot(self, as_stream=False):
+    def snapshot(self, as_stream=False, raw=False):
         """Take a snapshot of the screen.
 
         Parameters
         ----------
         as_stream : bool
             Whether to wrap the output in a `io.BytesIO` stream.
+        raw : bool
+            Whether to get the raw framebuffer content instead of a PNG image,
+            sparing the encoding on the device and the decoding on the host.
+            See `hoplite.vision.observer.ScreenParser.read_raw` for the format.
 
         Returns
         -------
         list[bytes]
-            Screenshot PNG image data.
+            Screenshot PNG image data, or raw image data.
 
         """
-        image_data = self.device.screencap()
+        if raw:
+            # exec: does not allocate a terminal, which would translate
+            # newline bytes within the binary output.
+            with self.device.create_connection() as conn:
+                conn.send("exec:/system/bin/screencap")
+                image_data = conn.read_all()
+        else:
+            image_data = self.device.screencap()
         if as_stream:
             return io.BytesIO(image_data)
         return image_data
@@ -76,7 +172,25 @@ class PurePythonAdbInterface:
             y coordinate of the point to touch on screen.
 
         """
-        self.device.input_tap(touch_x, touch_y)
+        self.touch_sequence([(touch_x, touch_y)])
+
+    def touch_sequence(self, points):
+        """Touch the screen at several points, in order. With a persistent
+        shell, all the touches are sent at once.
+
+        Parameters
+        ----------
+        points : list[tuple[int, int]]
+            Screen coordinates of the points to touch.
+
+        """
+        if self.shell_input is not None:
+            self.shell_input.tap(points)
+            return
+        for touch_x, touch_y in points:
+            self.device.input_tap(touch_x, touch_y)
 
     def close(self):
-        """For compatibility"""
+        """Close the persistent shell session, if any."""
+        if self.shell_input is not None:
+            self.shell_input.close()
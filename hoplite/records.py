@@ -0,0 +1,461 @@
+"""Compact binary format for game logs, see `hoplite.controller.Recorder`.
+Each record has a fixed width, so that a file of several games can be memory
+mapped and its turns sliced as a NumPy structured array, without parsing nor
+copying. Files start with a header and an index giving the range of records
+of each game.
+
+Records hold the game state of move records as in their text form: the
+`hoplite.game.terrain.SurfaceElement` of each tile as a nibble, the status
+fields, and the prayers both as a bitmask and in the order they were made.
+Altar records keep the prayers offered by the altar in the prayer fields,
+and the chosen prayer in the `choice` field.
+"""
+
+import os
+import mmap
+import struct
+import logging
+import numpy
+import hoplite.utils
+import hoplite.controller
+import hoplite.game.moves
+import hoplite.game.state
+import hoplite.game.status
+import hoplite.game.terrain
+
+
+LOGGER = logging.getLogger(__name__)
+
+EXTENSION = ".hpl"
+
+MAGIC = b"HPLR"
+
+VERSION = 1
+
+HEADER = struct.Struct("<4sHHQQ8x")
+"""struct.Struct: File header, with the magic bytes, the format version, the
+size of a record, the number of games and the number of records."""
+
+KINDS = ("move", "altar")
+"""tuple[str]: Kinds of records, indexed by the `kind` field."""
+
+MOVES = ("move", "walk", "leap", "bash", "throw", "altar", "idle")
+"""tuple[str]: Kinds of player moves, as in their representation strings,
+indexed by the `move` field."""
+
+MOVE_CLASSES = (
+    hoplite.game.moves.PlayerMove,
+    hoplite.game.moves.WalkMove,
+    hoplite.game.moves.LeapMove,
+    hoplite.game.moves.BashMove,
+    hoplite.game.moves.ThrowMove,
+    hoplite.game.moves.AltarMove,
+    hoplite.game.moves.IdleMove,
+)
+
+NO_TARGET = -128
+"""int: Coordinates of the target of moves without one."""
+
+MAX_PRAYERS = 16
+
+TILES = len(hoplite.utils.SURFACE_COORDINATES)
+
+SURFACE_ELEMENTS = tuple(hoplite.game.terrain.SurfaceElement)
+"""tuple[hoplite.game.terrain.SurfaceElement]: Surface elements, indexed by
+their value."""
+
+RECORD_DTYPE = numpy.dtype([
+    ("turn", "<u4"),
+    ("kind", "u1"),
+    ("depth", "u1"),
+    ("terrain", "u1", ((TILES + 1) // 2,)),
+    ("cooldown", "u1"),
+    ("energy", "<u2"),
+    ("spear", "u1"),
+    ("health", "u1"),
+    ("spree", "<u2"),
+    ("prayer_mask", "<u4"),
+    ("prayer_count", "u1"),
+    ("prayers", "u1", (MAX_PRAYERS,)),
+    ("move", "u1"),
+    ("target", "i1", (2,)),
+    ("choice", "u1"),
+])
+"""numpy.dtype: Record of a turn. Tiles are stored two per byte, the first
+one in the high nibble."""
+
+INDEX_DTYPE = numpy.dtype([
+    ("start", "<u8"),
+    ("count", "<u8"),
+    ("name", "S112"),
+])
+"""numpy.dtype: Index entry of a game, with the position of its first record,
+its number of records, and its name."""
+
+
+def _encode_prayers(values):
+    if len(values) > MAX_PRAYERS:
+        raise ValueError("Too many prayers to record: %d" % len(values))
+    mask = 0
+    for value in values:
+        mask |= 1 << value
+    return mask, len(values), values + [0] * (MAX_PRAYERS - len(values))
+
+
+def _encode_altar(turn, altar_string, prayer_string):
+    mask, count, prayers = _encode_prayers(
+        [int(prayer) for prayer in altar_string.split(",") if prayer != ""])
+    return (int(turn), 1, 0, [0] * RECORD_DTYPE["terrain"].shape[0], 0, 0, 0, 0, 0,
+            mask, count, prayers, 0, [NO_TARGET, NO_TARGET], int(prayer_string))
+
+
+def _encode_move(turn, state_string, move_string):
+    depth, terrain, status = state_string.split(";")
+    status_fields = status.split("/")
+    mask, count, prayers = _encode_prayers(
+        [int(prayer) for prayer in status_fields[5].split(",") if prayer != "-"])
+    move_fields = move_string.split("/")
+    target = [NO_TARGET, NO_TARGET]
+    if len(move_fields) > 1:
+        target = [int(coordinate) for coordinate in move_fields[1].split(",")]
+    return (
+        int(turn),
+        0,
+        int(depth),
+        list(bytes.fromhex(terrain + "0" * (len(terrain) % 2))),
+        *map(int, status_fields[:5]),
+        mask,
+        count,
+        prayers,
+        MOVES.index(move_fields[0]),
+        target,
+        0
+    )
+
+
+def _encode_line(line):
+    """Convert a line of a text game log to a record tuple, or `None` if it
+    is not a record.
+    """
+    fields = line.rstrip("\n").split("\t")
+    if len(fields) != 4 or fields[1] not in KINDS:
+        return None
+    if fields[1] == "altar":
+        return _encode_altar(fields[0], fields[2], fields[3])
+    return _encode_move(fields[0], fields[2], fields[3])
+
+
+def read_log(path):
+    """Read a text game log as records.
+
+    Parameters
+    ----------
+    path : str
+        Path to the game log.
+
+    Returns
+    -------
+    numpy.ndarray
+        Records of the log, with dtype `RECORD_DTYPE`.
+
+    """
+    rows = list()
+    with open(path, "r") as file:
+        for line in file:
+            row = _encode_line(line)
+            if row is None:
+                LOGGER.warning("Skipping line of %s: %s", path, line.strip())
+                continue
+            rows.append(row)
+    return numpy.array(rows, dtype=RECORD_DTYPE)
+
+
+def format_record(record):
+    """Format a record as a line of a text game log.
+
+    Parameters
+    ----------
+    record : numpy.void
+        Record, with dtype `RECORD_DTYPE`.
+
+    Returns
+    -------
+    str
+        Line of the record, without the line break, as written by
+        `hoplite.controller.Recorder`.
+
+    """
+    prayers = ",".join(str(value) for value in record["prayers"][:record["prayer_count"]])
+    if record["kind"] == 1:
+        return "%s\taltar\t%s\t%d" % (str(record["turn"]).rjust(3, "0"), prayers, record["choice"])
+    move = MOVES[record["move"]]
+    if record["target"][0] != NO_TARGET:
+        move += "/%d,%d" % tuple(record["target"])
+    return "%s\tmove\t%d;%s;%d/%d/%d/%d/%d/%s\t%s" % (
+        str(record["turn"]).rjust(3, "0"),
+        record["depth"],
+        record["terrain"].tobytes().hex()[:TILES],
+        record["cooldown"],
+        record["energy"],
+        record["spear"],
+        record["health"],
+        record["spree"],
+        prayers if prayers else "-",
+        move
+    )
+
+
+def write_log(records, path):
+    """Write records as a text game log.
+
+    Parameters
+    ----------
+    records : numpy.ndarray
+        Records to write, with dtype `RECORD_DTYPE`.
+    path : str
+        Path to the game log to write.
+
+    """
+    with open(path, "w") as file:
+        for record in records:
+            file.write(format_record(record) + "\n")
+
+
+def terrain_elements(records):
+    """Unpack the tiles of records.
+
+    Parameters
+    ----------
+    records : numpy.ndarray
+        Records, with dtype `RECORD_DTYPE`, or a single record.
+
+    Returns
+    -------
+    numpy.ndarray
+        Values of the `hoplite.game.terrain.SurfaceElement` of the tiles, with
+        shape `records.shape + (TILES,)`, in the `SURFACE_COORDINATES` order.
+
+    """
+    packed = records["terrain"]
+    elements = numpy.empty(packed.shape[:-1] + (2 * packed.shape[-1],), dtype=numpy.uint8)
+    elements[..., 0::2] = packed >> 4
+    elements[..., 1::2] = packed & 15
+    return elements[..., :TILES]
+
+
+def decode_state(record):
+    """Build the game state of a move record.
+
+    Parameters
+    ----------
+    record : numpy.void
+        Move record, with dtype `RECORD_DTYPE`.
+
+    Returns
+    -------
+    hoplite.game.state.GameState
+        Game state of the record.
+
+    """
+    state = hoplite.game.state.GameState()
+    state.depth = int(record["depth"])
+    state.terrain = hoplite.game.terrain.Terrain.from_list([
+        SURFACE_ELEMENTS[value]
+        for value in terrain_elements(record)
+    ])
+    status = hoplite.game.status.Status()
+    status.cooldown = int(record["cooldown"])
+    status.energy = int(record["energy"])
+    status.spear = bool(record["spear"])
+    status.health = int(record["health"])
+    status.spree = int(record["spree"])
+    for value in record["prayers"][:record["prayer_count"]]:
+        status.add_prayer(hoplite.game.status.Prayer(int(value)), False)
+    state.status = status
+    return state
+
+
+def decode_move(record):
+    """Build the player move of a move record.
+
+    Parameters
+    ----------
+    record : numpy.void
+        Move record, with dtype `RECORD_DTYPE`.
+
+    Returns
+    -------
+    hoplite.game.moves.PlayerMove
+        Move of the record.
+
+    """
+    target = None
+    if record["target"][0] != NO_TARGET:
+        target = hoplite.utils.HexagonalCoordinates(*map(int, record["target"]))
+    return MOVE_CLASSES[record["move"]](target)
+
+
+def save(path, games):
+    """Write games to a binary file.
+
+    Parameters
+    ----------
+    path : str
+        Path to the file to write.
+    games : list[tuple[str, numpy.ndarray]]
+        Name and records of each game, with dtype `RECORD_DTYPE`.
+
+    """
+    index = numpy.zeros(len(games), dtype=INDEX_DTYPE)
+    start = 0
+    for i, (name, records) in enumerate(games):
+        encoded = name.encode("utf8")
+        if len(encoded) > INDEX_DTYPE["name"].itemsize:
+            raise ValueError("Game name is too long: %s" % name)
+        index[i] = (start, len(records), encoded)
+        start += len(records)
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, len(games), start))
+        file.write(index.tobytes())
+        for _, records in games:
+            file.write(numpy.ascontiguousarray(records, dtype=RECORD_DTYPE).tobytes())
+
+
+class RecordFile:
+    """Binary file of games, memory mapped. Records are read from the
+    mapping on access, without copying them. Arrays returned by the file
+    must not be used once it is closed.
+
+    Parameters
+    ----------
+    path : str
+        Path to the file.
+
+    Attributes
+    ----------
+    index : numpy.ndarray
+        Index of the games, with dtype `INDEX_DTYPE`.
+    records : numpy.ndarray
+        Records of all the games, in order, with dtype `RECORD_DTYPE`.
+    path
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self._mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, itemsize, games, count = HEADER.unpack_from(self._mapping)
+        if magic != MAGIC or version != VERSION or itemsize != RECORD_DTYPE.itemsize:
+            self._mapping.close()
+            raise ValueError("Unsupported record file %s" % path)
+        self.index = numpy.frombuffer(
+            self._mapping, dtype=INDEX_DTYPE, count=games, offset=HEADER.size)
+        self.records = numpy.frombuffer(
+            self._mapping,
+            dtype=RECORD_DTYPE,
+            count=count,
+            offset=HEADER.size + games * INDEX_DTYPE.itemsize
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def names(self):
+        """list[str]: Names of the games, in order."""
+        return [name.decode("utf8") for name in self.index["name"]]
+
+    def game(self, i):
+        """Get the records of a game.
+
+        Parameters
+        ----------
+        i : int
+            Index of the game.
+
+        Returns
+        -------
+        numpy.ndarray
+            Records of the game, as a view over the file.
+
+        """
+        start = int(self.index[i]["start"])
+        return self.records[start:start + int(self.index[i]["count"])]
+
+    def close(self):
+        """Release the arrays of the file and unmap it. If some views are
+        still referenced elsewhere, the mapping is closed when they are
+        garbage collected.
+        """
+        self.index = None
+        self.records = None
+        try:
+            self._mapping.close()
+        except BufferError:
+            LOGGER.debug("Records of %s are still referenced", self.path)
+
+
+def is_record_file(path):
+    """Check whether a file is in the binary format.
+
+    Parameters
+    ----------
+    path : str
+        Path to the file.
+
+    Returns
+    -------
+    bool
+        Whether the file starts with `MAGIC`.
+
+    """
+    with open(path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def pack(paths, output):
+    """Convert text game logs to a binary file. Games are named after the
+    folders of their logs, relatively to their common parent.
+
+    Parameters
+    ----------
+    paths : list[str]
+        Paths to the text game logs.
+    output : str
+        Path to the binary file to write.
+
+    """
+    folders = [os.path.dirname(os.path.abspath(path)) for path in paths]
+    parent = os.path.commonpath(folders) if len(folders) > 1 else os.path.dirname(folders[0])
+    games = list()
+    for path, folder in zip(paths, folders):
+        games.append((os.path.relpath(folder, parent), read_log(path)))
+    save(output, games)
+    LOGGER.info("Packed %d games, %d records, into %s",
+                len(games), sum(len(records) for _, records in games), output)
+
+
+def unpack(path, output):
+    """Convert a binary file to text game logs, one folder per game.
+
+    Parameters
+    ----------
+    path : str
+        Path to the binary file.
+    output : str
+        Folder to write the games to.
+
+    """
+    with RecordFile(path) as records:
+        for i, name in enumerate(records.names):
+            folder = os.path.join(output, name)
+            os.makedirs(folder, exist_ok=True)
+            write_log(records.game(i), os.path.join(folder, hoplite.controller.Recorder.FILENAME))
+        LOGGER.info("Unpacked %d games into %s", len(records), output)
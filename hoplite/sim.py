@@ -0,0 +1,496 @@
+"""Headless simulation of the game, to play without a device.
+
+Turns are resolved by the move model of `hoplite.game.moves`, then demons
+walk and the end of turn is applied, following the rules described in
+`RULES.md`. Levels are randomly generated from a seed, so that a simulated
+game can be replayed exactly.
+"""
+
+import time
+import random
+import logging
+import collections
+import hoplite.utils
+import hoplite.game.bitboard
+import hoplite.game.demons
+import hoplite.game.moves
+import hoplite.game.state
+import hoplite.game.status
+import hoplite.game.terrain
+
+
+LOGGER = logging.getLogger(__name__)
+
+MAX_DEPTH = 16
+"""int: Depth of the last level, where the fleece and the portal are."""
+
+DEMON_COSTS = {
+    hoplite.game.demons.DemonSkill.FOOTMAN: 1,
+    hoplite.game.demons.DemonSkill.DEMOLITIONIST: 2,
+    hoplite.game.demons.DemonSkill.ARCHER: 3,
+    hoplite.game.demons.DemonSkill.WIZARD: 4,
+}
+"""dict[hoplite.game.demons.DemonSkill, int]: Share of the level budget taken
+by each kind of demon, see `demon_budget`."""
+
+DEMON_DEPTHS = {
+    hoplite.game.demons.DemonSkill.FOOTMAN: 1,
+    hoplite.game.demons.DemonSkill.ARCHER: 1,
+    hoplite.game.demons.DemonSkill.DEMOLITIONIST: 3,
+    hoplite.game.demons.DemonSkill.WIZARD: 5,
+}
+"""dict[hoplite.game.demons.DemonSkill, int]: First depth at which each kind
+of demon appears."""
+
+DEMON_CLASSES = {
+    hoplite.game.demons.DemonSkill.FOOTMAN: hoplite.game.demons.Footman,
+    hoplite.game.demons.DemonSkill.ARCHER: hoplite.game.demons.Archer,
+    hoplite.game.demons.DemonSkill.DEMOLITIONIST: hoplite.game.demons.Demolitionist,
+    hoplite.game.demons.DemonSkill.WIZARD: hoplite.game.demons.Wizard,
+}
+
+PRAYER_SACRIFICES = {
+    hoplite.game.status.Prayer.BLOODLUST: 1,
+    hoplite.game.status.Prayer.GREATER_THROW_II: 1,
+    hoplite.game.status.Prayer.GREATER_ENERGY_II: 1,
+    hoplite.game.status.Prayer.SURGE: 1,
+    hoplite.game.status.Prayer.REGENERATION: 1,
+    hoplite.game.status.Prayer.WINGED_SANDALS: 1,
+    hoplite.game.status.Prayer.STAGGERING_LEAP: 2,
+}
+"""dict[hoplite.game.status.Prayer, int]: Maximum health sacrificed by the
+prayers that have a cost."""
+
+PRAYER_REQUIREMENTS = {
+    hoplite.game.status.Prayer.GREATER_THROW_II: hoplite.game.status.Prayer.GREATER_THROW,
+    hoplite.game.status.Prayer.GREATER_ENERGY_II: hoplite.game.status.Prayer.GREATER_ENERGY,
+}
+"""dict[hoplite.game.status.Prayer, hoplite.game.status.Prayer]: Prayer that
+must have been made before another one is offered."""
+
+REPEATABLE_PRAYERS = (
+    hoplite.game.status.Prayer.DIVINE_RESTORATION,
+    hoplite.game.status.Prayer.FORTITUDE,
+)
+
+MAXIMUM_HEALTH = 8
+
+
+def demon_budget(depth):
+    """Total cost of the demons of a level, see `DEMON_COSTS`. It grows
+    linearly, from a footman and an archer at depth 1 to a cost of 28 at
+    depth 16.
+
+    Parameters
+    ----------
+    depth : int
+        Depth of the level.
+
+    Returns
+    -------
+    int
+        Budget of the level.
+
+    """
+    return 4 + (8 * (depth - 1) + 2) // 5
+
+
+class LevelGenerator:
+    """Random generator of levels. Layouts approximate the ones of the game:
+    the player enters at the bottom of the map and the stairs are at the top,
+    with some magma and an altar in between.
+
+    Parameters
+    ----------
+    rng : random.Random
+        Source of randomness.
+
+    Attributes
+    ----------
+    MAGMA_TILES : tuple[int, int]
+        Range of the number of magma tiles.
+    SAFE_DISTANCE : int
+        Minimum distance between the player and the demons when entering a
+        level.
+    rng
+
+    """
+
+    MAGMA_TILES = (6, 14)
+    SAFE_DISTANCE = 3
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def _pick(self, candidates, taken):
+        return self.rng.choice([pos for pos in candidates if pos not in taken])
+
+    def demons(self, depth):
+        """Draw the demons of a level, until the level budget is spent.
+
+        Parameters
+        ----------
+        depth : int
+            Depth of the level.
+
+        Returns
+        -------
+        list[hoplite.game.demons.Demon]
+            Demons of the level.
+
+        """
+        demons = [hoplite.game.demons.Footman(), hoplite.game.demons.Archer()]
+        budget = demon_budget(depth) - DEMON_COSTS[hoplite.game.demons.DemonSkill.FOOTMAN]\
+            - DEMON_COSTS[hoplite.game.demons.DemonSkill.ARCHER]
+        while budget > 0:
+            skills = [
+                skill for skill, cost in DEMON_COSTS.items()
+                if cost <= budget and DEMON_DEPTHS[skill] <= depth
+            ]
+            skill = self.rng.choice(skills)
+            budget -= DEMON_COSTS[skill]
+            demon = DEMON_CLASSES[skill]()
+            if skill == hoplite.game.demons.DemonSkill.DEMOLITIONIST:
+                demon.holds_bomb = True
+            demons.append(demon)
+        return demons
+
+    def generate(self, depth):
+        """Generate a level.
+
+        Parameters
+        ----------
+        depth : int
+            Depth of the level.
+
+        Returns
+        -------
+        hoplite.game.terrain.Terrain
+            Terrain of the level, with the stairs reachable from the player.
+
+        """
+        rows = {pos: pos.doubled()[1] for pos in hoplite.utils.SURFACE_COORDINATES}
+        while True:
+            terrain = hoplite.game.terrain.Terrain()
+            terrain.player = self.rng.choice([pos for pos, row in rows.items() if row <= -3])
+            exit_pos = self.rng.choice([pos for pos, row in rows.items() if row >= 3])
+            taken = {terrain.player, exit_pos}
+            if depth < MAX_DEPTH:
+                terrain.stairs = exit_pos
+                terrain.altar = self._pick(
+                    [pos for pos, row in rows.items() if -2 <= row <= 2], taken)
+                terrain.altar_prayable = True
+                taken.add(terrain.altar)
+            else:
+                terrain.stairs = None
+                terrain.portal = exit_pos
+                terrain.fleece = self._pick(
+                    [pos for pos, row in rows.items() if -1 <= row <= 1], taken)
+                taken.add(terrain.fleece)
+            magma = set(self.rng.sample(
+                [pos for pos in hoplite.utils.SURFACE_COORDINATES if pos not in taken],
+                self.rng.randint(*LevelGenerator.MAGMA_TILES)
+            ))
+            for pos in hoplite.utils.SURFACE_COORDINATES:
+                if pos in magma:
+                    terrain.set_tile(pos, hoplite.game.terrain.Tile.MAGMA)
+                else:
+                    terrain.set_tile(pos, hoplite.game.terrain.Tile.GROUND)
+            if terrain.distance(terrain.player, exit_pos) is None:
+                continue
+            spawns = [
+                pos for pos in hoplite.utils.SURFACE_COORDINATES
+                if pos not in taken and pos not in magma
+                and hoplite.utils.hexagonal_distance(pos, terrain.player)
+                >= LevelGenerator.SAFE_DISTANCE
+            ]
+            for demon, pos in zip(self.demons(depth), self.rng.sample(spawns, len(spawns))):
+                terrain.add_demon(pos, demon)
+            return terrain
+
+
+class Engine:  # pylint: disable=R0902
+    """Headless game engine. A turn is the player move, resolved by
+    `hoplite.game.moves.PlayerMove.make` (player attacks, bomb explosions and
+    demon attacks), then the moves of the demons that did not attack, see
+    `hoplite.game.terrain.Terrain.advance_demons`, and finally the end of
+    turn (bash cooldown). Bombs thrown by demolitionists explode after the
+    next player move. Taking the stairs starts a new level, with the energy
+    restored.
+
+    Parameters
+    ----------
+    seed : int
+        Seed of the random generator, `None` for a random seed.
+    starting_prayers : list[hoplite.game.status.Prayer]
+        Prayers made before entering the first level.
+
+    Attributes
+    ----------
+    rng : random.Random
+        Source of randomness for the levels, the demons and the altars.
+    generator : LevelGenerator
+        Generator of the levels.
+    state : hoplite.game.state.GameState
+        Current state of the game.
+    interface : hoplite.game.state.Interface
+        Interface displayed by the game, either `PLAYING`, `ALTAR` while a
+        prayer must be picked, `DEATH` or `VICTORY`.
+    altar : hoplite.game.state.AltarState
+        Prayers offered by the altar while `interface` is `ALTAR`.
+    turn : int
+        Number of turns played.
+    ALTAR_PRAYERS : int
+        Number of prayers offered by an altar.
+    seed
+
+    """
+
+    ALTAR_PRAYERS = 3
+
+    def __init__(self, seed=None, starting_prayers=None):
+        self.seed = seed
+        self.starting_prayers = list() if starting_prayers is None else starting_prayers
+        self.rng = None
+        self.generator = None
+        self.state = None
+        self.interface = None
+        self.altar = None
+        self.turn = 0
+        self.reset()
+
+    def reset(self):
+        """Start a new game at depth 1, reseeding the random generator.
+
+        Returns
+        -------
+        hoplite.game.state.GameState
+            State of the game at the beginning of the first level.
+
+        """
+        self.rng = random.Random(self.seed)
+        self.generator = LevelGenerator(self.rng)
+        self.state = hoplite.game.state.GameState()
+        for prayer in self.starting_prayers:
+            self.state.status.add_prayer(prayer)
+        self.state.terrain = self.generator.generate(1)
+        self.interface = hoplite.game.state.Interface.PLAYING
+        self.altar = None
+        self.turn = 0
+        return self.state
+
+    def _offer_prayers(self):
+        status = self.state.status
+        candidates = list()
+        for prayer in hoplite.game.status.Prayer:
+            if prayer in status.prayers and prayer not in REPEATABLE_PRAYERS:
+                continue
+            if PRAYER_SACRIFICES.get(prayer, 0) >= status.attributes.maximum_health:
+                continue
+            if prayer == hoplite.game.status.Prayer.FORTITUDE\
+                and status.attributes.maximum_health >= MAXIMUM_HEALTH:
+                continue
+            if prayer in PRAYER_REQUIREMENTS\
+                and PRAYER_REQUIREMENTS[prayer] not in status.prayers:
+                continue
+            candidates.append(prayer)
+        altar = hoplite.game.state.AltarState()
+        for prayer in self.rng.sample(candidates, min(Engine.ALTAR_PRAYERS, len(candidates))):
+            altar.prayers[prayer] = 0
+        return altar
+
+    def _descend(self):
+        self.state.depth += 1
+        self.state.terrain = self.generator.generate(self.state.depth)
+        self.state.status.energy = self.state.status.attributes.maximum_energy
+        LOGGER.debug("Entering depth %d", self.state.depth)
+
+    def step(self, move):
+        """Play a turn.
+
+        Parameters
+        ----------
+        move : hoplite.game.moves.PlayerMove
+            Move of the player, which must be legal in the current state.
+
+        Returns
+        -------
+        hoplite.game.state.Interface
+            Interface displayed after the turn: `STAIRS` if the player took
+            the stairs to a new level, otherwise `interface`.
+
+        """
+        if self.interface != hoplite.game.state.Interface.PLAYING:
+            raise ValueError("Can not play a move on the %s interface" % self.interface.name)
+        self.turn += 1
+        move.make(self.state)
+        terrain, status = self.state.terrain, self.state.status
+        if status.health == 0:
+            self.interface = hoplite.game.state.Interface.DEATH
+            return self.interface
+        if terrain.player == terrain.fleece:
+            terrain.fleece = None
+        if terrain.portal is not None and terrain.player == terrain.portal\
+            and terrain.fleece is None:
+            self.interface = hoplite.game.state.Interface.VICTORY
+            return self.interface
+        if terrain.player == terrain.stairs and status.spear:
+            self._descend()
+            return hoplite.game.state.Interface.STAIRS
+        terrain.advance_demons(self.rng, move.attackers)
+        status.cooldown = max(0, status.cooldown - 1)
+        if isinstance(move, hoplite.game.moves.AltarMove):
+            self.altar = self._offer_prayers()
+            if self.altar.prayers:
+                self.interface = hoplite.game.state.Interface.ALTAR
+        return self.interface
+
+    def pray(self, prayer):
+        """Pick a prayer offered by the altar.
+
+        Parameters
+        ----------
+        prayer : hoplite.game.status.Prayer
+            One of the prayers of `altar`.
+
+        Returns
+        -------
+        hoplite.game.state.Interface
+            Interface displayed after the prayer.
+
+        """
+        if self.interface != hoplite.game.state.Interface.ALTAR\
+            or prayer not in self.altar.prayers:
+            raise ValueError("Prayer %s is not offered" % prayer)
+        self.state.status.add_prayer(prayer)
+        self.altar = None
+        self.interface = hoplite.game.state.Interface.PLAYING
+        return self.interface
+
+    def play(self, brain, max_turns=None):
+        """Play a full game with a brain.
+
+        Parameters
+        ----------
+        brain : hoplite.brain.Brain
+            Brain picking the moves and the prayers.
+        max_turns : int
+            Number of turns after which the game is stopped, `None` for no
+            limit.
+
+        Returns
+        -------
+        hoplite.game.state.Interface
+            Interface that ended the game, `DEATH` or `VICTORY`, or `PLAYING`
+            if it reached `max_turns`.
+
+        """
+        while max_turns is None or self.turn < max_turns:
+            if self.interface == hoplite.game.state.Interface.ALTAR:
+                self.pray(brain.pick_prayer(self.altar))
+                continue
+            if self.interface != hoplite.game.state.Interface.PLAYING:
+                break
+            if next(self.state.possible_moves(), None) is None:
+                # Nothing is legal: the player can only wait for the demons
+                move = hoplite.game.moves.IdleMove(self.state.terrain.player)
+            else:
+                move = brain.pick_move(self.state)
+                brain.remember_move(self.state, move)
+            self.step(move)
+        return self.interface
+
+
+class SimulationReport:  # pylint: disable=R0903
+    """Results of a simulated game.
+
+    Parameters
+    ----------
+    seed : int
+        Seed of the game.
+
+    Attributes
+    ----------
+    outcome : str
+        Name of the `hoplite.game.state.Interface` that ended the game.
+    depth : int
+        Depth reached.
+    turns : int
+        Number of turns played.
+    duration : float
+        Duration of the game, in seconds.
+    seed
+
+    """
+
+    def __init__(self, seed):
+        self.seed = seed
+        self.outcome = None
+        self.depth = 0
+        self.turns = 0
+        self.duration = 0.
+
+    def __repr__(self):
+        return "%s: %s at depth %d after %d turns (%.2f seconds)" % (
+            self.seed, self.outcome, self.depth, self.turns, self.duration)
+
+
+def simulate(brain_factory, seeds, max_turns=None, starting_prayers=None):
+    """Play a series of simulated games.
+
+    Parameters
+    ----------
+    brain_factory : Callable[[], hoplite.brain.Brain]
+        Builds the brain of each game.
+    seeds : Iterable[int]
+        Seeds of the games.
+    max_turns : int
+        Number of turns after which a game is stopped, `None` for no limit.
+    starting_prayers : list[hoplite.game.status.Prayer]
+        Prayers made before entering the first level.
+
+    Returns
+    -------
+    list[SimulationReport]
+        Results of the games.
+
+    """
+    reports = list()
+    for seed in seeds:
+        time_start = time.time()
+        engine = Engine(seed, starting_prayers)
+        report = SimulationReport(seed)
+        report.outcome = engine.play(brain_factory(), max_turns).name
+        report.depth = engine.state.depth
+        report.turns = engine.turn
+        report.duration = time.time() - time_start
+        LOGGER.info("Game ended: %s", report)
+        reports.append(report)
+    return reports
+
+
+def summarize(reports):
+    """Aggregate the results of simulated games.
+
+    Parameters
+    ----------
+    reports : list[SimulationReport]
+        Results of the games.
+
+    Returns
+    -------
+    str
+        One line summary.
+
+    """
+    outcomes = collections.Counter(report.outcome for report in reports)
+    turns = sum(report.turns for report in reports)
+    duration = sum(report.duration for report in reports)
+    return "%d games (%s), depth %.1f avg. / %d max., %d turns, %.0f turns/second" % (
+        len(reports),
+        ", ".join("%s %d" % item for item in sorted(outcomes.items())),
+        sum(report.depth for report in reports) / max(len(reports), 1),
+        max((report.depth for report in reports), default=0),
+        turns,
+        turns / max(duration, 1e-9)
+    )
@@ -1,13 +1,20 @@
 """General utilities. Mostly hexagonal coordinates tools.
 """
 
+import hoplite.geometry
 
-class HexagonalCoordinates:
+
+class HexagonalCoordinates:  # pylint: disable=E1101, W0212
     """Wrapper for hexagonal coordinates. It follows the description of this
     article:
     [*Hexagonal Grids*, by Red Blob Games](https://www.redblobgames.com/grids/hexagons/).
     Here is a plot of what it looks like: ![](https://i.imgur.com/EOaG67E.png)
 
+    Coordinates are immutable. Integer coordinates close to the map (see
+    `INTERNED_RADIUS`) are interned: there is only one instance for each of
+    them, created at import, so that equality is an identity check, and
+    additions of unit vectors and rotations are table lookups.
+
     Attributes
     ----------
     x : float
@@ -19,11 +26,42 @@ class HexagonalCoordinates:
 
     """
 
-    def __init__(self, x, y):
+    __slots__ = ("x", "y", "z", "_hash", "_interned", "_direction",
+                 "_steps", "_rotations")
+
+    _REGISTRY = dict()
+    _GRADIENTS = dict()
+
+    def __new__(cls, x, y):
         # pylint: disable=C0103
-        self.x = x
-        self.y = y
-        self.z = - x - y
+        instance = HexagonalCoordinates._REGISTRY.get((x, y))
+        if instance is not None:
+            return instance
+        instance = object.__new__(cls)
+        object.__setattr__(instance, "x", x)
+        object.__setattr__(instance, "y", y)
+        object.__setattr__(instance, "z", - x - y)
+        object.__setattr__(instance, "_hash", hash((x, y)))
+        object.__setattr__(instance, "_interned", False)
+        object.__setattr__(instance, "_direction", None)
+        object.__setattr__(instance, "_steps", None)
+        object.__setattr__(instance, "_rotations", None)
+        return instance
+
+    def __setattr__(self, name, value):
+        raise AttributeError("HexagonalCoordinates are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("HexagonalCoordinates are immutable")
+
+    def __reduce__(self):
+        return (HexagonalCoordinates, (self.x, self.y))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __repr__(self):
         return str((self.x, self.y))
@@ -35,20 +73,33 @@ class HexagonalCoordinates:
         return iter([self.x, self.y])
 
     def __hash__(self):
-        return hash((self.x, self.y))
+        return self._hash
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if other is None:
             return False
+        if self._interned and getattr(other, "_interned", False):
+            return False
         return self.x == other.x and self.y == other.y
 
     def __add__(self, other):
+        if self._steps is not None and other._direction is not None:
+            result = self._steps[other._direction]
+            if result is not None:
+                return result
         return HexagonalCoordinates(
             self.x + other.x,
             self.y + other.y
         )
 
     def __sub__(self, other):
+        if self._steps is not None and other._direction is not None:
+            # Opposite directions are consecutive in HEXAGONAL_DIRECTIONS
+            result = self._steps[other._direction ^ 1]
+            if result is not None:
+                return result
         return HexagonalCoordinates(
             self.x - other.x,
             self.y - other.y
@@ -97,6 +148,14 @@ class HexagonalCoordinates:
             Gradient vector of the displacement from `self` to `other`.
 
         """
+        if self._interned and other._interned:
+            key = (self, other)
+            result = HexagonalCoordinates._GRADIENTS.get(key)
+            if result is None:
+                gap = other - self
+                result = gap / gap.norm()
+                HexagonalCoordinates._GRADIENTS[key] = result
+            return result
         gap = other - self
         return gap / gap.norm()
 
@@ -112,15 +171,16 @@ class HexagonalCoordinates:
         return (self.x, self.y + .5 * self.x)
 
     def copy(self):
-        """Copy itself.
+        """Copy itself. As coordinates are immutable, this returns the
+        position itself.
 
         Returns
         -------
         HexagonalCoordinates
-            Same position but different address.
+            Same position.
 
         """
-        return HexagonalCoordinates(self.x, self.y)
+        return self
 
     def rotate(self, steps):
         """Rotate an hexagonal vector.
@@ -139,8 +199,10 @@ class HexagonalCoordinates:
             Rotated vector.
 
         """
+        if self._rotations is not None:
+            return self._rotations[steps % 6]
         clockwise = steps < 0
-        result = self.copy()
+        result = self
         for _ in range(abs(steps)):
             if clockwise:
                 result = HexagonalCoordinates(-result.z, -result.x)
@@ -149,6 +211,38 @@ class HexagonalCoordinates:
         return result
 
 
+INTERNED_RADIUS = 12
+"""int: Integer coordinates with a norm up to this radius are interned. This
+covers the map, the tiles a bash may knock entities to, and the displacement
+vectors between two tiles of the map."""
+
+
+def _intern_coordinates():
+    # pylint: disable=C0103, W0212
+    registry = HexagonalCoordinates._REGISTRY
+    for x in range(-INTERNED_RADIUS, INTERNED_RADIUS + 1):
+        for y in range(-INTERNED_RADIUS, INTERNED_RADIUS + 1):
+            if abs(x + y) <= INTERNED_RADIUS:
+                instance = HexagonalCoordinates(x, y)
+                object.__setattr__(instance, "_interned", True)
+                registry[(x, y)] = instance
+    for (x, y), instance in registry.items():
+        object.__setattr__(instance, "_steps", tuple(
+            registry.get((x + dx, y + dy))
+            for dx, dy in hoplite.geometry.DIRECTIONS
+        ))
+        rotations = [instance]
+        for _ in range(5):
+            previous = rotations[-1]
+            rotations.append(registry[(-previous.y, -previous.z)])
+        object.__setattr__(instance, "_rotations", tuple(rotations))
+    for index, direction in enumerate(hoplite.geometry.DIRECTIONS):
+        object.__setattr__(registry[direction], "_direction", index)
+
+
+_intern_coordinates()
+
+
 def iter_coords():
     """Iterates over the coordinates of the map.
 
@@ -159,24 +253,18 @@ def iter_coords():
 
     """
     # pylint: disable=C0103
-    for x, height in zip(range(-4, 5), [7, 8, 9, 10, 11, 10, 9, 8, 7]):
-        if x >= 0:
-            start = -5
-        else:
-            start = - 5 - x
-        for y in range(start, start + height):
-            yield HexagonalCoordinates(x, y)
+    for x, y in hoplite.geometry.TILES:
+        yield HexagonalCoordinates(x, y)
 
 
 SURFACE_COORDINATES = list(iter_coords())
+SURFACE_INDEX = {pos: index for index, pos in enumerate(SURFACE_COORDINATES)}
 HEXAGONAL_DIRECTIONS = [
-    HexagonalCoordinates(1, 0),
-    HexagonalCoordinates(-1, 0),
-    HexagonalCoordinates(0, 1),
-    HexagonalCoordinates(0, -1),
-    HexagonalCoordinates(-1, 1),
-    HexagonalCoordinates(1, -1),
+    HexagonalCoordinates(x, y) for x, y in hoplite.geometry.DIRECTIONS
 ]
+DIRECTION_INDEX = {
+    direction: index for index, direction in enumerate(HEXAGONAL_DIRECTIONS)
+}
 
 
 def hexagonal_neighbors(pos):
@@ -193,8 +281,38 @@ def hexagonal_neighbors(pos):
         Set of positions surrounding the center.
 
     """
-    return set(pos + direction for direction in HEXAGONAL_DIRECTIONS)\
-        .intersection(SURFACE_COORDINATES)
+    index = SURFACE_INDEX.get(pos)
+    if index is None:
+        return set(pos + direction for direction in HEXAGONAL_DIRECTIONS)\
+            .intersection(SURFACE_INDEX)
+    return {
+        SURFACE_COORDINATES[neighbor]
+        for neighbor in hoplite.geometry.NEIGHBORS[index]
+    }
+
+
+def hexagonal_distance(start, end):
+    """Compute the distance between two positions, i.e. the infinite norm
+    of their difference.
+
+    Parameters
+    ----------
+    start : HexagonalCoordinates
+        First position.
+    end : HexagonalCoordinates
+        Second position.
+
+    Returns
+    -------
+    int
+        Number of steps between the two positions.
+
+    """
+    start_index = SURFACE_INDEX.get(start)
+    end_index = SURFACE_INDEX.get(end)
+    if start_index is None or end_index is None:
+        return (end - start).norm()
+    return hoplite.geometry.DISTANCES[start_index][end_index]
 
 
 def hexagonal_circle(center, radius):
@@ -214,9 +332,18 @@ def hexagonal_circle(center, radius):
         Set of positions within the hexagonal circle of given center and radius.
 
     """
+    index = SURFACE_INDEX.get(center)
+    if index is None or not isinstance(radius, int):
+        return {
+            pos for pos in SURFACE_COORDINATES
+            if (pos - center).norm() <= radius
+        }
+    if radius < 0:
+        return set()
     return {
-        pos for pos in SURFACE_COORDINATES
-        if (pos - center).norm() <= radius
+        SURFACE_COORDINATES[tile]
+        for tile in hoplite.geometry.DISKS[
+            min(radius, hoplite.geometry.MAX_DISTANCE)][index]
     }
 
 
@@ -236,10 +363,17 @@ def hexagonal_line(start, direction):
         Tiles within the hexagonal line, from `start` and going.
 
     """
+    index = SURFACE_INDEX.get(start)
+    direction_index = DIRECTION_INDEX.get(direction)
+    if index is not None and direction_index is not None:
+        return [start] + [
+            SURFACE_COORDINATES[tile]
+            for tile in hoplite.geometry.RAYS[direction_index][index]
+        ]
     result = [start]
     while True:
         current = result[-1] + direction
-        if current not in SURFACE_COORDINATES:
+        if current not in SURFACE_INDEX:
             break
         result.append(current)
     return result
@@ -1,5 +1,8 @@
 # pylint: disable=R0911, R0912
 """Classifiers for recognizing templates on parts of screen.
+
+Classifiers read `uint8` RGB pixels, and compare them to reference colors
+packed as 24-bit integers (see `pack`), which only match exactly.
 """
 
 import numpy
@@ -7,23 +10,135 @@ import hoplite.game.terrain
 import hoplite.game.status
 
 
-def is_close(tgt, ref, tol=.001):
-    """Check if two pixels are of same color.
+def to_uint8(array):
+    """Convert color values in [0, 1], such as those of decoded PNG files, to
+    `uint8` values. `uint8` arrays are returned as is.
 
     Parameters
     ----------
-    tgt : numpy.ndarray
-        Target pixel (vector).
-    ref : numpy.ndarray
-        Rerence pixel (vector).
+    array : numpy.ndarray
+        Color values.
 
     Returns
     -------
-    bool
-        `True` if pixels are the same.
+    numpy.ndarray
+        Color values in [0, 255], with `uint8` type.
+
+    """
+    if array.dtype == numpy.uint8:
+        return array
+    return numpy.rint(numpy.multiply(array, 255)).astype(numpy.uint8)
+
+
+def pack(pixels):
+    """Pack `uint8` RGB pixels into 24-bit integers `0xRRGGBB`, so that
+    colors are compared with a single exact integer comparison.
+
+    Parameters
+    ----------
+    pixels : numpy.ndarray
+        Pixels, of shape `(..., 3)`.
+
+    Returns
+    -------
+    numpy.ndarray
+        Packed colors, of shape `(...)`.
+
+    """
+    pixels = pixels.astype(numpy.uint32)
+    return (pixels[..., 0] << 16) | (pixels[..., 1] << 8) | pixels[..., 2]
+
+
+_LEVELS = numpy.divide(numpy.arange(256), 255, dtype=numpy.float32)
+
+FLEECE_HUE = abs(_LEVELS[:, numpy.newaxis] * 0.80465513 + 0.018641233 - _LEVELS) < .03
+"""numpy.ndarray: `FLEECE_HUE[red, green]` tells whether a color has the hue
+of the golden fleece, whose green component is about 80% of the red one."""
+
+
+TERRAIN_PROBES = (
+    (10, 0), (45, 40), (15, 26), (37, 37), (20, 23), (26, 26), (15, 15),
+    (33, 28), (8, 25), (48, 26), (0, 0), (42, 51), (28, 0), (37, 26),
+)
+"""tuple[tuple[int, int]]: Pixels of a terrain tile image (row, column) that
+the terrain classifier looks at. Other classifiers declare the pixels they
+read in the same manner, so that `hoplite.vision.observer.ProbePlan` can
+gather them all at once."""
+
+
+def _matches(packed, probe, *colors):
+    """Check for all the samples at once whether a probe has one of some
+    colors."""
+    column = packed[:, TERRAIN_PROBES.index(probe)]
+    result = column == colors[0]
+    for color in colors[1:]:
+        result |= column == color
+    return result
+
+
+def terrain_batch(samples):
+    """Classify terrain tiles from their probe pixels, all tiles at once.
+
+    Parameters
+    ----------
+    samples : numpy.ndarray
+        Array of shape `(n_tiles, len(TERRAIN_PROBES), 3)`, with the `uint8`
+        colors of the `TERRAIN_PROBES` pixels of each tile.
+
+    Returns
+    -------
+    List[hoplite.game.terrain.SurfaceElement]
+        `hoplite.game.terrain.SurfaceElement` representation for each tile,
+        `None` for unrecognized tiles.
 
     """
-    return numpy.isclose(tgt - ref, 0, atol=tol).all()
+    element = hoplite.game.terrain.SurfaceElement
+    packed = pack(samples)
+    fleece = samples[:, TERRAIN_PROBES.index((26, 26))]
+    ground = _matches(packed, (10, 0), 0x4A4D4A, 0x393C39)
+    footman = _matches(packed, (45, 40), 0xEF8A31)
+    archer = _matches(packed, (15, 26), 0x9CE35A)
+    player = _matches(packed, (37, 37), 0xBD2431)
+    bomb = _matches(packed, (20, 23), 0xFFC342)
+    thrown_spear = _matches(packed, (26, 26), 0x734518, 0xEF8A31)
+    demolitionist = _matches(packed, (33, 28), 0x294142)
+    wizard = _matches(packed, (48, 26), 0xBD4984)
+    stairs_corner = _matches(packed, (0, 0), 0x526D39)
+    rules = [
+        # Tiles with a ground background
+        (ground & footman, element.FOOTMAN),
+        (ground & archer, element.ARCHER),
+        (ground & player, element.PLAYER),
+        (ground & bomb, element.BOMB),
+        (ground & thrown_spear, element.SPEAR),
+        (ground, element.GROUND),
+        # Other tiles
+        (_matches(packed, (15, 15), 0x6B1410), element.MAGMA),
+        (_matches(packed, (33, 28), 0xE75D5A), element.DEMOLITIONIST_HOLDING_BOMB),
+        (demolitionist & _matches(packed, (8, 25), 0xBD2431), element.FOOTMAN),
+        (demolitionist, element.DEMOLITIONIST_WITHOUT_BOMB),
+        (wizard & _matches(packed, (0, 0), 0xBD2431), element.WIZARD_CHARGED),
+        (wizard, element.WIZARD_DISCHARGED),
+        (player, element.PLAYER),
+        (_matches(packed, (15, 15), 0x526D39), element.STAIRS),
+        (_matches(packed, (42, 51), 0xE75D5A), element.ALTAR_ON),
+        (stairs_corner & _matches(packed, (28, 0), 0x212421), element.ALTAR_ON),
+        (stairs_corner, element.ALTAR_OFF),
+        ((fleece[:, 2] == 0) & FLEECE_HUE[fleece[:, 0], fleece[:, 1]],
+         element.FLEECE),
+        (_matches(packed, (37, 26), 0x108E94, 0x9CAED6), element.PORTAL),
+        (bomb, element.BOMB),
+        (thrown_spear, element.SPEAR),
+        (footman, element.FOOTMAN),
+        (archer, element.ARCHER),
+        (_matches(packed, (26, 26), 0x393C39), element.GROUND),
+    ]
+    labels = numpy.select(
+        [condition for condition, _ in rules],
+        [label.value for _, label in rules],
+        default=-1
+    )
+    return [None if label < 0 else element(label) for label in labels]
 
 
 def terrain(part):
@@ -32,7 +147,7 @@ def terrain(part):
     Parameters
     ----------
     part : numpy.ndarray
-        Tile image array of shape `(52, 52, 3)`.
+        Tile image array of shape `(52, 52, 3)`, with `uint8` values.
 
     Returns
     -------
@@ -40,63 +155,14 @@ def terrain(part):
         `hoplite.game.terrain.SurfaceElement` representation for that tile.
 
     """
-    if is_close(part[10, 0], [0.290196, 0.301961, 0.290196])\
-            or is_close(part[10, 0], [0.223529, 0.235294, 0.223529]):
-        if is_close(part[45, 40], [0.937255, 0.541176, 0.192157]):
-            return hoplite.game.terrain.SurfaceElement.FOOTMAN
-        if is_close(part[15, 26], [0.611765, 0.890196, 0.352941]):
-            return hoplite.game.terrain.SurfaceElement.ARCHER
-        if is_close(part[37, 37], [0.741176, 0.141176, 0.192157]):
-            return hoplite.game.terrain.SurfaceElement.PLAYER
-        if is_close(part[20, 23], [1.000000, 0.764706, 0.258824]):
-            return hoplite.game.terrain.SurfaceElement.BOMB
-        if is_close(part[26, 26], [0.4509804, 0.27058825, 0.09411765]):
-            return hoplite.game.terrain.SurfaceElement.SPEAR
-        if is_close(part[26, 26], [0.9372549, 0.5411765, 0.19215687]):
-            return hoplite.game.terrain.SurfaceElement.SPEAR
-        return hoplite.game.terrain.SurfaceElement.GROUND
-    if is_close(part[15, 15], numpy.array([0.41960785, 0.07843138, 0.0627451])):
-        return hoplite.game.terrain.SurfaceElement.MAGMA
-    if is_close(part[33, 28], [0.905882, 0.364706, 0.352941]):
-        return hoplite.game.terrain.SurfaceElement.DEMOLITIONIST_HOLDING_BOMB
-    if is_close(part[33, 28], [0.160784, 0.254902, 0.258824]):
-        if is_close(part[8, 25], [0.741176, 0.141176, 0.192157]):
-            return hoplite.game.terrain.SurfaceElement.FOOTMAN
-        return hoplite.game.terrain.SurfaceElement.DEMOLITIONIST_WITHOUT_BOMB
-    if is_close(part[48, 26], [0.741176, 0.286275, 0.517647]):
-        if is_close(part[0, 0], [0.741176, 0.141176, 0.192157]):
-            return hoplite.game.terrain.SurfaceElement.WIZARD_CHARGED
-        return hoplite.game.terrain.SurfaceElement.WIZARD_DISCHARGED
-    if is_close(part[37, 37], [0.741176, 0.141176, 0.192157]):
-        return hoplite.game.terrain.SurfaceElement.PLAYER
-    if is_close(part[15, 15], [0.321569, 0.427451, 0.223529]):
-        return hoplite.game.terrain.SurfaceElement.STAIRS
-    if is_close(part[42, 51], [0.905882, 0.364706, 0.352941]):
-        return hoplite.game.terrain.SurfaceElement.ALTAR_ON
-    if is_close(part[0, 0], numpy.array([0.321569, 0.427451, 0.223529])):
-        if is_close(part[28, 0], [0.129412, 0.141176, 0.129412]):
-            return hoplite.game.terrain.SurfaceElement.ALTAR_ON
-        return hoplite.game.terrain.SurfaceElement.ALTAR_OFF
-    if part[26, 26, 2] == 0 and\
-        abs(part[26, 26, 0] * 0.80465513 + 0.018641233 - part[26, 26, 1]) < .03:
-        return hoplite.game.terrain.SurfaceElement.FLEECE
-    if is_close(part[37, 26], [0.062745, 0.556863, 0.580392]):
-        return hoplite.game.terrain.SurfaceElement.PORTAL
-    if is_close(part[37, 26], [0.6117647, 0.68235296, 0.8392157]):
-        return hoplite.game.terrain.SurfaceElement.PORTAL
-    if is_close(part[20, 23], [1.000000, 0.764706, 0.258824]):
-        return hoplite.game.terrain.SurfaceElement.BOMB
-    if is_close(part[26, 26], [0.4509804, 0.27058825, 0.09411765]):
-        return hoplite.game.terrain.SurfaceElement.SPEAR
-    if is_close(part[26, 26], [0.9372549, 0.5411765, 0.19215687]):
-        return hoplite.game.terrain.SurfaceElement.SPEAR
-    if is_close(part[45, 40], [0.937255, 0.541176, 0.192157]):
-        return hoplite.game.terrain.SurfaceElement.FOOTMAN
-    if is_close(part[15, 26], [0.611765, 0.890196, 0.352941]):
-        return hoplite.game.terrain.SurfaceElement.ARCHER
-    if is_close(part[26, 26], [0.223529, 0.235294, 0.223529]):
-        return hoplite.game.terrain.SurfaceElement.GROUND
-    return None
+    rows, columns = zip(*TERRAIN_PROBES)
+    return terrain_batch(part[numpy.newaxis, rows, columns, :3])[0]
+
+
+FONT_PROBES = (
+    (0, 9), (0, 5), (0, 0), (20, 10), (0, 17), (20, 2), (17, 17), (10, 0), (12, 0), (9, 5),
+)
+"""tuple[tuple[int, int]]: Pixels read by `font`."""
 
 
 def font(part):
@@ -106,7 +172,8 @@ def font(part):
     Parameters
     ----------
     part : numpy.ndarray
-        Character image array of shape `(28, 20, 3)`.
+        Thresholded character mask of shape `(28, 20)`, see
+        `hoplite.vision.observer.Thresholder`.
 
     Returns
     -------
@@ -114,31 +181,43 @@ def font(part):
         Recognized character.
 
     """
-    if is_close(part[0, 9], [1., 1., 1.]):
-        if is_close(part[0, 5], [1., 1., 1.]):
-            if is_close(part[0, 0], [1., 1., 1.]):
-                if is_close(part[20, 10], [1., 1., 1.]):
-                    if is_close(part[0, 17], [0., 0., 0.]):
+    if part[0, 9]:
+        if part[0, 5]:
+            if part[0, 0]:
+                if part[20, 10]:
+                    if not part[0, 17]:
                         return "lightning"
                     return "7"
                 return "5"
-            if is_close(part[20, 2], [1., 1., 1.]):
-                if is_close(part[17, 17], [0., 0., 0.]):
+            if part[20, 2]:
+                if not part[17, 17]:
                     return "2"
-                if is_close(part[10, 0], [1., 1., 1.]):
-                    if is_close(part[12, 0], [0., 0., 0.]):
+                if part[10, 0]:
+                    if not part[12, 0]:
                         return "8"
                     return "0"
                 return "3"
             return "9"
-        if is_close(part[10, 0], [1., 1., 1.]):
+        if part[10, 0]:
             return "6"
         return "1"
-    if is_close(part[9, 5], [1., 1., 1.]):
+    if part[9, 5]:
         return "4"
     return "empty"
 
 
+HEARTS_PROBES = (
+    (50, 40),
+)
+"""tuple[tuple[int, int]]: Pixels read by `hearts`."""
+
+HEARTS_COLORS = {
+    0xBD2431: "healthy",
+    0x525552: "hurt",
+}
+"""dict[int, str]: Labels of the packed colors of the hearts probe."""
+
+
 def hearts(part):
     """Classify a lifebar heart.
 
@@ -153,11 +232,13 @@ def hearts(part):
         Either `"healthy"`, `"hurt"` or `"empty"`.
 
     """
-    if is_close(part[50, 40], [0.741176, 0.141176, 0.192157]):
-        return "healthy"
-    if is_close(part[50, 40], [0.321569, 0.333333, 0.321569]):
-        return "hurt"
-    return "empty"
+    return HEARTS_COLORS.get(pack(part[50, 40]), "empty")
+
+
+SPEAR_PROBES = (
+    (40, 10),
+)
+"""tuple[tuple[int, int]]: Pixels read by `spear`."""
 
 
 def spear(part):
@@ -174,7 +255,13 @@ def spear(part):
         Whether the player has its spear in the inventory.
 
     """
-    return is_close(part[40, 10], [0.937255, 0.541176, 0.192157])
+    return pack(part[40, 10]) == 0xEF8A31
+
+
+ENERGY_PROBES = (
+    (0, 0), (0, 39),
+)
+"""tuple[tuple[int, int]]: Pixels read by `energy`."""
 
 
 def energy(part):
@@ -191,20 +278,27 @@ def energy(part):
         Number of digits in the energy counter (excluding lightning).
 
     """
-    if is_close(part[0, 0], [0.905882, 0.905882, 0.352941]):
+    if pack(part[0, 0]) == 0xE7E75A:
         return 1
-    if is_close(part[0, 39], [0.905882, 0.905882, 0.352941]):
+    if pack(part[0, 39]) == 0xE7E75A:
         return 3
     return 2
 
 
+INTERFACE_PROBES = (
+    (600, 1000), (635, 640), (80, 20), (1000, 540), (275, 640),
+    (1450, 540), (750, 1000), (1011, 543), (949, 542),
+)
+"""tuple[tuple[int, int]]: Pixels read by `interface`."""
+
+
 def interface(part):
     """Detect which of `hoplite.game.state.Interface` is displayed on screen.
 
     Parameters
     ----------
     part : numpy.ndarray
-        Screenshot array of shape `(1920, 1080, 3)`.
+        Screenshot array of shape `(1920, 1080, 3)`, with `uint8` values.
 
     Returns
     -------
@@ -212,26 +306,26 @@ def interface(part):
         Interface currently displayed on screen.
 
     """
-    if is_close(part[600, 1000], [0.352941, 0.270588, 0.160784]):
+    if pack(part[600, 1000]) == 0x5A4529:
         return hoplite.game.state.Interface.ALTAR
-    if is_close(part[600, 1000], [0.290196, 0.301961, 0.290196]):
+    if pack(part[600, 1000]) == 0x4A4D4A:
         return hoplite.game.state.Interface.ALTAR
-    if is_close(part[635, 640], [0.647059, 0.000000, 0.000000]):
+    if pack(part[635, 640]) == 0xA50000:
         return hoplite.game.state.Interface.DEATH
-    if is_close(part[80, 20], [1.000000, 1.000000, 1.000000]):
+    if pack(part[80, 20]) == 0xFFFFFF:
         return hoplite.game.state.Interface.EMBARK
-    if is_close(part[1000, 540], [0.937255, 0.764706, 0.000000]):
+    if pack(part[1000, 540]) == 0xEFC300:
         return hoplite.game.state.Interface.FLEECE
-    if is_close(part[275, 640], [1.000000, 1.000000, 1.000000]):
+    if pack(part[275, 640]) == 0xFFFFFF:
         return hoplite.game.state.Interface.VICTORY
-    if is_close(part[1450, 540], [1.000000, 1.000000, 1.000000]):
+    if pack(part[1450, 540]) == 0xFFFFFF:
         return hoplite.game.state.Interface.STAIRS
-    if is_close(part[750, 1000], [0.352941, 0.270588, 0.160784]):
+    if pack(part[750, 1000]) == 0x5A4529:
         return hoplite.game.state.Interface.ALTAR
-    if abs(part[1011, 543, 0] * 0.80465513 + 0.018641233 - part[1011, 543, 1]) < .03:
-        if numpy.max(abs(part[1011, 543] - [1, 1, 0])) < .5:
-            return hoplite.game.state.Interface.FLEECE
-    if is_close(part[949, 542], [0.094118, 0.109804, 0.094118]):
+    red, green, blue = part[1011, 543]
+    if FLEECE_HUE[red, green] and min(red, green) >= 128 > blue:
+        return hoplite.game.state.Interface.FLEECE
+    if pack(part[949, 542]) == 0x181C18:
         return  hoplite.game.state.Interface.BLACK
     return hoplite.game.state.Interface.PLAYING
 
@@ -250,45 +344,58 @@ def prayer(part):
         Detected prayers.
 
     """
-    if is_close(part[75, 90], [1.000000, 0.827451, 0.000000]):
+    if pack(part[75, 90]) == 0xFFD300:
         return hoplite.game.status.Prayer.DIVINE_RESTORATION
-    if is_close(part[75, 90], [0.905882, 0.364706, 0.352941]):
+    if pack(part[75, 90]) == 0xE75D5A:
         return hoplite.game.status.Prayer.FORTITUDE
-    if is_close(part[100, 50], [0.388235, 0.286275, 0.094118]):
-        if is_close(part[50, 795], [1.000000, 1.000000, 1.000000]):
+    if pack(part[100, 50]) == 0x634918:
+        if pack(part[50, 795]) == 0xFFFFFF:
             return hoplite.game.status.Prayer.GREATER_ENERGY_II
-        if is_close(part[38, 580], [1.000000, 1.000000, 1.000000]):
-            if is_close(part[60, 735], [0.352941, 0.270588, 0.160784]):
+        if pack(part[38, 580]) == 0xFFFFFF:
+            if pack(part[60, 735]) == 0x5A4529:
                 return hoplite.game.status.Prayer.WINGED_SANDALS
             return hoplite.game.status.Prayer.STAGGERING_LEAP
         return hoplite.game.status.Prayer.BLOODLUST
-    if is_close(part[100, 83], [0.937255, 0.541176, 0.192157]):
-        if is_close(part[50, 680], [1.000000, 1.000000, 1.000000]):
+    if pack(part[100, 83]) == 0xEF8A31:
+        if pack(part[50, 680]) == 0xFFFFFF:
             return hoplite.game.status.Prayer.GREATER_THROW
         return hoplite.game.status.Prayer.DEEP_LUNGE
-    if is_close(part[50, 50], [0.482353, 0.380392, 0.258824]):
+    if pack(part[50, 50]) == 0x7B6142:
         return hoplite.game.status.Prayer.GREATER_ENERGY
-    if is_close(part[87, 72], [0.450980, 0.443137, 0.450980]):
-        if is_close(part[60, 370], [0.352941, 0.270588, 0.160784]):
+    if pack(part[87, 72]) == 0x737173:
+        if pack(part[60, 370]) == 0x5A4529:
             return hoplite.game.status.Prayer.QUICK_BASH
-        if is_close(part[60, 638], [1.000000, 1.000000, 1.000000]):
-            if is_close(part[89, 215], [0.352941, 0.270588, 0.160784]):
+        if pack(part[60, 638]) == 0xFFFFFF:
+            if pack(part[89, 215]) == 0x5A4529:
                 return hoplite.game.status.Prayer.SWEEPING_BASH
             return hoplite.game.status.Prayer.SPINNING_BASH
         return hoplite.game.status.Prayer.MIGHTY_BASH
-    if is_close(part[50, 200], [1.000000, 1.000000, 1.000000]):
-        if is_close(part[60, 755], [1.000000, 1.000000, 1.000000]):
+    if pack(part[50, 200]) == 0xFFFFFF:
+        if pack(part[60, 755]) == 0xFFFFFF:
             return hoplite.game.status.Prayer.GREATER_THROW_II
         return hoplite.game.status.Prayer.DEEP_LUNGE
-    if is_close(part[36, 536], [1.000000, 1.000000, 1.000000]):
+    if pack(part[36, 536]) == 0xFFFFFF:
         return hoplite.game.status.Prayer.REGENERATION
-    if is_close(part[86, 300], [1.000000, 1.000000, 1.000000]):
+    if pack(part[86, 300]) == 0xFFFFFF:
         return hoplite.game.status.Prayer.SURGE
-    if is_close(part[70, 82], [0.968627, 0.890196, 0.419608]):
+    if pack(part[70, 82]) == 0xF7E36B:
         return hoplite.game.status.Prayer.PATIENCE
     return None
 
 
+SPREE_PROBES = (
+    (36, 30),
+)
+"""tuple[tuple[int, int]]: Pixels read by `spree`."""
+
+SPREE_COLORS = {
+    0x181818: "empty",
+    0x525552: "off",
+    0x7B7131: "on",
+}
+"""dict[int, str]: Labels of the packed colors of the spree probe."""
+
+
 def spree(part):
     """Classify a killing spree skull.
 
@@ -303,9 +410,4 @@ def spree(part):
         Either `"empty"`, `"off"` or `"on"`.
 
     """
-    if is_close(part[36, 30], [0.094118, 0.094118, 0.094118]):
-        return "empty"
-    if is_close(part[36, 30], [0.321569, 0.333333, 0.321569]):
-        return "off"
-    # if is_close(part[36, 30], [0.482353, 0.443137, 0.192157]):
-    return "on"
+    return SPREE_COLORS.get(pack(part[36, 30]), "on")
@@ -3,7 +3,9 @@
 
 import os
 import time
+import struct
 import logging
+import collections
 import numpy
 import matplotlib.image
 import hoplite.vision.classifiers
@@ -40,7 +42,8 @@ class ImagePreprocessor:  # pylint: disable=R0903
 
 
 class Thresholder(ImagePreprocessor):  # pylint: disable=R0903
-    """Apply a threshold to an image.
+    """Apply a threshold to an image, turning it into a boolean mask of the
+    pixels whose mean intensity, in [0, 1], reaches the threshold.
     """
 
     def __init__(self, threshold):
@@ -48,9 +51,7 @@ class Thresholder(ImagePreprocessor):  # pylint: disable=R0903
         super(Thresholder, self).__init__()
 
     def apply(self, array):
-        result = numpy.zeros(array.shape)
-        result[numpy.where(numpy.sum(array, axis=2) >= 3 * self.threshold)] = [1., 1., 1.]
-        return result
+        return numpy.sum(array, axis=-1, dtype=numpy.uint16) >= 3 * 255 * self.threshold
 
 
 class Locator:  # pylint: disable=R0903
@@ -108,6 +109,31 @@ class Locator:  # pylint: disable=R0903
     def _locate(self, i, j):
         raise NotImplementedError
 
+    def index(self, cells, pixels):
+        """Build a fancy index gathering some pixels of several parts at once,
+        meant to be computed once and then used as `array[rows, columns]`.
+
+        Parameters
+        ----------
+        cells : List[tuple[int, int]]
+            `(i, j)` coordinates of the parts, as in `get`.
+        pixels : List[tuple[int, int]]
+            `(row, column)` coordinates of the pixels within a part.
+
+        Returns
+        -------
+        tuple[numpy.ndarray, numpy.ndarray]
+            Rows and columns of the pixels in the image array, both of shape
+            `(len(cells), len(pixels))`.
+
+        """
+        origins = numpy.array([self._locate(i, j) for i, j in cells])
+        pixels = numpy.array(pixels)
+        return (
+            origins[:, 1, numpy.newaxis] + pixels[numpy.newaxis, :, 0],
+            origins[:, 0, numpy.newaxis] + pixels[numpy.newaxis, :, 1],
+        )
+
     def get(self, array, i, j):
         """Locate and extract a part of an image array.
 
@@ -170,7 +196,7 @@ class PrayerLocator(Locator):
     ----------
     _last_i : int
         Vertical index of lastly detected prayer.
-    _last_value : tuple[float, float, float]
+    _last_value : numpy.ndarray
         Color of pixel at _last_i.
 
     """
@@ -202,9 +228,7 @@ class PrayerLocator(Locator):
             if (self._last_value == array[i_, j_, :]).all():
                 continue
             self._last_value = array[i_, j_, :]
-            if hoplite.vision.classifiers.is_close(
-                    array[i_, j_, :],
-                    [.3529412, .27058825, .16078432]):
+            if hoplite.vision.classifiers.pack(array[i_, j_, :]) == 0x5A4529:
                 self._last_i = i_
                 return self._extract(array, *self._locate(i_, j_))
         self._last_i = 450
@@ -212,6 +236,205 @@ class PrayerLocator(Locator):
         return None
 
 
+class ProbedPart:  # pylint: disable=R0903
+    """Part of a screenshot of which only some pixels have been gathered. It
+    is indexed as the image array of the part would be.
+
+    Parameters
+    ----------
+    pixels : numpy.ndarray
+        Gathered pixels, of shape `(n_pixels, ...)`.
+    offsets : dict[tuple[int, int], int]
+        Index within `pixels` of the `(row, column)` coordinates of the part.
+
+    """
+
+    def __init__(self, pixels, offsets):
+        self.pixels = pixels
+        self.offsets = offsets
+
+    def __getitem__(self, key):
+        pixel = self.pixels[self.offsets[key[:2]]]
+        if len(key) > 2:
+            return pixel[key[2:]]
+        return pixel
+
+
+class ProbePlan:
+    """Every pixel of a screenshot that the classifiers may read, compiled
+    into a single index so that they are gathered at once.
+
+    Parameters
+    ----------
+    locators : dict[str, Locator]
+        Locators of the parts to probe.
+
+    Attributes
+    ----------
+    rows : numpy.ndarray
+        Rows of the probed pixels in the screenshot.
+    columns : numpy.ndarray
+        Columns of the probed pixels in the screenshot.
+    blocks : dict[str, tuple[int, list[tuple[int, int]], dict[tuple[int, int], int]]]
+        For each locator, the offset of its pixels within the gathered ones,
+        the probed cells and the index of each probe within a cell.
+    locators
+
+    """
+
+    def __init__(self, locators):
+        self.locators = locators
+        self.rows = numpy.zeros(0, dtype=int)
+        self.columns = numpy.zeros(0, dtype=int)
+        self.blocks = dict()
+
+    def add(self, name, cells, pixels):
+        """Add the probes of some parts of the screen to the plan.
+
+        Parameters
+        ----------
+        name : str
+            Key of the locator of the parts.
+        cells : List[tuple[int, int]]
+            `(i, j)` coordinates of the parts.
+        pixels : List[tuple[int, int]]
+            `(row, column)` coordinates of the probes within a part.
+
+        """
+        rows, columns = self.locators[name].index(cells, pixels)
+        self.blocks[name] = (
+            self.rows.size,
+            list(cells),
+            {pixel: k for k, pixel in enumerate(pixels)},
+        )
+        self.rows = numpy.concatenate([self.rows, rows.ravel()])
+        self.columns = numpy.concatenate([self.columns, columns.ravel()])
+
+    def gather(self, array):
+        """Gather the probes of a screenshot.
+
+        Parameters
+        ----------
+        array : numpy.ndarray
+            Screenshot array.
+
+        Returns
+        -------
+        ProbedScreen
+            Gathered probes.
+
+        """
+        return ProbedScreen(self, array, array[self.rows, self.columns])
+
+
+class ProbedScreen:
+    """Probes gathered from a screenshot by a `ProbePlan`.
+
+    Parameters
+    ----------
+    plan : ProbePlan
+        Plan the probes were gathered with.
+    array : numpy.ndarray
+        Screenshot array, for parts that are not in the plan.
+    values : numpy.ndarray
+        Gathered pixels, in the order of the plan.
+
+    """
+
+    def __init__(self, plan, array, values):
+        self.plan = plan
+        self.array = array
+        self.values = values
+
+    def _span(self, name, i, j):
+        """Locate the probes of a part within the gathered pixels, or return
+        `None` if the part must be extracted from the full screenshot."""
+        if name not in self.plan.blocks or self.plan.locators[name].save_parts:
+            return None
+        start, cells, offsets = self.plan.blocks[name]
+        if (i, j) not in cells:
+            return None
+        start += cells.index((i, j)) * len(offsets)
+        return start, start + len(offsets), offsets
+
+    def part(self, name, i, j, preprocessor=None):
+        """Get a part of the screenshot, as `Locator.get` would. Parts
+        outside of the plan, or whose locator saves parts, are extracted from
+        the full screenshot.
+
+        Parameters
+        ----------
+        name : str
+            Key of the locator.
+        i : int
+            ith-row to extract.
+        j : int
+            jth-row to extract.
+        preprocessor : ImagePreprocessor
+            Preprocessing to apply to the part.
+
+        Returns
+        -------
+        ProbedPart or numpy.ndarray
+            Part of the screenshot.
+
+        """
+        span = self._span(name, i, j)
+        if span is None:
+            part = self.plan.locators[name].get(self.array, i, j)
+            if preprocessor is not None:
+                part = preprocessor.apply(part)
+            return part
+        start, stop, offsets = span
+        pixels = self.values[start:stop]
+        if preprocessor is not None:
+            pixels = preprocessor.apply(pixels)
+        return ProbedPart(pixels, offsets)
+
+    def fingerprint(self, name, i, j):
+        """Get a fingerprint of a part, which changes whenever one of the
+        pixels read by its classifier does.
+
+        Parameters
+        ----------
+        name : str
+            Key of the locator.
+        i : int
+            ith-row to extract.
+        j : int
+            jth-row to extract.
+
+        Returns
+        -------
+        bytes
+            Probed pixels of the part, or `None` for parts extracted from the
+            full screenshot.
+
+        """
+        span = self._span(name, i, j)
+        if span is None:
+            return None
+        return self.values[span[0]:span[1]].tobytes()
+
+    def samples(self, name):
+        """Get all the probes of a locator.
+
+        Parameters
+        ----------
+        name : str
+            Key of the locator.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of shape `(n_cells, n_probes, n_channels)`.
+
+        """
+        start, cells, offsets = self.plan.blocks[name]
+        return self.values[start:start + len(cells) * len(offsets)]\
+            .reshape(len(cells), len(offsets), -1)
+
+
 class ScreenParser:
     """Wrapper for screenshot parsing tools.
 
@@ -224,9 +447,25 @@ class ScreenParser:
     ----------
     locators : dict[str, Locator]
         Locators that will be used for the observation.
+    plan : ProbePlan
+        Pixels read by the classifiers of a game screenshot.
+    interface_plan : ProbePlan
+        Pixels read by the interface classifier.
+    reused : collections.Counter
+        For each locator, number of parts whose label was reused from the
+        previous screenshot during the last observation, as their probes did
+        not change.
+    reclassified : collections.Counter
+        For each locator, number of parts classified during the last
+        observation.
 
     """
 
+    MAX_DEPTH_DIGITS = 2
+    MAX_ENERGY_DIGITS = 3
+    MAX_HEARTS = 8
+    MAX_SPREE = 3
+
     def __init__(self, save_parts=False):
         self.locators = {
             "terrain": TerrainLocator((52, 52), (540, 903), 104, 112, save_parts=save_parts),
@@ -240,16 +479,82 @@ class ScreenParser:
             "energy": TopLeftLocator((40, 28), (544, 1885), save_parts=save_parts),
             "spree": TopLeftLocator((60, 72), (874, 1668), save_parts=save_parts),
             "prayer": PrayerLocator((900, 120), (40, 450), save_parts=save_parts),
+            "screen": TopLeftLocator((1080, 1920), (0, 0)),
         }
+        self.plan = self._compile_plan()
+        self.interface_plan = ProbePlan(self.locators)
+        self.interface_plan.add(
+            "screen",
+            [(0, 0)],
+            hoplite.vision.classifiers.INTERFACE_PROBES
+        )
+        self.reused = collections.Counter()
+        self.reclassified = collections.Counter()
+        self._labels = dict()
+
+    def _compile_plan(self):
+        """Build the probe plan of the game screen. Numbers are probed up to
+        their maximum number of digits plus the following blank, and hearts
+        up to the maximum health plus the following empty heart.
+        """
+        classifiers = hoplite.vision.classifiers
+        plan = ProbePlan(self.locators)
+        plan.add("screen", [(0, 0)], classifiers.INTERFACE_PROBES)
+        plan.add(
+            "terrain",
+            [(pos.y, pos.x) for pos in hoplite.utils.SURFACE_COORDINATES],
+            classifiers.TERRAIN_PROBES
+        )
+        plan.add(
+            "depth",
+            [(0, j) for j in range(ScreenParser.MAX_DEPTH_DIGITS + 1)],
+            classifiers.FONT_PROBES
+        )
+        plan.add("cooldown", [(0, 0)], classifiers.FONT_PROBES)
+        plan.add("energy", [(0, 0)], classifiers.ENERGY_PROBES)
+        for digits, name in enumerate(["energy_one", "energy_two", "energy_three"]):
+            plan.add(
+                name,
+                [(0, j) for j in range(digits + 2)],
+                classifiers.FONT_PROBES
+            )
+        plan.add(
+            "hearts",
+            [(0, j) for j in range(ScreenParser.MAX_HEARTS + 1)],
+            classifiers.HEARTS_PROBES
+        )
+        plan.add("spear", [(0, 0)], classifiers.SPEAR_PROBES)
+        plan.add(
+            "spree",
+            [(0, j) for j in range(ScreenParser.MAX_SPREE)],
+            classifiers.SPREE_PROBES
+        )
+        return plan
 
-    def _observe_integer(self, array, locator):
+    def _classify(self, screen, name, column, classifier, preprocessor=None):  # pylint: disable=R0913
+        """Classify a part of the first row of a locator, reusing the label
+        of the previous screenshot if the probes of the part did not change.
+        """
+        fingerprint = screen.fingerprint(name, 0, column)
+        cached = self._labels.get((name, column))
+        if fingerprint is not None and cached is not None and cached[0] == fingerprint:
+            self.reused[name] += 1
+            return cached[1]
+        label = classifier(screen.part(name, 0, column, preprocessor))
+        self.reclassified[name] += 1
+        if fingerprint is not None:
+            self._labels[(name, column)] = (fingerprint, label)
+        return label
+
+    def _observe_integer(self, screen, locator):
         buffer = ""
         column = 0
         thresholder = Thresholder(.5)
         while True:
-            part = thresholder.apply(
-                self.locators[locator].get(array, 0, column))
-            label = hoplite.vision.classifiers.font(part)
+            label = self._classify(
+                screen, locator, column,
+                hoplite.vision.classifiers.font, thresholder
+            )
             if label not in "0123456789":
                 if buffer == "":
                     return 0
@@ -257,40 +562,40 @@ class ScreenParser:
             buffer += label
             column += 1
 
-    def _observe_depth(self, array):
+    def _observe_depth(self, screen):
         time_start = time.time()
-        depth = self._observe_integer(array, "depth")
+        depth = self._observe_integer(screen, "depth")
         LOGGER.debug("Observed depth in %.1f ms",
                      1000 * (time.time() - time_start))
         return depth
 
-    def _observe_cooldown(self, array):
+    def _observe_cooldown(self, screen):
         time_start = time.time()
-        part = Thresholder(.5).apply(self.locators["cooldown"].get(array, 0, 0))
-        label = hoplite.vision.classifiers.font(part)
+        label = self._classify(
+            screen, "cooldown", 0,
+            hoplite.vision.classifiers.font, Thresholder(.5)
+        )
         LOGGER.debug("Observed cooldown in %.1f ms",
                      1000 * (time.time() - time_start))
         if label == "empty":
             return 0
         return int(label)
 
-    def _observe_energy(self, array):
+    def _observe_energy(self, screen):
         time_start = time.time()
         locators = ["energy_one", "energy_two", "energy_three"]
-        n_digits = hoplite.vision.classifiers.energy(
-            self.locators["energy"].get(array, 0, 0))
-        energy = self._observe_integer(array, locators[n_digits - 1])
+        n_digits = self._classify(screen, "energy", 0, hoplite.vision.classifiers.energy)
+        energy = self._observe_integer(screen, locators[n_digits - 1])
         LOGGER.debug("Observed energy in %.1f ms",
                      1000 * (time.time() - time_start))
         return energy
 
-    def _observe_hearts(self, array):
+    def _observe_hearts(self, screen):
         time_start = time.time()
         life = [0, 0]
         column = 0
         while True:
-            part = self.locators["hearts"].get(array, 0, column)
-            label = hoplite.vision.classifiers.hearts(part)
+            label = self._classify(screen, "hearts", column, hoplite.vision.classifiers.hearts)
             if label == "empty":
                 break
             if label == "healthy":
@@ -301,20 +606,18 @@ class ScreenParser:
                      1000 * (time.time() - time_start))
         return tuple(life)
 
-    def _observe_spear(self, array):
+    def _observe_spear(self, screen):
         time_start = time.time()
-        spear = hoplite.vision.classifiers.spear(
-            self.locators["spear"].get(array, 0, 0))
+        spear = self._classify(screen, "spear", 0, hoplite.vision.classifiers.spear)
         LOGGER.debug("Observed spear in %.1f ms",
                      1000 * (time.time() - time_start))
         return spear
 
-    def _observe_spree(self, array):
+    def _observe_spree(self, screen):
         time_start = time.time()
         spree = 0
         for column in range(3):
-            part = self.locators["spree"].get(array, 0, column)
-            label = hoplite.vision.classifiers.spree(part)
+            label = self._classify(screen, "spree", column, hoplite.vision.classifiers.spree)
             if label == "empty":
                 break
             if label == "on":
@@ -323,25 +626,79 @@ class ScreenParser:
                      1000 * (time.time() - time_start))
         return spree
 
-    def _observe_terrain(self, array):
+    def _observe_terrain(self, screen):
+        """Classify the terrain tiles whose probes changed since the previous
+        screenshot, and reuse the labels of the others.
+        """
         time_start = time.time()
-        surface = list()
-        for pos in hoplite.utils.SURFACE_COORDINATES:
-            part = self.locators["terrain"].get(array, pos.y, pos.x)
-            label = hoplite.vision.classifiers.terrain(part)
-            surface.append(label)
+        locator = self.locators["terrain"]
+        if locator.save_parts:
+            for pos in hoplite.utils.SURFACE_COORDINATES:
+                locator.get(screen.array, pos.y, pos.x)
+        samples = screen.samples("terrain")
+        fingerprint = hoplite.vision.classifiers.pack(samples)
+        cached = self._labels.get("terrain")
+        if cached is None or locator.save_parts:
+            changed = numpy.arange(len(samples))
+            surface = [None] * len(samples)
+        else:
+            changed = numpy.flatnonzero((fingerprint != cached[0]).any(axis=1))
+            surface = list(cached[1])
+        if changed.size > 0:
+            labels = hoplite.vision.classifiers.terrain_batch(samples[changed])
+            for index, label in zip(changed, labels):
+                surface[index] = label
+        self._labels["terrain"] = (fingerprint, surface)
+        self.reused["terrain"] += len(samples) - changed.size
+        self.reclassified["terrain"] += changed.size
         terrain = hoplite.game.terrain.Terrain.from_list(surface)
         LOGGER.debug("Observed terrain in %.1f ms",
                      1000 * (time.time() - time_start))
         return terrain
 
+    def fingerprint(self, array):
+        """Compute a fingerprint of a screenshot from the pixels of the probe
+        plan, which changes whenever the parsing of the screenshot may.
+
+        Parameters
+        ----------
+        array : numpy.ndarray
+            Screenshot array of shape `(1920, 1080, 3)`, with `uint8` values.
+
+        Returns
+        -------
+        bytes
+            Probed pixels of the screenshot.
+
+        """
+        return array[self.plan.rows, self.plan.columns].tobytes()
+
+    def observe_interface(self, array):
+        """Detect which interface a screenshot shows.
+
+        Parameters
+        ----------
+        array : numpy.ndarray
+            Screenshot array of shape `(1920, 1080, 3)`, with `uint8` values.
+
+        Returns
+        -------
+        hoplite.game.state.Interface
+            Interface displayed on the screenshot.
+
+        """
+        screen = self.interface_plan.gather(array)
+        return hoplite.vision.classifiers.interface(screen.part("screen", 0, 0))
+
     def observe_game(self, array):
-        """Parse a screenshot of a game.
+        """Parse a screenshot of a game. Only the pixels of the probe plan
+        are read, gathered at once, and parts whose probes did not change
+        since the previous screenshot keep their label (see `reused`).
 
         Parameters
         ----------
         array : numpy.ndarray
-            Screenshot array of shape `(1920, 1080, 3)`.
+            Screenshot array of shape `(1920, 1080, 3)`, with `uint8` values.
 
         Returns
         -------
@@ -350,16 +707,26 @@ class ScreenParser:
 
         """
         time_start = time.time()
+        self.reused.clear()
+        self.reclassified.clear()
+        screen = self.plan.gather(array)
         state = hoplite.game.state.GameState()
-        state.depth = self._observe_depth(array)
-        state.terrain = self._observe_terrain(array)
-        state.status.energy = self._observe_energy(array)
-        state.status.cooldown = self._observe_cooldown(array)
-        current_health, max_health = self._observe_hearts(array)
+        state.depth = self._observe_depth(screen)
+        state.terrain = self._observe_terrain(screen)
+        state.status.energy = self._observe_energy(screen)
+        state.status.cooldown = self._observe_cooldown(screen)
+        current_health, max_health = self._observe_hearts(screen)
         state.status.health = current_health
         state.status.attributes.maximum_health = max_health
-        state.status.spear = self._observe_spear(array)
-        state.status.spree = self._observe_spree(array)
+        state.status.spear = self._observe_spear(screen)
+        state.status.spree = self._observe_spree(screen)
+        LOGGER.debug(
+            "Reused %d terrain tiles and %d HUD parts, reclassified %d and %d",
+            self.reused["terrain"],
+            sum(self.reused.values()) - self.reused["terrain"],
+            self.reclassified["terrain"],
+            sum(self.reclassified.values()) - self.reclassified["terrain"]
+        )
         LOGGER.info(
             "Observed screenshot in %.3f seconds",
             time.time() - time_start
@@ -372,7 +739,7 @@ class ScreenParser:
         Parameters
         ----------
         array : numpy.ndarray
-            Screenshot array of shape `(1920, 1080, 3)`.
+            Screenshot array of shape `(1920, 1080, 3)`, with `uint8` values.
 
         Returns
         -------
@@ -402,10 +769,39 @@ class ScreenParser:
         Returns
         -------
         numpy.ndarray
-            RGB matrix of the stream.
+            RGB matrix of the stream, with `uint8` values.
+
+        """
+        return hoplite.vision.classifiers.to_uint8(
+            matplotlib.image.imread(path)[:, :, :3])
+
+    @staticmethod
+    def read_raw(data):
+        """Read a screenshot from the raw output of Android `screencap`: a
+        header with the width, the height, the pixel format and, on recent
+        versions, the color space, as 32-bit little-endian integers, followed
+        by the RGBA pixels.
+
+        Parameters
+        ----------
+        data : bytes
+            Raw `screencap` output.
+
+        Returns
+        -------
+        numpy.ndarray
+            RGB matrix of the screenshot, with `uint8` values. It is a view
+            over `data`, which is not copied.
 
         """
-        return matplotlib.image.imread(path)[:, :, :3]
+        width, height, pixel_format = struct.unpack_from("<3I", data)
+        header = len(data) - 4 * width * height
+        if header not in (12, 16) or pixel_format != 1:
+            raise ValueError(
+                "Unsupported raw screenshot: %dx%d, format %d, %d bytes"
+                % (width, height, pixel_format, len(data)))
+        return numpy.frombuffer(data, dtype=numpy.uint8, offset=header)\
+            .reshape(height, width, 4)[:, :, :3]
 
 
 class Observer:
@@ -415,24 +811,54 @@ class Observer:
     ----------
     monkey_runner : hoplite.monkey_runner.MonkeyRunnerInterface
         Interface controlling the game, to retrieve screenshots froms.
+    capture : str
+        Screenshot format to request, either `"png"` or `"raw"` (see
+        `ScreenParser.read_raw`).
 
     Attributes
     ----------
     screenshot : numpy.ndarray
-        Last screenshot taken of the screen. Should have shape `(1920, 1080, 3)`.
+        Last screenshot taken of the screen. Should have shape `(1920, 1080, 3)`,
+        with `uint8` values.
     parser : ScreenParser
         Parser for the screenshot.
     monkey_runner
+    capture
 
     """
 
-    def __init__(self, monkey_runner):
+    CAPTURE_MODES = ("png", "raw")
+
+    def __init__(self, monkey_runner, capture="png"):
+        if capture not in Observer.CAPTURE_MODES:
+            raise ValueError("Unknown capture mode '%s'" % capture)
         self.monkey_runner = monkey_runner
+        self.capture = capture
         self.screenshot = None
         self.parser = ScreenParser()
+        self._stable = False
+        self._poll_capture = "raw"
+
+    def _take_screenshot(self, capture=None):
+        if (self.capture if capture is None else capture) == "raw":
+            return self.parser.read_raw(self.monkey_runner.snapshot(raw=True))
+        return self.parser.read_stream(self.monkey_runner.snapshot(as_stream=True))
+
+    def _poll_screenshot(self):
+        if self._poll_capture == self.capture:
+            return self._take_screenshot()
+        try:
+            return self._take_screenshot(self._poll_capture)
+        except ValueError:
+            LOGGER.warning("Raw screenshots are not supported, polling with %s screenshots",
+                           self.capture)
+            self._poll_capture = self.capture
+            return self._take_screenshot()
 
     def fetch_screenshot(self):
-        """Take a screenshot and check the currently displayed interface.
+        """Take a screenshot and check the currently displayed interface. If
+        the last call to `wait_stable` ended on a stable screen, its last
+        screenshot is used instead of taking a new one.
 
         Returns
         -------
@@ -440,20 +866,67 @@ class Observer:
             Interface recognized by the game.
 
         """
-        self.screenshot = self.parser.read_stream(
-            self.monkey_runner.snapshot(as_stream=True))
-        return hoplite.vision.classifiers.interface(self.screenshot)
+        if not self._stable:
+            self.screenshot = self._take_screenshot()
+        self._stable = False
+        return self.parser.observe_interface(self.screenshot)
+
+    def wait_stable(self, delay, interval, samples, timeout):
+        """Wait for the screen to settle, by polling screenshots until the
+        pixels read by the parser stay the same over several screenshots.
+        Screenshots are polled in the raw format, which spares the PNG
+        encoding on the device, unless the device does not support it: the
+        polling then uses `capture` for the rest of the session.
+
+        Parameters
+        ----------
+        delay : float
+            Time to wait before the first screenshot, in seconds.
+        interval : float
+            Time to wait between two screenshots, in seconds.
+        samples : int
+            Number of consecutive identical screenshots for the screen to be
+            considered stable.
+        timeout : float
+            Maximum duration of the wait, in seconds.
+
+        Returns
+        -------
+        float
+            Duration of the wait, in seconds.
+
+        """
+        time_start = time.time()
+        time.sleep(delay)
+        fingerprint = None
+        count = 0
+        while True:
+            self.screenshot = self._poll_screenshot()
+            current = self.parser.fingerprint(self.screenshot)
+            count = count + 1 if current == fingerprint else 1
+            fingerprint = current
+            if count >= samples or time.time() - time_start + interval > timeout:
+                break
+            time.sleep(interval)
+        self._stable = count >= samples
+        if not self._stable:
+            LOGGER.debug("Screen still changing after %.2f seconds", timeout)
+        return time.time() - time_start
 
-    def save_screenshot(self, filename):
+    def save_screenshot(self, filename, screenshot=None):
         """Save the last screenshot as a PNG file.
 
         Parameters
         ----------
         filename : str
             Path the the file to write the image to.
+        screenshot : numpy.ndarray
+            Screenshot to save instead of the last one.
 
         """
-        matplotlib.image.imsave(filename, self.screenshot)
+        if screenshot is None:
+            screenshot = self.screenshot
+        matplotlib.image.imsave(filename, screenshot)
 
     def parse_game(self):
         """Parse the current screenshot looking for the game interface.
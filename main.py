@@ -1,3 +1,4 @@
 # pylint: disable=all
 if __name__ == "__main__":
     import hoplite.__main__
+    hoplite.__main__.main()
@@ -0,0 +1,152 @@
+"""Tests for the persistent shell input of `hoplite.ppadb_runner`, against a
+local fake ADB server.
+"""
+
+import socket
+import threading
+import unittest
+from ppadb.client import Client as AdbClient
+import hoplite.ppadb_runner
+
+
+class FakeAdbServer:  # pylint: disable=R0903
+    """Local stand-in for the ADB server. It answers `host:devices`,
+    `host:transport:<serial>` and `exec:sh`, with a shell that only knows
+    `input tap`, which records the touch, and `echo`.
+
+    Parameters
+    ----------
+    serial : str
+        Serial of the only device.
+
+    Attributes
+    ----------
+    taps : list[tuple[int, int]]
+        Touches received, in order.
+    sessions : int
+        Number of shell sessions opened.
+    echo : threading.Event
+        While cleared, the shell holds back the output of `echo`.
+    hang_up : bool
+        Whether the shell closes the connection on the next command line,
+        without running it.
+    port : int
+        Port the server listens to.
+    serial
+
+    """
+
+    def __init__(self, serial="emulator-5554"):
+        self.serial = serial
+        self.taps = list()
+        self.sessions = 0
+        self.echo = threading.Event()
+        self.echo.set()
+        self.hang_up = False
+        self._socket = socket.create_server(("127.0.0.1", 0))
+        self.port = self._socket.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def close(self):
+        """Stop accepting connections.
+        """
+        self._socket.close()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._socket.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn, conn.makefile("rb") as stream:
+            while True:
+                length = stream.read(4)
+                if not length:
+                    return
+                request = stream.read(int(length, 16)).decode("ascii")
+                if request == "host:devices":
+                    payload = ("%s\tdevice\n" % self.serial).encode("ascii")
+                    conn.sendall(b"OKAY" + b"%04X" % len(payload) + payload)
+                    return
+                if request == "host:transport:%s" % self.serial:
+                    conn.sendall(b"OKAY")
+                elif request == "exec:sh":
+                    conn.sendall(b"OKAY")
+                    self.sessions += 1
+                    self._shell(conn, stream)
+                    return
+                else:
+                    conn.sendall(b"FAIL0007unknown")
+                    return
+
+    def _shell(self, conn, stream):
+        for line in stream:
+            if self.hang_up:
+                return
+            for command in line.decode("ascii").split(";"):
+                words = command.split()
+                if words[:2] == ["input", "tap"]:
+                    self.taps.append((int(words[2]), int(words[3])))
+                elif words[:1] == ["echo"]:
+                    self.echo.wait()
+                    conn.sendall((" ".join(words[1:]) + "\n").encode("ascii"))
+                elif words[:1] == ["exit"]:
+                    return
+
+
+class ShellInputTest(unittest.TestCase):
+    """Touches through `hoplite.ppadb_runner.ShellInput`.
+    """
+
+    def setUp(self):
+        self.server = FakeAdbServer()
+        device = AdbClient(host="127.0.0.1", port=self.server.port).device(self.server.serial)
+        self.shell = hoplite.ppadb_runner.ShellInput(device)
+
+    def tearDown(self):
+        self.server.echo.set()
+        self.shell.close()
+        self.server.close()
+
+    def test_taps_in_order(self):
+        """Touches reach the device in order, through a single session.
+        """
+        self.shell.tap([(1, 2), (3, 4)])
+        self.shell.tap([(5, 6)])
+        self.assertEqual(self.server.taps, [(1, 2), (3, 4), (5, 6)])
+        self.assertEqual(self.server.sessions, 1)
+
+    def test_tap_waits_for_marker(self):
+        """A tap only returns once the shell echoed its marker.
+        """
+        self.server.echo.clear()
+        thread = threading.Thread(target=self.shell.tap, args=([(7, 8)],))
+        thread.start()
+        thread.join(.2)
+        self.assertEqual(self.server.taps, [(7, 8)])
+        self.assertTrue(thread.is_alive())
+        self.server.echo.set()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+    def test_reopens_after_close(self):
+        """A session closed by the device fails the pending tap, and is
+        reopened by the next one.
+        """
+        self.shell.tap([(1, 1)])
+        self.server.hang_up = True
+        with self.assertLogs(hoplite.ppadb_runner.LOGGER, "WARNING"):
+            with self.assertRaises(OSError):
+                self.shell.tap([(2, 2)])
+        self.assertIsNone(self.shell.connection)
+        self.server.hang_up = False
+        self.shell.tap([(3, 3)])
+        self.assertEqual(self.server.taps, [(1, 1), (3, 3)])
+        self.assertEqual(self.server.sessions, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()